@@ -0,0 +1,122 @@
+# batch_cli.py
+# Prices a directory of scenario files without Streamlit:
+#
+#   python batch_cli.py scenarios/ -o results.csv --workers 8
+#   python batch_cli.py scenarios/ --format jsonl > results.jsonl
+#
+# Each .json/.yaml/.yml file holds one scenario (see cost_core.scenario_from_dict).
+# Files are priced across a process pool and rows are written as soon as they arrive.
+import argparse
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from cost_core import price_scenario, scenario_from_dict
+
+SCENARIO_SUFFIXES = {".json", ".yaml", ".yml"}
+
+def load_scenario_file(path):
+    """Reads a JSON or YAML scenario file into a scenario dict."""
+    path = Path(path)
+    with open(path, encoding="utf-8") as f:
+        if path.suffix == ".json":
+            raw = json.load(f)
+        else:
+            try:
+                import yaml
+            except ImportError:
+                raise RuntimeError(f"{path}: reading YAML scenarios requires PyYAML (pip install pyyaml)")
+            raw = yaml.safe_load(f)
+    raw = raw or {}
+    raw.setdefault("name", path.stem)
+    return scenario_from_dict(raw)
+
+def price_scenario_file(path):
+    """Worker entry point: prices one file, reporting failures as a row instead of raising."""
+    try:
+        result = price_scenario(load_scenario_file(path))
+        result["error"] = ""
+    except Exception as exc:
+        result = {"scenario": Path(path).stem, "error": f"{type(exc).__name__}: {exc}"}
+    result["file"] = str(path)
+    return result
+
+def find_scenario_files(directory):
+    return sorted(p for p in Path(directory).rglob("*") if p.is_file() and p.suffix.lower() in SCENARIO_SUFFIXES)
+
+def iter_results(paths, workers):
+    """Yields one result row per path, in path order, pricing them across `workers` processes."""
+    if workers <= 1:
+        yield from map(price_scenario_file, paths)
+        return
+    chunksize = max(1, len(paths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(price_scenario_file, paths, chunksize=chunksize)
+
+def write_jsonl(rows, out):
+    for row in rows:
+        out.write(json.dumps(row) + "\n")
+        out.flush()
+
+def write_csv(rows, out):
+    writer = None
+    pending = []
+    for row in rows:
+        if writer is None:
+            # The first successful row fixes the columns; failures only carry the id columns,
+            # so they are held back until a success (or the end of the input) sets the header.
+            if row["error"]:
+                pending.append(row)
+                continue
+            writer = _csv_writer(row, out)
+            writer.writerows(pending)
+            pending = []
+        writer.writerow(row)
+        out.flush()
+    if pending:
+        _csv_writer(pending[0], out).writerows(pending)
+        out.flush()
+
+def _csv_writer(row, out):
+    fieldnames = ["file", "scenario"] + [k for k in row if k not in ("file", "scenario", "error")] + ["error"]
+    writer = csv.DictWriter(out, fieldnames=fieldnames, restval="", extrasaction="ignore")
+    writer.writeheader()
+    return writer
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Price a directory of cost scenarios.")
+    parser.add_argument("directory", help="Directory searched recursively for .json/.yaml/.yml scenario files")
+    parser.add_argument("-o", "--output", help="Output file (default: stdout)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Output format (default: from the output suffix, else csv)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    paths = find_scenario_files(args.directory)
+    if not paths:
+        parser.error(f"no scenario files found in {args.directory}")
+
+    fmt = args.format or ("jsonl" if args.output and args.output.endswith(".jsonl") else "csv")
+    out = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    failed = []
+
+    def tracked(rows):
+        for row in rows:
+            if row["error"]:
+                failed.append(row["file"])
+            yield row
+
+    try:
+        writer = write_jsonl if fmt == "jsonl" else write_csv
+        writer(tracked(iter_results(paths, args.workers)), out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(f"Priced {len(paths)} scenario(s), {len(failed)} failed.", file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
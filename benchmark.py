@@ -0,0 +1,259 @@
+# benchmark.py
+# Benchmarks for the cost calculations and for a full app rerun:
+#
+#   python benchmark.py -o bench.json                          # run everything, write results
+#   python benchmark.py --suite core --sizes 10,1000,100000
+#   python benchmark.py -o bench.json --baseline baseline.json # also flag regressions (exit code 1)
+#   python benchmark.py --compare baseline.json bench.json     # compare two stored result files
+#
+# "core" times the pure cost functions (cost_core) on synthetic inputs of 10 to 1M jobs, zones and
+# warehouses. "app" times main.py full and fragment reruns through Streamlit's headless AppTest harness with a given
+# number of jobs per tier. Every benchmark reports the median of several repeats in seconds.
+import argparse
+import functools
+import inspect
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import chargeback
+import cost_core
+from data import DBU_RATES, INSTANCE_LIST, S3_STORAGE_CLASSES, SQL_WAREHOUSE_SIZES
+
+DEFAULT_SIZES = [10, 100, 1_000, 10_000, 100_000, 1_000_000]
+DEFAULT_APP_JOBS = [3, 1_000]
+DEFAULT_THRESHOLD = 0.20        # a median this much slower than the baseline is a regression
+MIN_REPEATS, MAX_REPEATS = 3, 25
+TARGET_SECONDS = 1.0            # repeat a benchmark until roughly this much time is spent on it
+APP_SCRIPT = Path(__file__).with_name("main.py")
+
+# --- Synthetic inputs ---
+def synthetic_jobs(n, seed=0):
+    """A tier job frame with n random jobs, shaped like the ones the app keeps in session state."""
+    rng = np.random.default_rng(seed)
+    jobs = pd.DataFrame({
+        "#": np.arange(1, n + 1),
+        "Job Name": [f"Job {i}" for i in range(1, n + 1)],
+        "Runtime (hrs)": rng.uniform(0.1, 4.0, n).round(2),
+        "Runs/Month": rng.integers(1, 720, n),
+        "Instance Type": rng.choice(INSTANCE_LIST, n),
+        "Nodes": rng.integers(1, 16, n),
+        "Photon": rng.random(n) < 0.5,
+        "Spot": rng.random(n) < 0.5,
+    })
+    # Chargeback tags: a few orgs, a few dozen teams and many pipelines, some of them untagged
+    return jobs.assign(
+        Org=rng.choice(["", "Retail", "Finance", "Operations", "Marketing"], n),
+        Team=[f"Team {i}" for i in rng.integers(0, 40, n)],
+        Pipeline=[f"Pipeline {i}" for i in rng.integers(0, max(n // 50, 1), n)],
+    )
+
+def synthetic_s3_scenario(n, seed=0):
+    rng = np.random.default_rng(seed)
+    classes = rng.choice(S3_STORAGE_CLASSES, n)
+    return {
+        "s3_calc_method": "Direct Storage",
+        "s3_direct": {
+            f"Zone {i}": {"class": str(classes[i]), "amount": int(amount), "unit": "GB", "put": int(put), "get": int(get)}
+            for i, (amount, put, get) in enumerate(zip(rng.integers(0, 10_000, n), rng.integers(0, 1_000, n), rng.integers(0, 10_000, n)))
+        },
+    }
+
+def synthetic_sql_scenario(n, seed=0):
+    rng = np.random.default_rng(seed)
+    sizes = rng.choice(SQL_WAREHOUSE_SIZES, n)
+    return {
+        "sql_warehouses": [
+            {"id": f"warehouse_{i}", "name": f"Warehouse {i}", "size": str(sizes[i]), "hours_per_day": int(hours),
+             "days_per_month": int(days), "auto_suspend": True, "suspend_after": 10}
+            for i, (hours, days) in enumerate(zip(rng.integers(1, 24, n), rng.integers(1, 31, n)))
+        ],
+    }
+
+# --- Timing ---
+def time_call(func, *args):
+    """Runs func(*args) repeatedly; returns {"median_s", "min_s", "repeats"}."""
+    timings = []
+    start = time.perf_counter()
+    while len(timings) < MIN_REPEATS or (len(timings) < MAX_REPEATS and time.perf_counter() - start < TARGET_SECONDS):
+        t0 = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - t0)
+    return {"median_s": statistics.median(timings), "min_s": min(timings), "repeats": len(timings)}
+
+def run_core(sizes, log):
+    """Times the three cost_core calculations, a row-level job edit and the chargeback rollup at each input size."""
+    tier = next(iter(DBU_RATES))
+    results = {}
+    for n in sizes:
+        jobs = cost_core.compact_jobs(synthetic_jobs(n))
+        costed = {tier: cost_core.calculate_databricks_costs_for_tier(jobs, tier)[0]}
+        items = chargeback.cost_items({"sql_warehouses": []}, costed, {}, {})
+        cases = {
+            f"core/databricks_tier/{n}": (cost_core.calculate_databricks_costs_for_tier, jobs, tier),
+            f"core/s3_per_zone/{n}": (cost_core.calculate_s3_cost_per_zone, synthetic_s3_scenario(n)),
+            f"core/sql_warehouse/{n}": (cost_core.calculate_sql_warehouse_cost, synthetic_sql_scenario(n)),
+            # A data_editor delta touching the compact frame's integer columns as well as a float one
+            f"core/job_edits/{n}": (cost_core.apply_job_edits, jobs, costed[tier], tier,
+                                    {0: {"Nodes": 3, "Runs/Month": 10}, n - 1: {"Runtime (hrs)": 1.5, "Nodes": None}}),
+            f"core/chargeback_items/{n}": (chargeback.cost_items, {"sql_warehouses": []}, costed, {}, {}),
+            f"core/chargeback_rollup/{n}": (chargeback.rollup, items),
+        }
+        for name, (func, *args) in cases.items():
+            results[name] = time_call(func, *args)
+            log(name, results[name])
+    return results
+
+def run_app(jobs_per_tier, log):
+    """
+    Times main.py through AppTest: the first (cold) run, then warm reruns with nothing changed
+    and with one job edited the way the data_editor callback does it (state.apply_tier_edits re-prices
+    the edited row and re-sums the tier). An edit is timed twice: followed by a full run, and followed
+    by the Databricks fragment's own rerun, which is what the app does after an edit in that tab.
+    """
+    from unittest import mock
+    import streamlit as st
+    from streamlit.runtime.scriptrunner import RerunData
+    from streamlit.testing.v1 import AppTest
+    from state import apply_tier_edits
+
+    results = {}
+    for n in jobs_per_tier:
+        at = AppTest.from_file(str(APP_SCRIPT), default_timeout=600)
+        t0 = time.perf_counter()
+        at.run()
+        elapsed = time.perf_counter() - t0
+        results[f"app/cold_run/{n}"] = {"median_s": elapsed, "min_s": elapsed, "repeats": 1}
+        if at.exception:
+            raise RuntimeError(f"main.py raised during the benchmark: {at.exception[0].value}")
+        log(f"app/cold_run/{n}", results[f"app/cold_run/{n}"])
+
+        # Replace every tier with n synthetic jobs in the compact layout the app stores, as an import would.
+        for i, tier in enumerate(DBU_RATES):
+            at.session_state.dbx_jobs[tier] = cost_core.compact_jobs(synthetic_jobs(n, seed=i))
+            at.session_state[f"num_jobs_{tier}"] = n
+        at.session_state.dbx_costs = {}
+        at.run()
+
+        results[f"app/rerun/{n}"] = time_call(at.run)
+        log(f"app/rerun/{n}", results[f"app/rerun/{n}"])
+
+        tier = next(iter(DBU_RATES))
+        edits = itertools.count()
+        def edit():
+            # A float and two integer columns (the compact frame's int32 ones), each to a new value.
+            # The callback runs outside the script here, so point it at the test session's state.
+            i = next(edits)
+            with mock.patch.object(st, "session_state", at.session_state):
+                apply_tier_edits(tier, {0: {"Runtime (hrs)": 0.5 + i % 10 / 4, "Nodes": 1 + i % 8, "Runs/Month": 10 + i % 20}})
+
+        def edit_and_rerun():
+            edit()
+            at.run()
+        results[f"app/edit_rerun/{n}"] = time_call(edit_and_rerun)
+        log(f"app/edit_rerun/{n}", results[f"app/edit_rerun/{n}"])
+
+        # AppTest only starts full runs; a fragment rerun is requested by queueing the fragment's id.
+        # Its element tree then holds just the fragment, so the full run's tree is put back afterwards
+        # or the next run would drop the state of every widget outside the fragment.
+        fragment_rerun = functools.partial(RerunData, fragment_id_queue=[_fragment_id(at, "databricks_fragment")])
+        full_tree = at._tree
+        def edit_and_fragment_rerun():
+            edit()
+            with mock.patch("streamlit.testing.v1.local_script_runner.RerunData", fragment_rerun):
+                at.run()
+            if at.exception:
+                raise RuntimeError(f"main.py raised during the benchmark: {at.exception[0].value}")
+            at._tree = full_tree
+        results[f"app/edit_fragment_rerun/{n}"] = time_call(edit_and_fragment_rerun)
+        log(f"app/edit_fragment_rerun/{n}", results[f"app/edit_fragment_rerun/{n}"])
+    return results
+
+def _fragment_id(at, name):
+    """The id of the app's fragment function `name`, from the fragments AppTest registered on its last run."""
+    # Relies on AppTest / st.fragment internals: registered fragments are closures over the decorated function.
+    for fragment_id, fragment in at._fragment_storage._fragments.items():
+        if getattr(inspect.getclosurevars(fragment).nonlocals.get("non_optional_func"), "__name__", None) == name:
+            return fragment_id
+    raise RuntimeError(f"main.py has no fragment named {name!r}")
+
+# --- Results files ---
+def environment():
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+    }
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares median timings of two result documents. Returns one row per benchmark present in both,
+    with the ratio current / baseline and whether it exceeds 1 + threshold.
+    """
+    rows = []
+    for name, result in current["results"].items():
+        if name not in baseline["results"]:
+            continue
+        before, after = baseline["results"][name]["median_s"], result["median_s"]
+        ratio = after / before if before > 0 else float("inf")
+        rows.append({"benchmark": name, "baseline_s": before, "current_s": after, "ratio": ratio,
+                     "regression": ratio > 1 + threshold})
+    return rows
+
+def print_comparison(rows, out=sys.stderr):
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else ("faster" if row["ratio"] < 1 else "")
+        print(f"{row['benchmark']:<36} {row['baseline_s'] * 1e3:>11.3f} ms -> {row['current_s'] * 1e3:>11.3f} ms "
+              f"({row['ratio']:5.2f}x) {flag}", file=out)
+
+def _int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the cost calculations and the app rerun.")
+    parser.add_argument("-o", "--output", help="Write results as JSON to this file")
+    parser.add_argument("--suite", choices=["core", "app", "all"], default="all")
+    parser.add_argument("--sizes", type=_int_list, default=DEFAULT_SIZES, help="Comma-separated input sizes for the core suite")
+    parser.add_argument("--app-jobs", type=_int_list, default=DEFAULT_APP_JOBS, help="Comma-separated jobs per tier for the app suite")
+    parser.add_argument("--baseline", help="Compare the new results against this results file")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="Only compare two existing results files")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed slowdown before flagging (default: 0.20 = 20%%)")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        baseline, current = (json.loads(Path(path).read_text(encoding="utf-8")) for path in args.compare)
+    else:
+        def log(name, result):
+            print(f"{name:<36} {result['median_s'] * 1e3:>11.3f} ms  (x{result['repeats']})", file=sys.stderr)
+
+        current = {"environment": environment(), "results": {}}
+        if args.suite in ("core", "all"):
+            current["results"].update(run_core(args.sizes, log))
+        if args.suite in ("app", "all"):
+            current["results"].update(run_app(args.app_jobs, log))
+        if args.output:
+            Path(args.output).write_text(json.dumps(current, indent=2) + "\n", encoding="utf-8")
+        if not args.baseline:
+            return 0
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+
+    rows = compare_results(baseline, current, args.threshold)
+    print_comparison(rows)
+    regressions = [row["benchmark"] for row in rows if row["regression"]]
+    print(f"{len(rows)} benchmark(s) compared, {len(regressions)} regression(s).", file=sys.stderr)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
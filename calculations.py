@@ -1,89 +1,201 @@
 # calculations.py
+# Streamlit-facing wrappers: the math lives in cost_core and is fed from st.session_state.
+# Each component is memoized on the content of its own inputs, so a rerun only
+# recomputes the tiers / configs that actually changed (see memo.py).
+import os
+from collections import Counter
 import streamlit as st
-import pandas as pd
-from data import DBU_RATES, FLAT_INSTANCE_LIST, S3_PRICING, SQL_WAREHOUSE_PRICING, PHOTON_PREMIUM_MULTIPLIER, SPOT_DISCOUNT_MULTIPLIER
+import cost_core
+import simulation
+import projection
+import optimizer
+import regions
+import scenario_store
+import chargeback
+from memo import fingerprint, memoize
+from profiling import timed
+from state import current_scenario
+from data import DBU_RATES
 
-def calculate_databricks_costs_for_tier(jobs_df, tier):
-    """
-    Calculates costs for a specific tier's DataFrame.
-    Returns a new DataFrame with calculated columns and total costs for the tier.
-    """
-    if jobs_df.empty:
-        return pd.DataFrame(columns=["#", "Job Name", "Runtime (hrs)", "Runs/Month", "Instance Type", "Nodes", "Photon", "Spot", "DBU Cost", "EC2 Cost", "Total Cost"]), 0, 0
+# One entry per tier per distinct job frame; a few edits' worth of history is plenty.
+calculate_databricks_costs_for_tier = memoize(maxsize=32)(cost_core.calculate_databricks_costs_for_tier)
 
-    df = jobs_df.copy()
-    base_dbu_rate = DBU_RATES[tier]
+def _s3_scenario():
+    keys = ["s3_calc_method", "s3_direct", "s3_table_based", "s3_lifecycle", "s3_lifecycle_horizon", "s3_inventory"]
+    # Fingerprinting a large table inventory isn't free, so it is only part of the key when it is used.
+    if st.session_state.s3_calc_method == "Table Inventory":
+        keys.append("s3_inventory_tables")
+    return {key: st.session_state[key] for key in keys}
 
-    # Calculate DBU Rate per job
-    DBU_cost = df.apply(
-        lambda row: base_dbu_rate * PHOTON_PREMIUM_MULTIPLIER if row['Photon'] else base_dbu_rate,
-        axis=1
-    )
+@memoize(maxsize=16)
+def _s3_cost_per_zone(s3_scenario):
+    return cost_core.calculate_s3_cost_per_zone(s3_scenario)
+
+@memoize(maxsize=8)
+def _simulate_s3_lifecycle(s3_scenario):
+    return cost_core.simulate_s3_lifecycle(s3_scenario)
+
+@memoize(maxsize=4)
+def _price_s3_inventory(s3_inventory, s3_inventory_tables):
+    return cost_core.price_s3_inventory({"s3_inventory": s3_inventory, "s3_inventory_tables": s3_inventory_tables})
 
-    # Calculate EC2 Cost per job
-    def get_ec2_cost(row):
-        ec2_rate = FLAT_INSTANCE_LIST.get(row["Instance Type"], 0) * (SPOT_DISCOUNT_MULTIPLIER if row["Spot"] else 1.0)
-        return row["Runtime (hrs)"] * row["Runs/Month"] * row["Nodes"] * ec2_rate
-    df['EC2 Cost'] = df.apply(get_ec2_cost, axis=1)
-
-    # Calculate DBU Cost per job
-    def get_dbu_cost(row):
-        return row["Runtime (hrs)"] * row["Runs/Month"] * row["Nodes"] 
-    df['DBU Cost'] = df.apply(get_dbu_cost, axis=1)
-
-    # Create the formatted Cost string
-    def format_cost_string(row):
-        total_job_cost = row['DBU Cost'] + row['EC2 Cost']
-        return f"${total_job_cost:,.2f}\nDBU: ${row['DBU Cost']:,.2f}\nEC2: ${row['EC2 Cost']:,.2f}"
-    df['Cost'] = df.apply(format_cost_string, axis=1)
-    
-    # Calculate total costs for the tier
-    total_dbu_cost = df['DBU Cost'].sum()
-    total_ec2_cost = df['EC2 Cost'].sum()
-
-    return df, total_dbu_cost, total_ec2_cost
+@memoize(maxsize=16)
+def _sql_warehouse_costs(sql_warehouses):
+    return cost_core.calculate_sql_warehouse_costs({"sql_warehouses": sql_warehouses})
 
+# Recommendations per tier frame and constraint set
+_optimize_jobs = memoize(maxsize=8)(optimizer.optimize_jobs)
+
+@timed
+def calculate_databricks_costs():
+    """
+    Returns {tier: {"df", "dbu_cost", "ec2_cost"}} for every tier.
+    Tiers already costed this session (and kept current by row-level edits) are reused as-is.
+    """
+    for tier in DBU_RATES.keys():
+        if tier not in st.session_state.dbx_costs:
+            df_with_costs, dbu_cost, ec2_cost = calculate_databricks_costs_for_tier(st.session_state.dbx_jobs[tier], tier)
+            st.session_state.dbx_costs[tier] = {"df": df_with_costs, "dbu_cost": dbu_cost, "ec2_cost": ec2_cost}
+    return dict(st.session_state.dbx_costs)
+
+@timed
 def calculate_s3_cost_per_zone():
     """
     Calculates S3 cost for each individual zone and the total cost.
     """
-    costs_per_zone = {}
-    total_s3_cost = 0
-
-    if "s3_calc_method" not in st.session_state:
-        st.session_state["s3_calc_method"] = "Direct Storage"
-        for zone, config in st.session_state.s3_direct.items():
-            pricing = S3_PRICING.get(config["class"], {"storage_gb": 0, "put_1k": 0, "get_1k": 0})
-            storage_gb = config["amount"] * 1024 if config["unit"] == "TB" else config["amount"]
-            
-            storage_cost = storage_gb * pricing["storage_gb"]
-            put_cost = config["put"] * pricing["put_1k"]
-            get_cost = config["get"] * pricing["get_1k"]
-            
-            zone_cost = storage_cost + put_cost + get_cost
-            costs_per_zone[zone] = zone_cost
-            total_s3_cost += zone_cost
-            
-    else: # Table-Based
-        standard_pricing = S3_PRICING["Standard"]
-        for zone, config in st.session_state.s3_table_based.items():
-            total_records = config["tables"] * config["records"]
-            estimated_gb = (total_records * config["size_kb"]) / (1024 * 1024)
-            
-            zone_cost = estimated_gb * standard_pricing["storage_gb"]
-            costs_per_zone[zone] = zone_cost
-            total_s3_cost += zone_cost
-            
-    return costs_per_zone, total_s3_cost
+    return _s3_cost_per_zone(_s3_scenario())
+
+def simulate_s3_lifecycle():
+    """Month-by-month lifecycle simulation of every zone (see cost_core.simulate_s3_lifecycle)."""
+    return _simulate_s3_lifecycle(_s3_scenario())
 
+def price_s3_inventory():
+    """Per-table costs of the S3 table inventory (see cost_core.price_s3_inventory)."""
+    return _price_s3_inventory(st.session_state.s3_inventory, st.session_state.s3_inventory_tables)
+
+@timed
 def calculate_sql_warehouse_cost():
     """Calculates total SQL Warehouse cost from session state."""
-    total_sql_cost = 0
-    for warehouse in st.session_state.sql_warehouses:
-        if warehouse["auto_suspend"] and warehouse["hours_per_day"] > 0 and warehouse["days_per_month"] > 0:
-            size_key = warehouse["size"].split(" - ")[0]
-            hourly_rate = SQL_WAREHOUSE_PRICING.get(size_key, {}).get("cost_per_hr", 0)
-            cost = hourly_rate * warehouse["hours_per_day"] * warehouse["days_per_month"]
-            total_sql_cost += cost
-            
-    return total_sql_cost
\ No newline at end of file
+    return sum(calculate_sql_warehouse_costs().values())
+
+def calculate_sql_warehouse_costs():
+    """Returns {warehouse id: monthly cost} from session state."""
+    return _sql_warehouse_costs(st.session_state.sql_warehouses)
+
+@memoize(maxsize=8)
+def _simulate_databricks_costs(dbx_jobs, params):
+    return simulation.simulate_databricks_costs(dbx_jobs, params, workers=os.cpu_count() or 1)
+
+@timed
+def simulate_cost_distribution(fixed_cost):
+    """
+    Monte Carlo percentile bands of the monthly total using the settings in session_state.simulation.
+    S3 and SQL Warehouse costs are deterministic and passed in as fixed_cost.
+    """
+    trial_totals = _simulate_databricks_costs(st.session_state.dbx_jobs, st.session_state.simulation)
+    return simulation.summarize(trial_totals, fixed_cost)
+
+def projection_components():
+    """
+    Lists every projectable component with its current monthly cost and projection settings.
+    Returns a dict of equal-length lists: id, label, group, cost, growth (% per month) and start (month).
+    Components without an override grow at the global monthly growth rate (Databricks and S3)
+    or stay flat (SQL Warehouses), as the single 12-month figure always assumed.
+    Labels are unique: components that would share one (warehouses with the same name) get their id appended.
+    """
+    settings = st.session_state.projection
+    default_growth = st.session_state.monthly_growth_percent
+    components = {"id": [], "label": [], "group": [], "cost": [], "default_growth": []}
+
+    def add(component_id, label, group, cost, growth):
+        components["id"].append(component_id)
+        components["label"].append(label)
+        components["group"].append(group)
+        components["cost"].append(float(cost))
+        components["default_growth"].append(growth)
+
+    for tier, data in calculate_databricks_costs().items():
+        add(f"dbx:{tier}", f"Databricks {tier}", "Databricks & Compute", data["dbu_cost"] + data["ec2_cost"], default_growth)
+    s3_costs_per_zone, _ = calculate_s3_cost_per_zone()
+    for zone, cost in s3_costs_per_zone.items():
+        add(f"s3:{zone}", f"S3 {zone}", "S3 Storage", cost, default_growth)
+    names = {warehouse["id"]: warehouse["name"] for warehouse in st.session_state.sql_warehouses}
+    for warehouse_id, cost in calculate_sql_warehouse_costs().items():
+        add(f"sql:{warehouse_id}", f"SQL {names[warehouse_id]}", "SQL Warehouse", cost, 0.0)
+
+    counts = Counter(components["label"])
+    components["label"] = [f"{label} ({component_id.split(':', 1)[1]})" if counts[label] > 1 else label
+                           for label, component_id in zip(components["label"], components["id"])]
+    components["growth"] = [settings["growth"].get(c, g) for c, g in zip(components["id"], components.pop("default_growth"))]
+    components["start"] = [settings["start"].get(c, 1) for c in components["id"]]
+    return components
+
+@timed
+def project_costs(horizon=None):
+    """
+    Runs the projection engine over projection_components() and the configured step changes.
+    Returns (components, matrix) where matrix has one row per month and one column per component.
+    """
+    settings = st.session_state.projection
+    components = projection_components()
+    position = {component_id: i for i, component_id in enumerate(components["id"])}
+    steps = [step for step in settings["steps"] if step["component"] in position]
+    matrix = projection.project(
+        components["cost"], components["growth"], components["start"],
+        horizon=horizon or settings["horizon"],
+        steps={
+            "component": [position[step["component"]] for step in steps],
+            "month": [step["month"] for step in steps],
+            "delta": [step["delta"] for step in steps],
+        },
+    )
+    return components, matrix
+
+@timed
+def optimize_databricks_jobs():
+    """Returns {tier: recommendations DataFrame} for every tier under session_state.optimizer's constraints."""
+    return {tier: _optimize_jobs(st.session_state.dbx_jobs[tier], tier, st.session_state.optimizer) for tier in DBU_RATES.keys()}
+
+@memoize(maxsize=4)
+def _region_cost_matrix(dbx_jobs, s3_scenario, sql_warehouses, selected_regions):
+    return regions.region_cost_matrix({"dbx_jobs": dbx_jobs, **s3_scenario, "sql_warehouses": sql_warehouses}, selected_regions)
+
+@timed
+def compare_regions(selected_regions=None):
+    """
+    Monthly cost of every component in every region, from session state.
+    Returns (components, regions, matrix); see regions.region_cost_matrix.
+    """
+    return _region_cost_matrix(st.session_state.dbx_jobs, _s3_scenario(), st.session_state.sql_warehouses, selected_regions)
+
+@memoize(maxsize=4)
+def _compare_scenarios(scenarios):
+    return scenario_store.compare_scenarios(scenarios)
+
+@timed
+def compare_scenarios(labels, current_label):
+    """
+    Compares saved scenarios (and the session's own configuration under current_label) by component and job.
+    See scenario_store.compare_scenarios.
+    """
+    scenarios = {label: current_scenario() if label == current_label else scenario_store.load_scenario(label) for label in labels}
+    return _compare_scenarios(scenarios)
+
+@timed
+def chargeback_rollup():
+    """
+    Chargeback cost items and their org / team / pipeline rollup from session state (see chargeback.py).
+    Kept per session: the costed tier frames are compared by identity (edits replace them), so a rerun
+    that changed nothing reuses the rollup without fingerprinting every job again.
+    """
+    costed = {tier: data["df"] for tier, data in calculate_databricks_costs().items()}
+    s3_costs_per_zone, _ = calculate_s3_cost_per_zone()
+    sql_costs = calculate_sql_warehouse_costs()
+    warehouses = [(w["id"], w["name"], w.get("tags")) for w in st.session_state.sql_warehouses]
+    key = fingerprint([s3_costs_per_zone, sql_costs, st.session_state.s3_zone_tags, warehouses])
+
+    cached = st.session_state.get("chargeback")
+    if cached is None or cached["key"] != key or any(cached["jobs"].get(tier) is not df for tier, df in costed.items()):
+        items = chargeback.cost_items(current_scenario(), costed, s3_costs_per_zone, sql_costs)
+        cached = st.session_state.chargeback = {"key": key, "jobs": costed, "items": items, "rollup": chargeback.rollup(items)}
+    return cached["items"], cached["rollup"]
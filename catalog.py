@@ -0,0 +1,271 @@
+# catalog.py
+# Pricing catalog compiled from offline price-list files.
+#
+# Supported sources:
+#   * AWS bulk price-list CSV offer files (e.g. AmazonEC2 / AmazonS3 index.csv, with the
+#     5-line metadata preamble) and the equivalent JSON offer files.
+#   * A plain catalog CSV with the columns sku,kind,name,region,price[,unit,family,vcpu,memory_gib,dbu_per_hour],
+#     which is how Databricks DBU / SQL Warehouse rates are supplied.
+#
+# A source is parsed once and compiled into a directory of .npy columns next to it (or in
+# cache_dir). Later loads memory-map those columns, so startup cost does not grow with the
+# size of the source file. Rows are sorted by SKU, and a second sorted key array indexes
+# (kind, region, name), so both kinds of lookup are binary searches.
+#
+# This module deliberately does not import data.py at module level: data.py imports it
+# when DBU_CALC_PRICE_LIST is set.
+import csv
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+DEFAULT_REGION = "us-east-1"
+CATALOG_COLUMNS = ["sku", "kind", "name", "region", "family", "unit", "price", "vcpu", "memory_gib", "dbu_per_hour"]
+_STRING_COLUMNS = ["sku", "kind", "name", "region", "family", "unit"]
+_KEY_SEP = "\x1f"
+_CACHE_FORMAT_VERSION = 1
+
+# AWS attribute names differ between the CSV and JSON offer files; normalize to the JSON spelling.
+_AWS_CSV_ATTRIBUTES = {
+    "Product Family": "productFamily", "Instance Type": "instanceType", "Instance Family": "instanceFamily",
+    "vCPU": "vcpu", "Memory": "memory", "Operating System": "operatingSystem", "Tenancy": "tenancy",
+    "Pre Installed S/W": "preInstalledSw", "CapacityStatus": "capacitystatus", "License Model": "licenseModel",
+    "Region Code": "regionCode", "Location": "location", "Volume Type": "volumeType",
+}
+
+# S3 volume types as named in the AWS price list -> storage class names used by the calculator.
+_S3_VOLUME_TYPES = {
+    "Standard": "Standard",
+    "Intelligent-Tiering Frequent Access": "Intelligent-Tiering",
+    "Standard - Infrequent Access": "Infrequent Access",
+    "Glacier Instant Retrieval": "Glacier Instant Retrieval",
+}
+
+# --- Parsing ---
+def _to_float(value):
+    try:
+        return float(str(value).replace(",", "").split(" ")[0])
+    except ValueError:
+        return np.nan
+
+def _aws_record(sku, attrs, unit, price, starting_range="0"):
+    """Turns one AWS on-demand price dimension into a catalog record, or None if it is not one we price."""
+    region = attrs.get("regionCode") or attrs.get("location", "")
+    family = attrs.get("productFamily", "")
+
+    if family == "Compute Instance" and unit == "Hrs":
+        if (attrs.get("operatingSystem") != "Linux" or attrs.get("tenancy") != "Shared"
+                or attrs.get("preInstalledSw", "NA") != "NA" or attrs.get("capacitystatus", "Used") != "Used"):
+            return None
+        return {
+            "sku": sku, "kind": "ec2", "name": attrs["instanceType"], "region": region,
+            "family": attrs.get("instanceFamily", "").title(), "unit": unit, "price": price,
+            "vcpu": _to_float(attrs.get("vcpu")), "memory_gib": _to_float(attrs.get("memory")),
+        }
+
+    if family == "Storage" and unit == "GB-Mo" and str(starting_range) in ("0", "0.0", ""):
+        volume_type = attrs.get("volumeType", "")
+        return {
+            "sku": sku, "kind": "s3_storage", "name": _S3_VOLUME_TYPES.get(volume_type, volume_type),
+            "region": region, "unit": unit, "price": price,
+        }
+
+    return None
+
+def _iter_aws_csv(f):
+    # Skip the metadata preamble ("FormatVersion", "Disclaimer", ...) up to the real header.
+    reader = csv.reader(f)
+    for header in reader:
+        if header and header[0] == "SKU":
+            break
+    else:
+        return
+    columns = {name: i for i, name in enumerate(header)}
+    attribute_columns = [(columns[name], key) for name, key in _AWS_CSV_ATTRIBUTES.items() if name in columns]
+    sku_i, term_i, unit_i, price_i = columns["SKU"], columns["TermType"], columns["Unit"], columns["PricePerUnit"]
+    range_i = columns.get("StartingRange")
+
+    for row in reader:
+        if len(row) != len(header) or row[term_i] != "OnDemand":
+            continue
+        attrs = {key: row[i] for i, key in attribute_columns}
+        record = _aws_record(row[sku_i], attrs, row[unit_i], _to_float(row[price_i]),
+                             row[range_i] if range_i is not None else "0")
+        if record:
+            yield record
+
+def _iter_aws_json(f):
+    offer = json.load(f)
+    on_demand = offer.get("terms", {}).get("OnDemand", {})
+    for sku, product in offer.get("products", {}).items():
+        attrs = {"productFamily": product.get("productFamily", ""), **product.get("attributes", {})}
+        for term in on_demand.get(sku, {}).values():
+            for dimension in term.get("priceDimensions", {}).values():
+                record = _aws_record(sku, attrs, dimension.get("unit", ""),
+                                     _to_float(dimension.get("pricePerUnit", {}).get("USD", "nan")),
+                                     dimension.get("beginRange", "0"))
+                if record:
+                    yield record
+
+def _iter_plain_csv(f):
+    for row in csv.DictReader(f):
+        yield {key: value for key, value in row.items() if key in CATALOG_COLUMNS and value != ""}
+
+def iter_price_records(source_path):
+    """Streams catalog records (dicts) out of a price-list file, whatever its format."""
+    source_path = Path(source_path)
+    with open(source_path, newline="", encoding="utf-8-sig") as f:
+        if source_path.suffix.lower() == ".json":
+            yield from _iter_aws_json(f)
+            return
+        first_line = f.readline()
+        f.seek(0)
+        if first_line.lstrip('"').startswith("FormatVersion") or first_line.startswith('"SKU"'):
+            yield from _iter_aws_csv(f)
+        else:
+            yield from _iter_plain_csv(f)
+
+# --- Building and indexing ---
+def _lookup_keys(kind, region, name):
+    return np.char.add(np.char.add(np.char.add(np.char.add(kind, _KEY_SEP), region), _KEY_SEP), name)
+
+def build_catalog(records):
+    """Builds an in-memory catalog (dict of column arrays plus lookup indexes) from records."""
+    records = list(records)
+    columns = {}
+    for column in CATALOG_COLUMNS:
+        values = [r.get(column, "" if column in _STRING_COLUMNS else np.nan) for r in records]
+        columns[column] = np.array(values, dtype=str if column in _STRING_COLUMNS else float)
+
+    # Deduplicate SKUs (keep the first occurrence) and store rows in SKU order.
+    _, first = np.unique(columns["sku"], return_index=True)
+    columns = {column: values[first] for column, values in columns.items()}
+
+    keys = _lookup_keys(columns["kind"], columns["region"], columns["name"])
+    key_order = np.argsort(keys, kind="stable")
+    columns["key_order"] = key_order
+    columns["sorted_keys"] = keys[key_order]
+    return columns
+
+def builtin_catalog():
+    """Catalog built from the sample prices in data.py (used when no price-list file is configured)."""
+    from data import INSTANCE_PRICES, INSTANCE_SPECS, DBU_RATES, S3_PRICING, SQL_WAREHOUSE_PRICING
+
+    records = []
+    for family, instances in INSTANCE_PRICES.items():
+        for name, price in instances.items():
+            records.append({"sku": f"builtin:ec2:{name}", "kind": "ec2", "name": name, "family": family,
+                            "unit": "Hrs", "price": price, **INSTANCE_SPECS.get(name, {})})
+    for tier, rate in DBU_RATES.items():
+        records.append({"sku": f"builtin:dbu:{tier}", "kind": "dbu", "name": tier, "unit": "DBU", "price": rate})
+    for storage_class, pricing in S3_PRICING.items():
+        for price_key, unit in (("storage_gb", "GB-Mo"), ("put_1k", "1K Requests"), ("get_1k", "1K Requests")):
+            kind = "s3_storage" if price_key == "storage_gb" else f"s3_{price_key}"
+            records.append({"sku": f"builtin:{kind}:{storage_class}", "kind": kind, "name": storage_class,
+                            "unit": unit, "price": pricing[price_key]})
+    for size, pricing in SQL_WAREHOUSE_PRICING.items():
+        records.append({"sku": f"builtin:sql_warehouse:{size}", "kind": "sql_warehouse", "name": size, "unit": "Hrs",
+                        "price": pricing["cost_per_hr"], "dbu_per_hour": pricing["dbt_per_hr"]})
+
+    for record in records:
+        record.setdefault("region", DEFAULT_REGION)
+    return build_catalog(records)
+
+# --- On-disk cache ---
+def _source_fingerprint(source_path):
+    stat = os.stat(source_path)
+    token = f"{os.path.abspath(source_path)}|{stat.st_size}|{stat.st_mtime_ns}|{_CACHE_FORMAT_VERSION}"
+    return hashlib.sha1(token.encode()).hexdigest()[:16]
+
+def compiled_catalog_path(source_path, cache_dir=None):
+    source_path = Path(source_path)
+    cache_dir = Path(cache_dir) if cache_dir else source_path.parent / ".catalog_cache"
+    return cache_dir / f"{source_path.stem}-{_source_fingerprint(source_path)}"
+
+def compile_catalog(source_path, cache_dir=None):
+    """
+    Compiles a price-list file into its on-disk cache unless an up-to-date one exists.
+    Returns the cache directory. The cache is keyed by the source's path, size and mtime.
+    """
+    target = compiled_catalog_path(source_path, cache_dir)
+    if (target / "meta.json").exists():
+        return target
+
+    catalog = build_catalog(iter_price_records(source_path))
+    target.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f".{target.name}-", dir=target.parent))
+    try:
+        for column, values in catalog.items():
+            np.save(staging / f"{column}.npy", values)
+        meta = {"source": str(source_path), "rows": int(len(catalog["sku"])), "version": _CACHE_FORMAT_VERSION}
+        (staging / "meta.json").write_text(json.dumps(meta))
+        try:
+            staging.rename(target)
+        except OSError:
+            # Another process compiled the same source first; theirs is equivalent.
+            shutil.rmtree(staging, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return target
+
+def load_catalog(source_path=None, cache_dir=None):
+    """
+    Loads the pricing catalog. With no source, returns the built-in sample catalog;
+    otherwise compiles the source once and memory-maps the compiled columns.
+    """
+    if source_path is None:
+        return builtin_catalog()
+    target = compile_catalog(source_path, cache_dir)
+    return {path.stem: np.load(path, mmap_mode="r") for path in target.glob("*.npy")}
+
+# --- Lookups ---
+def lookup_sku(catalog, sku):
+    """Returns the catalog row for a SKU as a dict, or None."""
+    skus = catalog["sku"]
+    pos = int(np.searchsorted(skus, sku))
+    if pos >= len(skus) or skus[pos] != sku:
+        return None
+    return {column: catalog[column][pos].item() for column in CATALOG_COLUMNS}
+
+def lookup_rows(catalog, kind, names, region=DEFAULT_REGION):
+    """Vectorized (kind, region, name) lookup. Returns row positions, -1 where there is no match."""
+    names = np.asarray(names, dtype=str)
+    keys = _lookup_keys(np.full(names.shape, kind), np.full(names.shape, region), names)
+    sorted_keys = catalog["sorted_keys"]
+    if not len(sorted_keys):
+        return np.full(names.shape, -1)
+    pos = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+    found = sorted_keys[pos] == keys
+    return np.where(found, np.asarray(catalog["key_order"])[pos], -1)
+
+def lookup_prices(catalog, kind, names, region=DEFAULT_REGION):
+    """Vectorized price lookup; NaN where the catalog has no entry."""
+    rows = lookup_rows(catalog, kind, names, region)
+    prices = np.asarray(catalog["price"])
+    return np.where(rows >= 0, prices[rows], np.nan)
+
+def lookup_price(catalog, kind, name, region=DEFAULT_REGION):
+    price = lookup_prices(catalog, kind, [name], region)[0]
+    return None if np.isnan(price) else float(price)
+
+def select(catalog, kind, region=DEFAULT_REGION):
+    """Returns {column: array} for every row of one kind in one region, ordered by name."""
+    mask = (np.asarray(catalog["kind"]) == kind) & (np.asarray(catalog["region"]) == region)
+    rows = np.flatnonzero(mask)
+    rows = rows[np.argsort(np.asarray(catalog["name"])[rows], kind="stable")]
+    return {column: np.asarray(catalog[column])[rows] for column in CATALOG_COLUMNS}
+
+def instance_prices_by_family(catalog, region=DEFAULT_REGION):
+    """Builds the {family: {instance type: hourly price}} layout data.py uses from a catalog."""
+    instances = select(catalog, "ec2", region)
+    prices = {}
+    for name, family, price in zip(instances["name"], instances["family"], instances["price"]):
+        if not np.isnan(price):
+            prices.setdefault(str(family) or "Other", {})[str(name)] = float(price)
+    return prices
@@ -0,0 +1,413 @@
+# cost_core.py
+# Pure cost calculations. Nothing in this module may import Streamlit or Plotly:
+# it is shared by the app, the batch CLI and any other headless consumer.
+#
+# A "scenario" is any mapping with the same keys the app keeps in st.session_state
+# (dbx_jobs, s3_calc_method, s3_direct, s3_table_based, s3_lifecycle, s3_inventory, sql_warehouses, ...).
+# A plain dict works, and so does st.session_state itself.
+import copy
+import numpy as np
+import pandas as pd
+from s3_inventory import ZONE_DEFAULTS as INVENTORY_ZONE_DEFAULTS, empty_inventory, normalize_inventory, import_inventory_file, price_inventory, zone_summary
+from query_history import estimate_billed_hours_file
+from s3_lifecycle import DATASET_DEFAULTS as LIFECYCLE_DATASET_DEFAULTS, DEFAULT_HORIZON as LIFECYCLE_HORIZON, simulate_lifecycle
+from data import DBU_RATES, FLAT_INSTANCE_LIST, INSTANCE_LIST, S3_PRICING, SQL_WAREHOUSE_PRICING, SQL_WAREHOUSE_SIZES, PHOTON_PREMIUM_MULTIPLIER, SPOT_DISCOUNT_MULTIPLIER
+
+# Chargeback tags, outermost level first (see chargeback.py); "" is untagged
+TAG_COLUMNS = ["Org", "Team", "Pipeline"]
+JOB_INPUT_COLUMNS = ["#", "Job Name", "Runtime (hrs)", "Runs/Month", "Instance Type", "Nodes", "Photon", "Spot", *TAG_COLUMNS]
+EDITABLE_JOB_COLUMNS = ["Job Name", "Runtime (hrs)", "Runs/Month", "Instance Type", "Nodes", "Photon", "Spot", *TAG_COLUMNS]
+# What a cleared data_editor cell turns into, per column
+_JOB_COLUMN_BLANKS = {"Job Name": "", "Runtime (hrs)": 0.0, "Runs/Month": 0, "Nodes": 0, "Photon": False, "Spot": False,
+                      **{column: "" for column in TAG_COLUMNS}}
+
+# --- Vectorized cost engine ---
+# Instance labels are mapped to positions in a flat price array once at import time.
+# The extra trailing slot holds 0.0 so unknown labels (indexer -1) price at zero,
+# matching the old FLAT_INSTANCE_LIST.get(..., 0) fallback.
+INSTANCE_INDEX = pd.Index(list(FLAT_INSTANCE_LIST.keys()))
+INSTANCE_PRICE_ARRAY = np.append(np.fromiter(FLAT_INSTANCE_LIST.values(), dtype=float), 0.0)
+
+JOB_COST_COLUMNS = ["DBU Units", "DBU Rate", "DBU Cost", "EC2 Cost", "Total Cost"]
+
+# --- Compact job frames ---
+# Every tier frame a session holds uses one layout: Instance Type as a categorical over the priced
+# instance list (one byte per job; the categories are shared by every frame in the process), 32-bit
+# integer counts and bool flags. Unknown instance labels become missing, and price at zero as before.
+# Tags are categoricals over the labels in use (a handful of orgs and teams across thousands of jobs).
+INSTANCE_DTYPE = pd.CategoricalDtype(INSTANCE_LIST)
+
+def compact_jobs(jobs_df):
+    """
+    Returns a tier frame in the compact layout. Columns already in it are shared with the input, not
+    copied, so calling it on a compact frame is free. Frames saved before tags existed get untagged ones.
+    """
+    columns = {}
+    if "Instance Type" in jobs_df and jobs_df["Instance Type"].dtype != INSTANCE_DTYPE:
+        columns["Instance Type"] = pd.Categorical(jobs_df["Instance Type"], dtype=INSTANCE_DTYPE)
+    for column in ("#", "Runs/Month", "Nodes"):
+        if column not in jobs_df:
+            continue
+        values = jobs_df[column]
+        if values.dtype.kind in "iu" and values.dtype != np.int32:
+            columns[column] = values.astype(np.int32)
+        elif values.dtype.kind == "f":
+            # Float counts (imports) are narrowed only if every value is whole; fractional ones (edited in,
+            # exported, or time-weighted node averages) stay float
+            array = values.to_numpy()
+            if np.isfinite(array).all() and (array == np.trunc(array)).all():
+                columns[column] = values.astype(np.int32)
+    for column in ("Photon", "Spot"):
+        if column in jobs_df and jobs_df[column].dtype != bool:
+            columns[column] = jobs_df[column].fillna(False).astype(bool)
+    for column in TAG_COLUMNS:
+        if column not in jobs_df:
+            columns[column] = pd.Categorical.from_codes(np.zeros(len(jobs_df), dtype=np.int8), categories=[""])
+        elif not isinstance(jobs_df[column].dtype, pd.CategoricalDtype):
+            columns[column] = pd.Categorical(jobs_df[column].fillna("").astype(str))
+    return jobs_df.assign(**columns) if columns else jobs_df
+
+def instance_codes(instance_types):
+    """Maps a Series of instance labels to positions in INSTANCE_PRICE_ARRAY (-1 if unknown)."""
+    if isinstance(instance_types.dtype, pd.CategoricalDtype):
+        # Look up each category once, then broadcast through the integer codes.
+        category_codes = np.append(INSTANCE_INDEX.get_indexer(instance_types.cat.categories), -1)
+        return category_codes[instance_types.cat.codes.to_numpy()]
+    return INSTANCE_INDEX.get_indexer(instance_types)
+
+def compute_job_cost_arrays(runtime, runs, nodes, photon, spot, codes, tier):
+    """
+    Computes per-job cost columns for one tier as whole-array operations.
+    All inputs are equal-length numpy arrays; returns a dict of arrays keyed by JOB_COST_COLUMNS.
+    """
+    base_dbu_rate = DBU_RATES[tier]
+    dbu_units = runtime * runs * nodes
+    dbu_rate = np.where(photon, base_dbu_rate * PHOTON_PREMIUM_MULTIPLIER, base_dbu_rate)
+    ec2_rate = INSTANCE_PRICE_ARRAY[codes] * np.where(spot, SPOT_DISCOUNT_MULTIPLIER, 1.0)
+    ec2_cost = dbu_units * ec2_rate
+    # The DBU cost column has always been reported as node-hours (DBU units); keep it that way.
+    dbu_cost = dbu_units
+    return {
+        "DBU Units": dbu_units,
+        "DBU Rate": dbu_rate,
+        "DBU Cost": dbu_cost,
+        "EC2 Cost": ec2_cost,
+        "Total Cost": dbu_cost + ec2_cost,
+    }
+
+def job_input_arrays(jobs_df):
+    """Extracts the engine inputs from a jobs DataFrame as plain numpy arrays."""
+    return {
+        "runtime": jobs_df["Runtime (hrs)"].to_numpy(dtype=float, na_value=np.nan),
+        "runs": jobs_df["Runs/Month"].to_numpy(dtype=float, na_value=np.nan),
+        "nodes": jobs_df["Nodes"].to_numpy(dtype=float, na_value=np.nan),
+        "photon": jobs_df["Photon"].to_numpy(dtype=bool, na_value=False),
+        "spot": jobs_df["Spot"].to_numpy(dtype=bool, na_value=False),
+        "codes": instance_codes(jobs_df["Instance Type"]),
+    }
+
+def calculate_databricks_costs_for_tier(jobs_df, tier):
+    """
+    Calculates costs for a specific tier's DataFrame.
+    Returns a new DataFrame with calculated columns and total costs for the tier.
+    """
+    if jobs_df.empty:
+        return pd.DataFrame(columns=JOB_INPUT_COLUMNS + JOB_COST_COLUMNS), 0, 0
+
+    costs = compute_job_cost_arrays(tier=tier, **job_input_arrays(jobs_df))
+    df = jobs_df.assign(**costs)
+
+    # Calculate total costs for the tier (NaN from half-filled rows is skipped, as pandas sum does)
+    total_dbu_cost = np.nansum(costs["DBU Cost"])
+    total_ec2_cost = np.nansum(costs["EC2 Cost"])
+
+    return df, total_dbu_cost, total_ec2_cost
+
+def apply_job_edits(jobs_df, costed_df, tier, edited_rows):
+    """
+    Applies a data_editor edited_rows delta ({row position: {column: value}}) to a tier.
+    Only the edited rows are re-priced; the tier totals are re-summed from the cost columns.
+    Returns (new jobs frame, new costed frame, total DBU cost, total EC2 cost); the inputs are not modified.
+    """
+    # Shallow copies: every changed column below is replaced wholesale, never written in place.
+    jobs = jobs_df.copy(deep=False)
+    costed = costed_df.copy(deep=False)
+    rows = np.array(sorted(int(r) for r in edited_rows), dtype=int)
+    rows = rows[rows < len(jobs)]
+
+    for column in EDITABLE_JOB_COLUMNS:
+        positions, values = [], []
+        for r, delta in edited_rows.items():
+            if column in delta and int(r) < len(jobs):
+                positions.append(int(r))
+                values.append(_JOB_COLUMN_BLANKS.get(column) if delta[column] is None else delta[column])
+        if not positions:
+            continue
+        updated = jobs[column].copy()
+        if isinstance(updated.dtype, pd.CategoricalDtype):
+            # New tag labels typed into the editor become categories
+            new_labels = list(dict.fromkeys(v for v in values if v is not None and v not in updated.cat.categories))
+            if new_labels:
+                updated = updated.cat.add_categories(new_labels)
+        if updated.dtype.kind in "iu":
+            # Whole numbers are cast to the compact column's own dtype (pandas 3 refuses to set
+            # int64 values into int32); fractional ones widen the column to float, as compact_jobs keeps them.
+            if any(isinstance(v, float) and not float(v).is_integer() for v in values):
+                updated = updated.astype(float)
+            else:
+                values = np.asarray(values).astype(updated.dtype)
+        updated.iloc[positions] = values
+        jobs[column] = updated
+        costed[column] = updated
+
+    if len(rows):
+        costs = compute_job_cost_arrays(tier=tier, **job_input_arrays(jobs.iloc[rows]))
+        for column, values in costs.items():
+            updated = costed[column].copy()
+            updated.iloc[rows] = values
+            costed[column] = updated
+
+    return jobs, costed, np.nansum(costed["DBU Cost"].to_numpy(dtype=float)), np.nansum(costed["EC2 Cost"].to_numpy(dtype=float))
+
+def resize_jobs(jobs_df, num_jobs):
+    """Grows (with blank "New Job" rows) or truncates a tier's job frame to num_jobs rows and renumbers '#'."""
+    current_len = len(jobs_df)
+    if num_jobs > current_len:
+        new_rows = pd.DataFrame([{
+            "Job Name": "New Job", "Runtime (hrs)": 0.0, "Runs/Month": 0,
+            "Instance Type": INSTANCE_LIST[0], "Nodes": 1, "Photon": False, "Spot": False, **{column: "" for column in TAG_COLUMNS}
+        }] * (num_jobs - current_len))
+        updated_df = pd.concat([jobs_df, new_rows], ignore_index=True)
+    else:
+        # A copy-on-write slice shares the original's buffers (head() would copy them)
+        updated_df = jobs_df.iloc[:num_jobs]
+    return compact_jobs(updated_df.assign(**{"#": np.arange(1, len(updated_df) + 1)}))
+
+def calculate_s3_cost_per_zone(scenario):
+    """
+    Calculates S3 cost for each individual zone and the total cost.
+    """
+    costs_per_zone = {}
+    total_s3_cost = 0
+
+    if scenario.get("s3_calc_method", "Direct Storage") == "Direct Storage":
+        for zone, config in scenario["s3_direct"].items():
+            pricing = S3_PRICING.get(config["class"], {"storage_gb": 0, "put_1k": 0, "get_1k": 0})
+            storage_gb = config["amount"] * 1024 if config["unit"] == "TB" else config["amount"]
+
+            storage_cost = storage_gb * pricing["storage_gb"]
+            put_cost = config["put"] * pricing["put_1k"]
+            get_cost = config["get"] * pricing["get_1k"]
+
+            zone_cost = storage_cost + put_cost + get_cost
+            costs_per_zone[zone] = zone_cost
+            total_s3_cost += zone_cost
+
+    elif scenario["s3_calc_method"] == "Lifecycle Simulation":
+        # The zone's monthly figure is its average month over the simulated horizon.
+        zones, simulation = simulate_s3_lifecycle(scenario)
+        for zone, zone_cost in zip(zones, simulation["total_cost"].mean(axis=1)):
+            costs_per_zone[zone] = float(zone_cost)
+            total_s3_cost += float(zone_cost)
+
+    elif scenario["s3_calc_method"] == "Table Inventory":
+        summary = zone_summary(price_s3_inventory(scenario))
+        for zone, zone_cost in zip(summary["Zone"], summary["Cost"]):
+            costs_per_zone[zone] = float(zone_cost)
+            total_s3_cost += float(zone_cost)
+
+    else: # Table-Based
+        standard_pricing = S3_PRICING["Standard"]
+        for zone, config in scenario["s3_table_based"].items():
+            total_records = config["tables"] * config["records"]
+            estimated_gb = (total_records * config["size_kb"]) / (1024 * 1024)
+
+            zone_cost = estimated_gb * standard_pricing["storage_gb"]
+            costs_per_zone[zone] = zone_cost
+            total_s3_cost += zone_cost
+
+    return costs_per_zone, total_s3_cost
+
+def simulate_s3_lifecycle(scenario):
+    """Runs the lifecycle simulation (see s3_lifecycle.py) for every zone; returns (zone names, result arrays)."""
+    zones = list(scenario["s3_lifecycle"])
+    datasets = {key: [scenario["s3_lifecycle"][zone].get(key, default) for zone in zones]
+                for key, default in LIFECYCLE_DATASET_DEFAULTS.items()}
+    return zones, simulate_lifecycle(datasets, scenario.get("s3_lifecycle_horizon", LIFECYCLE_HORIZON))
+
+def price_s3_inventory(scenario):
+    """Prices every table of the scenario's inventory against its zone settings (see s3_inventory.py)."""
+    zone_settings = {zone: {**INVENTORY_ZONE_DEFAULTS, **config} for zone, config in scenario["s3_inventory"].items()}
+    return price_inventory(scenario["s3_inventory_tables"], zone_settings)
+
+def calculate_sql_warehouse_costs(scenario):
+    """Calculates the monthly cost of each SQL Warehouse, keyed by warehouse id."""
+    costs = {}
+    for warehouse in scenario["sql_warehouses"]:
+        cost = 0
+        estimate = warehouse.get("query_history_estimate")
+        if estimate:
+            # Billed cluster-hours measured from a query-history export (see query_history.py)
+            cost = SQL_WAREHOUSE_PRICING.get(warehouse["size"], {}).get("cost_per_hr", 0) * estimate["cluster_hours_per_month"]
+        elif warehouse["auto_suspend"] and warehouse["hours_per_day"] > 0 and warehouse["days_per_month"] > 0:
+            hourly_rate = SQL_WAREHOUSE_PRICING.get(warehouse["size"], {}).get("cost_per_hr", 0)
+            cost = hourly_rate * warehouse["hours_per_day"] * warehouse["days_per_month"]
+        costs[warehouse["id"]] = cost
+    return costs
+
+def estimate_warehouse_from_file(warehouse, path):
+    """
+    Billed-hours estimate for one warehouse from a query-history export, using its suspend and scaling
+    settings. The export's rows for warehouse["query_history_id"] are used, or all of them when it
+    is blank and the export covers a single warehouse.
+    """
+    source_id = warehouse.get("query_history_id")
+    settings = {"auto_suspend": warehouse["auto_suspend"], "suspend_after": warehouse["suspend_after"], "max_clusters": warehouse.get("max_clusters", 1)}
+    if source_id:
+        estimates, report = estimate_billed_hours_file(path, {source_id: settings})
+    else:
+        estimates, report = estimate_billed_hours_file(path, {}, default_settings=settings)
+        if len(estimates) > 1:
+            raise ValueError(f"{path} covers {len(estimates)} warehouses; set query_history_id for {warehouse['name']!r}")
+        source_id = next(iter(estimates), None)
+    if source_id not in estimates:
+        raise ValueError(f"{path} has no queries for warehouse {source_id!r}")
+    return {**estimates[source_id], "days": report["days"]}
+
+def calculate_sql_warehouse_cost(scenario):
+    """Calculates total SQL Warehouse cost for a scenario."""
+    return sum(calculate_sql_warehouse_costs(scenario).values())
+
+# --- Scenarios ---
+def _new_job(tier, number):
+    return {
+        "#": number, "Job Name": f"{tier.split(' / ')[1]} Job {number}", "Runtime (hrs)": 0.0, "Runs/Month": 0,
+        "Instance Type": INSTANCE_LIST[0], "Nodes": 1, "Photon": False, "Spot": False, **{column: "" for column in TAG_COLUMNS}
+    }
+
+_DEFAULT_SCENARIO = {
+    "s3_calc_method": "Direct Storage",
+    "s3_direct": {
+        "Landing Zone": {"class": "Standard", "amount": 0, "unit": "GB", "put": 0, "get": 0},
+        "L0 / Bronze": {"class": "Standard", "amount": 0, "unit": "GB", "put": 0, "get": 0},
+        "L1 / Silver": {"class": "Infrequent Access", "amount": 0, "unit": "GB", "put": 0, "get": 0},
+        "L2 / Gold": {"class": "Standard", "amount": 0, "unit": "GB", "put": 0, "get": 0},
+    },
+    "s3_table_based": {
+        "Landing Zone": {"tables": 0, "records": 100000, "size_kb": 1.0},
+        "L0 / Bronze": {"tables": 0, "records": 100000, "size_kb": 1.5},
+        "L1 / Silver": {"tables": 0, "records": 100000, "size_kb": 2.0},
+        "L2 / Gold": {"tables": 0, "records": 100000, "size_kb": 2.5},
+    },
+    "s3_lifecycle": {
+        "Landing Zone": {"initial_gb": 0, "ingest_gb": 0, "ingest_growth_pct": 0.0, "ia_after_days": 0, "glacier_after_days": 0, "expire_after_days": 30, "retrieval_pct": 0.0},
+        "L0 / Bronze": {"initial_gb": 0, "ingest_gb": 0, "ingest_growth_pct": 0.0, "ia_after_days": 30, "glacier_after_days": 90, "expire_after_days": 0, "retrieval_pct": 1.0},
+        "L1 / Silver": {"initial_gb": 0, "ingest_gb": 0, "ingest_growth_pct": 0.0, "ia_after_days": 60, "glacier_after_days": 180, "expire_after_days": 0, "retrieval_pct": 2.0},
+        "L2 / Gold": {"initial_gb": 0, "ingest_gb": 0, "ingest_growth_pct": 0.0, "ia_after_days": 90, "glacier_after_days": 0, "expire_after_days": 0, "retrieval_pct": 5.0},
+    },
+    "s3_lifecycle_horizon": 60,
+    # Per-table inventory: zone rules (tables are assigned by their zone column or by "match"),
+    # and the imported tables themselves (s3_inventory.INVENTORY_COLUMNS)
+    "s3_inventory": {
+        "Landing Zone": {"match": "landing|raw", "storage_class": "Standard", "compression_ratio": 1.0, "daily_churn_pct": 0.0, "retention_days": 7},
+        "L0 / Bronze": {"match": "bronze", "storage_class": "Standard", "compression_ratio": 4.0, "daily_churn_pct": 2.0, "retention_days": 7},
+        "L1 / Silver": {"match": "silver", "storage_class": "Standard", "compression_ratio": 5.0, "daily_churn_pct": 3.0, "retention_days": 7},
+        "L2 / Gold": {"match": "gold", "storage_class": "Standard", "compression_ratio": 5.0, "daily_churn_pct": 1.0, "retention_days": 7},
+    },
+    "s3_inventory_tables": empty_inventory(),
+    # Chargeback tags per S3 zone ({zone: {"Org", "Team", "Pipeline"}}), whichever method prices the zone
+    "s3_zone_tags": {},
+    "sql_warehouses": [{
+        "id": "warehouse_0", "name": "Primary BI Warehouse", "size": SQL_WAREHOUSE_SIZES[0], # Default to 2X-Small
+        "hours_per_day": 8, "days_per_month": 22, "auto_suspend": True, "suspend_after": 10,
+        # Scale-out limit, the warehouse's id in query-history exports, and the estimate made from one
+        "max_clusters": 1, "query_history_id": "", "query_history_estimate": None,
+        # Chargeback tags ({"Org", "Team", "Pipeline"}); replaced as a whole when edited
+        "tags": {},
+    }],
+    "monthly_growth_percent": 0.0,
+}
+
+# Every key a scenario holds (the settings above plus the per-tier job frames)
+SCENARIO_KEYS = [*_DEFAULT_SCENARIO, "dbx_jobs"]
+
+def default_scenario():
+    """Returns a fresh scenario dict holding the calculator's default configuration."""
+    scenario = copy.deepcopy(_DEFAULT_SCENARIO)
+    scenario["dbx_jobs"] = {tier: compact_jobs(pd.DataFrame([_new_job(tier, 1)])) for tier in DBU_RATES.keys()}
+    return scenario
+
+def _warehouse_size(size):
+    """The size key for a warehouse size given as a key or, in older scenario files, as its display label."""
+    if size in SQL_WAREHOUSE_PRICING:
+        return size
+    # Labels read "<size> - <DBUs> DBUs - $<price>/hr"; match on the size so labels with old prices still load
+    key = str(size).split(" - ")[0]
+    if key in SQL_WAREHOUSE_PRICING:
+        return key
+    raise ValueError(f"Unknown SQL warehouse size: {size!r}")
+
+def scenario_from_dict(raw):
+    """
+    Builds a scenario from a plain dict (e.g. parsed JSON/YAML).
+    Missing sections fall back to the defaults; per-zone S3 settings are merged key by key.
+    Jobs are given per tier as a list of row dicts and become DataFrames. Warehouse sizes are size keys
+    (display labels are also accepted); an unknown size or tier raises ValueError.
+    """
+    scenario = default_scenario()
+    scenario["name"] = raw.get("name", "")
+
+    for key in ("s3_calc_method", "s3_lifecycle_horizon", "monthly_growth_percent"):
+        if key in raw:
+            scenario[key] = raw[key]
+    for key in ("s3_direct", "s3_table_based", "s3_lifecycle", "s3_inventory", "s3_zone_tags"):
+        for zone, config in raw.get(key, {}).items():
+            scenario[key][zone] = {**scenario[key].get(zone, {}), **config}
+    # The table inventory is given as a list of rows or as the path of an export file
+    tables = raw.get("s3_inventory_tables")
+    if isinstance(tables, str):
+        scenario["s3_inventory_tables"], _ = import_inventory_file(tables)
+    elif tables:
+        scenario["s3_inventory_tables"] = normalize_inventory(pd.DataFrame(tables))
+    if "sql_warehouses" in raw:
+        template = _DEFAULT_SCENARIO["sql_warehouses"][0]
+        scenario["sql_warehouses"] = [
+            {**template, "id": f"warehouse_{i}", **warehouse} for i, warehouse in enumerate(raw["sql_warehouses"])
+        ]
+        for warehouse in scenario["sql_warehouses"]:
+            warehouse["size"] = _warehouse_size(warehouse["size"])
+            if warehouse.get("query_history_file"):
+                warehouse["query_history_estimate"] = estimate_warehouse_from_file(warehouse, warehouse.pop("query_history_file"))
+
+    for tier, jobs in raw.get("dbx_jobs", {}).items():
+        if tier not in DBU_RATES:
+            raise ValueError(f"Unknown Databricks tier: {tier!r}")
+        rows = [{**_new_job(tier, i + 1), **job} for i, job in enumerate(jobs)]
+        scenario["dbx_jobs"][tier] = compact_jobs(pd.DataFrame(rows, columns=JOB_INPUT_COLUMNS).astype({"Runtime (hrs)": float}))
+
+    return scenario
+
+def price_scenario(scenario):
+    """
+    Prices every component of a scenario.
+    Returns a flat dict of totals (one key per tier, zone and component) suitable for CSV/JSONL rows.
+    """
+    result = {"scenario": scenario.get("name", "")}
+
+    databricks_total_cost = 0
+    for tier in DBU_RATES.keys():
+        _, dbu_cost, ec2_cost = calculate_databricks_costs_for_tier(scenario["dbx_jobs"][tier], tier)
+        result[f"dbx_dbu_cost[{tier}]"] = float(dbu_cost)
+        result[f"dbx_ec2_cost[{tier}]"] = float(ec2_cost)
+        databricks_total_cost += dbu_cost + ec2_cost
+
+    s3_costs_per_zone, s3_cost = calculate_s3_cost_per_zone(scenario)
+    for zone, cost in s3_costs_per_zone.items():
+        result[f"s3_cost[{zone}]"] = float(cost)
+    sql_cost = calculate_sql_warehouse_cost(scenario)
+
+    result["databricks_cost"] = float(databricks_total_cost)
+    result["s3_cost"] = float(s3_cost)
+    result["sql_cost"] = float(sql_cost)
+    result["total_cost"] = float(databricks_total_cost + s3_cost + sql_cost)
+    return result
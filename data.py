@@ -1,4 +1,5 @@
 # data.py
+import os
 
 # AWS EC2 Instance Pricing (USD per hour) - Sample Data for us-east-1
 INSTANCE_PRICES = {
@@ -18,9 +19,17 @@ INSTANCE_PRICES = {
         "i3.large": 0.156, "i3.xlarge": 0.312, "i3.2xlarge": 0.624,
     }
 }
-# Flatten the instance list for the selectbox, but keep the prices separate for lookup
-FLAT_INSTANCE_LIST = {f"{k} ({fam})": p for fam, instances in INSTANCE_PRICES.items() for k, p in instances.items()}
-INSTANCE_LIST = list(FLAT_INSTANCE_LIST.keys())
+
+# vCPU / memory (GiB) per instance type, used to compare sizes across families
+INSTANCE_SPECS = {
+    "m5.large": {"vcpu": 2, "memory_gib": 8}, "m5.xlarge": {"vcpu": 4, "memory_gib": 16}, "m5.2xlarge": {"vcpu": 8, "memory_gib": 32},
+    "m6i.large": {"vcpu": 2, "memory_gib": 8}, "m6i.xlarge": {"vcpu": 4, "memory_gib": 16}, "m6i.2xlarge": {"vcpu": 8, "memory_gib": 32},
+    "c5.large": {"vcpu": 2, "memory_gib": 4}, "c5.xlarge": {"vcpu": 4, "memory_gib": 8}, "c5.2xlarge": {"vcpu": 8, "memory_gib": 16},
+    "c6i.large": {"vcpu": 2, "memory_gib": 4}, "c6i.xlarge": {"vcpu": 4, "memory_gib": 8}, "c6i.2xlarge": {"vcpu": 8, "memory_gib": 16},
+    "r5.large": {"vcpu": 2, "memory_gib": 16}, "r5.xlarge": {"vcpu": 4, "memory_gib": 32}, "r5.2xlarge": {"vcpu": 8, "memory_gib": 64},
+    "r5d.large": {"vcpu": 2, "memory_gib": 16}, "r5d.xlarge": {"vcpu": 4, "memory_gib": 32}, "r5d.2xlarge": {"vcpu": 8, "memory_gib": 64},
+    "i3.large": {"vcpu": 2, "memory_gib": 15.25}, "i3.xlarge": {"vcpu": 4, "memory_gib": 30.5}, "i3.2xlarge": {"vcpu": 8, "memory_gib": 61},
+}
 
 # Databricks DBU Rates (USD per DBU)
 DBU_RATES = {
@@ -39,7 +48,14 @@ S3_PRICING = {
     "Infrequent Access": {"storage_gb": 0.0125, "put_1k": 0.01, "get_1k": 0.001},
     "Glacier Instant Retrieval": {"storage_gb": 0.004, "put_1k": 0.02, "get_1k": 0.01},
 }
-S3_STORAGE_CLASSES = list(S3_PRICING.keys())
+
+# S3 lifecycle pricing (USD): transition requests into a class (per 1,000 objects) and data retrieval (per GB read)
+S3_LIFECYCLE_PRICING = {
+    "Standard": {"transition_1k": 0.0, "retrieval_gb": 0.0},
+    "Intelligent-Tiering": {"transition_1k": 0.01, "retrieval_gb": 0.0},
+    "Infrequent Access": {"transition_1k": 0.01, "retrieval_gb": 0.01},
+    "Glacier Instant Retrieval": {"transition_1k": 0.02, "retrieval_gb": 0.03},
+}
 
 # --- UPDATED: SQL Warehouse data now includes DBU and cost info for the UI ---
 SQL_WAREHOUSE_PRICING = {
@@ -50,6 +66,50 @@ SQL_WAREHOUSE_PRICING = {
     "Large": {"dbt_per_hr": 16, "cost_per_hr": 3.52},
     "X-Large": {"dbt_per_hr": 32, "cost_per_hr": 7.04}
 }
-# Create a user-friendly list for the selectbox
-SQL_WAREHOUSE_SIZES = [f"{size} - {data['dbt_per_hr']} DBUs - ${data['cost_per_hr']}/hr" for size, data in SQL_WAREHOUSE_PRICING.items()]
-# --- END OF UPDATE ---
\ No newline at end of file
+# --- END OF UPDATE ---
+
+# --- Regions ---
+# Sample prices of other AWS regions relative to the us-east-1 samples above, per price kind
+# ("sql" is the SQL Warehouse rate). Used by regions.py for regions the price list doesn't cover.
+REGION_PRICE_FACTORS = {
+    "us-east-1": {"ec2": 1.0, "dbu": 1.0, "s3": 1.0, "sql": 1.0},
+    "us-west-2": {"ec2": 1.0, "dbu": 1.0, "s3": 1.0, "sql": 1.0},
+    "eu-west-1": {"ec2": 1.11, "dbu": 1.0, "s3": 1.0, "sql": 1.0},
+    "eu-central-1": {"ec2": 1.2, "dbu": 1.1, "s3": 1.065, "sql": 1.1},
+    "ap-southeast-2": {"ec2": 1.25, "dbu": 1.2, "s3": 1.087, "sql": 1.2},
+    "ap-northeast-1": {"ec2": 1.29, "dbu": 1.2, "s3": 1.087, "sql": 1.2},
+}
+
+# --- Optional: full price list ---
+# Point DBU_CALC_PRICE_LIST at an AWS bulk price-list file (or a plain catalog CSV, see catalog.py)
+# to replace the sample prices above. The file is compiled once into an indexed on-disk cache.
+PRICE_LIST_PATH = os.environ.get("DBU_CALC_PRICE_LIST")
+PRICE_LIST_REGION = os.environ.get("DBU_CALC_REGION", "us-east-1")
+if PRICE_LIST_PATH:
+    from catalog import load_catalog, instance_prices_by_family, select
+    _catalog = load_catalog(PRICE_LIST_PATH)
+    INSTANCE_PRICES = instance_prices_by_family(_catalog, PRICE_LIST_REGION) or INSTANCE_PRICES
+    _rows = select(_catalog, "ec2", PRICE_LIST_REGION)
+    for _name, _vcpu, _memory in zip(_rows["name"], _rows["vcpu"], _rows["memory_gib"]):
+        INSTANCE_SPECS[str(_name)] = {"vcpu": float(_vcpu), "memory_gib": float(_memory)}
+    _rows = select(_catalog, "dbu", PRICE_LIST_REGION)
+    for _name, _price in zip(_rows["name"], _rows["price"]):
+        # Only the built-in tiers are priced from the list; other SKU names would become bogus tiers
+        if str(_name) in DBU_RATES:
+            DBU_RATES[str(_name)] = float(_price)
+    _rows = select(_catalog, "s3_storage", PRICE_LIST_REGION)
+    for _name, _price in zip(_rows["name"], _rows["price"]):
+        if str(_name) in S3_PRICING:
+            S3_PRICING[str(_name)]["storage_gb"] = float(_price)
+    _rows = select(_catalog, "sql_warehouse", PRICE_LIST_REGION)
+    for _name, _price, _dbu in zip(_rows["name"], _rows["price"], _rows["dbu_per_hour"]):
+        SQL_WAREHOUSE_PRICING[str(_name)] = {"dbt_per_hr": float(_dbu), "cost_per_hr": float(_price)}
+
+# Flatten the instance list for the selectbox, but keep the prices separate for lookup
+FLAT_INSTANCE_LIST = {f"{k} ({fam})": p for fam, instances in INSTANCE_PRICES.items() for k, p in instances.items()}
+INSTANCE_LIST = list(FLAT_INSTANCE_LIST.keys())
+S3_STORAGE_CLASSES = list(S3_PRICING.keys())
+
+# Warehouses are stored by size key; the labels are only for display (selectbox format_func).
+SQL_WAREHOUSE_SIZES = list(SQL_WAREHOUSE_PRICING.keys())
+SQL_WAREHOUSE_LABELS = {size: f"{size} - {data['dbt_per_hr']} DBUs - ${data['cost_per_hr']}/hr" for size, data in SQL_WAREHOUSE_PRICING.items()}
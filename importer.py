@@ -0,0 +1,206 @@
+# importer.py
+# Bulk import of Databricks job inventories into per-tier job frames.
+#
+# Supported exports:
+#   * CSV and Parquet with one job per row. Column names are matched loosely
+#     ("Instance Type", "instance_type", "node_type_id", ...; see _COLUMN_ALIASES).
+#   * Databricks Jobs API JSON: a /api/2.1/jobs/list response ({"jobs": [...]}), a list of such
+#     pages or of jobs, or JSON Lines (.jsonl) with one job or page per line, which is read incrementally.
+#     The job's tier (and its org, team and pipeline chargeback tags) come from its tags; node type,
+#     workers, Photon and Spot from its first new_cluster. Runtime and runs are not part of a job definition and start at zero.
+#
+# Files are read in fixed-size chunks. Each chunk is normalized to the calculator's job columns with
+# compact dtypes (categorical Instance Type) before the next one is read, so peak memory is the
+# compact result plus one raw chunk, and a progress callback is called after every chunk.
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from cost_core import INSTANCE_DTYPE, JOB_INPUT_COLUMNS, TAG_COLUMNS, compact_jobs
+from data import DBU_RATES, INSTANCE_LIST
+
+IMPORT_SUFFIXES = {".csv", ".parquet", ".json", ".jsonl"}
+CHUNK_ROWS = 50_000
+
+# Canonical job column -> accepted spellings (compared lower-cased, with spaces, dashes and slashes as underscores)
+_COLUMN_ALIASES = {
+    "Tier": ["tier", "layer", "dbx_tier"],
+    "Job Name": ["job_name", "name", "job"],
+    "Runtime (hrs)": ["runtime_(hrs)", "runtime_hrs", "runtime_hours", "avg_runtime_hours", "runtime"],
+    "Runs/Month": ["runs_month", "runs_per_month", "monthly_runs", "runs"],
+    "Instance Type": ["instance_type", "node_type_id", "node_type", "instance"],
+    "Nodes": ["nodes", "num_nodes", "node_count"],
+    "Photon": ["photon", "runtime_engine", "use_photon"],
+    "Spot": ["spot", "availability", "use_spot"],
+    "Org": ["org", "organization", "organisation", "cost_center", "cost_centre", "business_unit"],
+    "Team": ["team", "owner_team", "owning_team"],
+    "Pipeline": ["pipeline", "pipeline_name", "project"],
+}
+_TRUE_VALUES = ["true", "1", "yes", "y", "t", "photon", "spot", "spot_with_fallback"]
+
+# "m5.large" and "m5.large (General Purpose)" both map to the calculator's label.
+_INSTANCE_LABELS = {**{label.split(" (")[0]: label for label in INSTANCE_LIST}, **{label: label for label in INSTANCE_LIST}}
+# "L0 / Bronze", "l0", "bronze" all map to the tier key.
+_TIER_NAMES = {alias.lower(): tier for tier in DBU_RATES for alias in [tier, *tier.split(" / ")]}
+
+# --- Reading chunks ---
+def _column_key(name):
+    return str(name).strip().lower().replace(" ", "_").replace("-", "_").replace("/", "_")
+
+def _iter_csv(f, chunk_rows):
+    yield from pd.read_csv(f, chunksize=chunk_rows)
+
+def _iter_parquet(f, chunk_rows):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Reading Parquet job inventories requires pyarrow (pip install pyarrow)")
+    parquet = pq.ParquetFile(f)
+    total_rows = parquet.metadata.num_rows
+    for batch in parquet.iter_batches(batch_size=chunk_rows):
+        chunk = batch.to_pandas()
+        # pyarrow reads ahead, so the file position says little; report progress by rows instead.
+        chunk.attrs["total_rows"] = total_rows
+        yield chunk
+
+def _job_api_record(job):
+    """Flattens one Jobs API job object into the importer's column names."""
+    settings = job.get("settings", job)
+    clusters = [c.get("new_cluster", {}) for c in settings.get("job_clusters", [])]
+    clusters += [task["new_cluster"] for task in settings.get("tasks", []) if "new_cluster" in task]
+    if "new_cluster" in settings:
+        clusters.insert(0, settings["new_cluster"])
+    cluster = clusters[0] if clusters else {}
+    workers = cluster.get("num_workers", cluster.get("autoscale", {}).get("max_workers", 0))
+    tags = {_column_key(key): value for key, value in settings.get("tags", {}).items()}
+    return {
+        "Tier": tags.get("tier"),
+        "Job Name": settings.get("name", str(job.get("job_id", ""))),
+        "Instance Type": cluster.get("node_type_id"),
+        "Nodes": workers + 1 if cluster else 0,  # workers plus the driver
+        "Photon": cluster.get("runtime_engine") == "PHOTON" or "photon" in cluster.get("spark_version", ""),
+        "Spot": str(cluster.get("aws_attributes", {}).get("availability", "")).startswith("SPOT"),
+        **{column: next((tags[alias] for alias in _COLUMN_ALIASES[column] if alias in tags), "") for column in TAG_COLUMNS},
+    }
+
+def _iter_jobs_api_json(f, chunk_rows):
+    # A single JSON document (a jobs/list page or a list of pages/jobs) has to be parsed whole.
+    document = json.load(f)
+    pages = document if isinstance(document, list) else [document]
+    jobs = [job for page in pages for job in page.get("jobs", [page])]
+    for start in range(0, len(jobs), chunk_rows):
+        yield pd.DataFrame([_job_api_record(job) for job in jobs[start:start + chunk_rows]])
+
+def _iter_jobs_api_jsonl(f, chunk_rows):
+    # One job (or one jobs/list page) per line, read incrementally.
+    records = []
+    for line in f:
+        if not line.strip():
+            continue
+        obj = json.loads(line)
+        records.extend(_job_api_record(job) for job in obj.get("jobs", [obj]))
+        if len(records) >= chunk_rows:
+            yield pd.DataFrame(records)
+            records = []
+    if records:
+        yield pd.DataFrame(records)
+
+def iter_job_chunks(f, fmt, chunk_rows=CHUNK_ROWS):
+    """Yields raw DataFrame chunks from an open binary file of the given format ("csv", "parquet", "json", "jsonl")."""
+    if fmt == "csv":
+        yield from _iter_csv(f, chunk_rows)
+    elif fmt == "parquet":
+        yield from _iter_parquet(f, chunk_rows)
+    elif fmt == "json":
+        yield from _iter_jobs_api_json(io.TextIOWrapper(f, encoding="utf-8-sig"), chunk_rows)
+    elif fmt == "jsonl":
+        yield from _iter_jobs_api_jsonl(io.TextIOWrapper(f, encoding="utf-8-sig"), chunk_rows)
+    else:
+        raise ValueError(f"Unsupported job inventory format: {fmt!r}")
+
+# --- Normalizing ---
+def _truthy(values):
+    if values.dtype == bool:
+        return values.to_numpy()
+    return values.astype(str).str.strip().str.lower().isin(_TRUE_VALUES).to_numpy()
+
+def normalize_jobs(chunk, default_tier=None):
+    """
+    Maps a raw chunk onto the calculator's job columns (categorical tags) plus a categorical "Tier" column.
+    Rows whose tier is missing or unknown get default_tier (or a NaN tier if there is none);
+    instance types the calculator does not price become NaN in the categorical column.
+    """
+    lookup = {_column_key(alias): canonical for canonical, aliases in _COLUMN_ALIASES.items() for alias in [canonical, *aliases]}
+    renamed = {}
+    for column in chunk.columns:
+        canonical = lookup.get(_column_key(column))
+        if canonical and canonical not in renamed.values():
+            renamed[column] = canonical
+    chunk = chunk.rename(columns=renamed)
+    n = len(chunk)
+
+    def column(name, default):
+        return chunk[name] if name in chunk else pd.Series([default] * n, index=chunk.index)
+
+    tier = column("Tier", None).astype(str).str.strip().str.lower().map(_TIER_NAMES)
+    if default_tier is not None:
+        tier = tier.fillna(default_tier)
+    instance = column("Instance Type", None).astype(str).str.strip().map(_INSTANCE_LABELS)
+
+    return pd.DataFrame({
+        "Tier": pd.Categorical(tier, categories=list(DBU_RATES)),
+        "Job Name": column("Job Name", "Imported Job").fillna("Imported Job").astype(str).to_numpy(),
+        "Runtime (hrs)": pd.to_numeric(column("Runtime (hrs)", 0.0), errors="coerce").fillna(0.0).to_numpy(dtype=float),
+        # Counts stay float here; compact_jobs narrows them to integers when they are all whole numbers
+        "Runs/Month": pd.to_numeric(column("Runs/Month", 0), errors="coerce").fillna(0).to_numpy(dtype=float),
+        "Instance Type": pd.Categorical(instance, dtype=INSTANCE_DTYPE),
+        "Nodes": pd.to_numeric(column("Nodes", 1), errors="coerce").fillna(1).to_numpy(dtype=float),
+        "Photon": _truthy(column("Photon", False)),
+        "Spot": _truthy(column("Spot", False)),
+        **{tag: pd.Categorical(column(tag, "").fillna("").astype(str).str.strip()) for tag in TAG_COLUMNS},
+    })
+
+# --- Importing ---
+def import_jobs(f, fmt, default_tier=None, chunk_rows=CHUNK_ROWS, total_bytes=None, progress=None):
+    """
+    Reads a job inventory into {tier: jobs DataFrame} (JOB_INPUT_COLUMNS, categorical Instance Type).
+    `progress(rows_read, fraction)` is called after each chunk; fraction comes from the row count
+    for Parquet and is otherwise estimated from the file position when total_bytes is known, else None.
+    Returns (jobs by tier, report) where report counts rows read, rows skipped for an unknown tier
+    and rows whose instance type is not priced.
+    """
+    parts = {tier: [] for tier in DBU_RATES}
+    report = {"rows": 0, "skipped_tier": 0, "unknown_instance": 0}
+
+    for chunk in iter_job_chunks(f, fmt, chunk_rows):
+        jobs = normalize_jobs(chunk, default_tier)
+        report["rows"] += len(jobs)
+        report["skipped_tier"] += int(jobs["Tier"].isna().sum())
+        report["unknown_instance"] += int(jobs["Instance Type"].isna().sum())
+        for tier, group in jobs.groupby("Tier", observed=True, sort=False):
+            parts[tier].append(group.drop(columns="Tier"))
+        if progress:
+            if "total_rows" in chunk.attrs:
+                fraction = report["rows"] / max(chunk.attrs["total_rows"], 1)
+            else:
+                fraction = min(f.tell() / total_bytes, 1.0) if total_bytes else None
+            progress(report["rows"], fraction)
+
+    jobs_by_tier = {}
+    for tier, frames in parts.items():
+        if not frames:
+            continue
+        jobs = pd.concat(frames, ignore_index=True)
+        jobs.insert(0, "#", np.arange(1, len(jobs) + 1))
+        jobs_by_tier[tier] = compact_jobs(jobs[JOB_INPUT_COLUMNS])
+    report["imported"] = {tier: len(jobs) for tier, jobs in jobs_by_tier.items()}
+    return jobs_by_tier, report
+
+def import_jobs_file(path, default_tier=None, chunk_rows=CHUNK_ROWS, progress=None):
+    """import_jobs for a file on disk; the format is taken from the file suffix."""
+    fmt = os.path.splitext(str(path))[1].lower().lstrip(".")
+    with open(path, "rb") as f:
+        return import_jobs(f, fmt, default_tier, chunk_rows, os.path.getsize(path), progress)
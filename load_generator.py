@@ -0,0 +1,177 @@
+# load_generator.py
+# Measures the pricing service's throughput and latency from many concurrent keep-alive clients:
+#
+#   python load_generator.py --serve --workers 4                    # start a service, load it, stop it
+#   python load_generator.py --url http://127.0.0.1:8765 --requests 5000 --concurrency 64 --batch 20
+#
+# Scenarios are random (see benchmark.synthetic_jobs), drawn from a pool of --unique distinct ones,
+# so the share of repeats, and with it the service's cache hit rate, is set by the pool size.
+# Reports requests and scenarios per second, latency percentiles and the service's own /stats.
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from benchmark import synthetic_jobs
+from data import DBU_RATES, S3_STORAGE_CLASSES, SQL_WAREHOUSE_SIZES
+
+SERVICE_SCRIPT = Path(__file__).with_name("pricing_service.py")
+PERCENTILES = [50, 90, 99]
+
+# --- Scenarios ---
+def synthetic_raw_scenario(jobs_per_tier, seed):
+    """A random scenario dict in the form cost_core.scenario_from_dict takes (and the service accepts)."""
+    rng = random.Random(seed)
+    return {
+        "name": f"load-{seed}",
+        "dbx_jobs": {
+            tier: synthetic_jobs(jobs_per_tier, seed=seed * len(DBU_RATES) + i).drop(columns="#").to_dict("records")
+            for i, tier in enumerate(DBU_RATES)
+        },
+        "s3_direct": {
+            zone: {"class": rng.choice(S3_STORAGE_CLASSES), "amount": rng.randint(0, 50_000), "unit": "GB",
+                   "put": rng.randint(0, 1_000), "get": rng.randint(0, 10_000)}
+            for zone in ["Landing Zone", "L0 / Bronze", "L1 / Silver", "L2 / Gold"]
+        },
+        "sql_warehouses": [
+            {"name": f"Warehouse {i}", "size": rng.choice(SQL_WAREHOUSE_SIZES), "hours_per_day": rng.randint(1, 24), "days_per_month": 22}
+            for i in range(rng.randint(1, 3))
+        ],
+    }
+
+# --- Client ---
+async def _request(reader, writer, host, method, path, payload=None):
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length)) if length else None
+
+async def fetch(url, method="GET", path="/", payload=None):
+    """One request on its own connection; returns (status, parsed JSON body)."""
+    parts = urlsplit(url)
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port)
+    try:
+        return await _request(reader, writer, parts.hostname, method, path, payload)
+    finally:
+        writer.close()
+
+async def run_load(url, bodies, requests, concurrency):
+    """
+    Sends `requests` POSTs from `concurrency` keep-alive connections, cycling through `bodies`
+    ((path, payload) pairs). Returns per-request latencies in seconds, error count and wall time.
+    """
+    parts = urlsplit(url)
+    latencies, errors, sent = [], [0], iter(range(requests))
+
+    async def client():
+        reader, writer = await asyncio.open_connection(parts.hostname, parts.port)
+        try:
+            for n in sent:
+                path, payload = bodies[n % len(bodies)]
+                start = time.perf_counter()
+                status, response = await _request(reader, writer, parts.hostname, "POST", path, payload)
+                latencies.append(time.perf_counter() - start)
+                results = response.get("results", [response]) if isinstance(response, dict) else []
+                if status != 200 or any(row.get("error") for row in results):
+                    errors[0] += 1
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(min(concurrency, requests))))
+    return latencies, errors[0], time.perf_counter() - start
+
+def summarize(latencies, errors, elapsed, scenarios_per_request):
+    ordered = sorted(latencies)
+    percentile = {p: ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] for p in PERCENTILES} if ordered else {}
+    return {
+        "requests": len(latencies), "errors": errors, "seconds": elapsed,
+        "requests_per_s": len(latencies) / elapsed if elapsed else 0.0,
+        "scenarios_per_s": len(latencies) * scenarios_per_request / elapsed if elapsed else 0.0,
+        "latency_mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        **{f"latency_p{p}_ms": value * 1000 for p, value in percentile.items()},
+    }
+
+# --- Managed service ---
+async def _wait_until_up(url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if (await fetch(url, path="/health"))[0] == 200:
+                return
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError("pricing service exited during startup")
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"pricing service did not start within {timeout}s")
+            await asyncio.sleep(0.2)
+
+def start_service(port, workers, cache_size):
+    """Starts pricing_service.py as a subprocess on 127.0.0.1:port; the caller terminates it."""
+    command = [sys.executable, str(SERVICE_SCRIPT), "--port", str(port), "--workers", str(workers), "--cache-size", str(cache_size)]
+    return subprocess.Popen(command, stderr=subprocess.DEVNULL)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the pricing service.")
+    parser.add_argument("--url", default="http://127.0.0.1:8765", help="Service URL (default: %(default)s)")
+    parser.add_argument("--requests", type=int, default=2_000, help="Requests to send (default: %(default)s)")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent connections (default: %(default)s)")
+    parser.add_argument("--batch", type=int, default=1, help="Scenarios per request; 1 uses /price, more /price/batch (default: 1)")
+    parser.add_argument("--unique", type=int, default=200, help="Distinct scenarios to draw from (default: %(default)s)")
+    parser.add_argument("--jobs", type=int, default=20, help="Jobs per tier in each scenario (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--serve", action="store_true", help="Start a pricing service on the --url port for the run")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="With --serve: the service's worker processes (default: CPU count)")
+    parser.add_argument("--cache-size", type=int, default=4096, help="With --serve: the service's cache size")
+    parser.add_argument("-o", "--output", help="Also write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    pool = [synthetic_raw_scenario(args.jobs, args.seed + i) for i in range(args.unique)]
+    rng = random.Random(args.seed)
+    if args.batch <= 1:
+        bodies = [("/price", scenario) for scenario in pool]
+    else:
+        bodies = [("/price/batch", {"scenarios": rng.choices(pool, k=args.batch)}) for _ in range(max(args.unique // args.batch, 1) * 4)]
+    rng.shuffle(bodies)
+
+    process = start_service(urlsplit(args.url).port, args.workers, args.cache_size) if args.serve else None
+
+    async def run():
+        if process:
+            await _wait_until_up(args.url, process)
+        latencies, errors, elapsed = await run_load(args.url, bodies, args.requests, args.concurrency)
+        _, server = await fetch(args.url, path="/stats")
+        return latencies, errors, elapsed, server
+
+    try:
+        latencies, errors, elapsed, server = asyncio.run(run())
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    results = {"load": summarize(latencies, errors, elapsed, max(args.batch, 1)), "service": server,
+               "settings": {key: getattr(args, key) for key in ["requests", "concurrency", "batch", "unique", "jobs"]}}
+    for name, value in results["load"].items():
+        print(f"{name:>18}: {value:,.2f}" if isinstance(value, float) else f"{name:>18}: {value:,}")
+    print(f"{'cache hit rate':>18}: {server['hit_rate']:.1%} ({server['cache_entries']:,} entries)")
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
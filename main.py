@@ -1,10 +1,11 @@
 # main.py
+import pandas as pd
 import streamlit as st
 from streamlit_toggle import theme as st_toggle_theme
-from state import initialize_state
-from calculations import calculate_databricks_costs_for_tier, calculate_s3_cost_per_zone, calculate_sql_warehouse_cost
-from ui_components import render_summary_column, render_databricks_tab, render_s3_tab, render_sql_warehouse_tab, render_configuration_guide
-from data import DBU_RATES
+from state import initialize_state, keep_view_state
+from profiling import start_run, finish_run, phase, timed
+from calculations import calculate_databricks_costs, calculate_s3_cost_per_zone, calculate_sql_warehouse_cost
+from ui_components import render_summary_column, render_summary, publish_total, render_databricks_tab, render_s3_tab, render_sql_warehouse_tab, render_projection_tab, render_regions_tab, render_chargeback_tab, render_scenarios_tab, render_optimizer, render_configuration_guide, render_cache_stats, render_memory_panel, render_profiling_panel
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -13,70 +14,144 @@ st.set_page_config(
     layout="wide"
 )
 
-# --- 1. Initialize Session State ---
-# This is the most important part. It MUST be called before any calculations.
-initialize_state()
-
-if 'monthly_growth_percent' not in st.session_state:
-    st.session_state.monthly_growth_percent = 0.0
-
-if 'theme' not in st.session_state:
-    st.session_state.theme = 'light'
-
-# --- 2. Perform All Calculations ---
-# This block can now safely access session_state because it has been initialized.
-calculated_dbx_data = {}
-for tier in DBU_RATES.keys():
-    df_with_costs, dbu_cost, ec2_cost = calculate_databricks_costs_for_tier(st.session_state.dbx_jobs[tier], tier)
-    calculated_dbx_data[tier] = {
-        "df": df_with_costs,
-        "dbu_cost": dbu_cost,
-        "ec2_cost": ec2_cost
-    }
-
-s3_costs_per_zone, s3_cost = calculate_s3_cost_per_zone()
-sql_cost = calculate_sql_warehouse_cost()
-
-databricks_total_cost = sum(data['dbu_cost'] + data['ec2_cost'] for data in calculated_dbx_data.values())
-total_cost = databricks_total_cost + s3_cost + sql_cost
-
-# --- 3. Render Main Layout ---
-title_col, toggle_col = st.columns([4, 1])
-
-with title_col:
-    st.title("☁️ Cloud Cost Calculator")
-    st.caption("Databricks & AWS Cost Estimation")
-
-with toggle_col:
-    # Custom theme toggle using a button
-    if st.session_state.theme == 'light':
-        button_label = "🌙"
-        new_theme = 'dark'
-    else:
-        button_label = "☀️"
-        new_theme = 'light'
-
-    if st.button(button_label):
-        st.session_state.theme = new_theme
-        # Set Streamlit's internal theme option
-        st.config.set_option("theme.base", new_theme)
-        st.rerun() # Rerun to apply the theme change immediately
-
-# Apply the current theme setting
-st.config.set_option("theme.base", st.session_state.theme)
-
-main_col, summary_col = st.columns([3, 1])
-
-with main_col:
-    tab1, tab2, tab3 = st.tabs(["Databricks & Compute", "S3 Storage", "SQL Warehouse"])
-
-    with tab1:
+# Copy-on-write (always on from pandas 3): costed frames, edits and resizes share the columns they
+# don't change with the frames they came from instead of copying them into each session.
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+# Per-phase timing for the debug sidebar (opt-in with ?debug=1, see profiling.py)
+start_run(enabled=bool(st.query_params.get("debug")))
+# The run is closed even when st.rerun() (or a widget) stops the script early, so a cProfile or
+# tracemalloc capture never outlives it.
+try:
+    # --- 1. Initialize Session State ---
+    # This is the most important part. It MUST be called before any calculations.
+    with phase("initialize_state"):
+        initialize_state()
+        keep_view_state()
+
+    if 'monthly_growth_percent' not in st.session_state:
+        st.session_state.monthly_growth_percent = 0.0
+
+    if 'cost_totals' not in st.session_state:
+        st.session_state.cost_totals = {}
+
+    if 'theme' not in st.session_state:
+        st.session_state.theme = 'light'
+
+    # --- 2. Render Main Layout ---
+    title_col, toggle_col = st.columns([4, 1])
+
+    with title_col:
+        st.title("☁️ Cloud Cost Calculator")
+        st.caption("Databricks & AWS Cost Estimation")
+
+    with toggle_col:
+        # Custom theme toggle using a button
+        if st.session_state.theme == 'light':
+            button_label = "🌙"
+            new_theme = 'dark'
+        else:
+            button_label = "☀️"
+            new_theme = 'light'
+
+        if st.button(button_label):
+            st.session_state.theme = new_theme
+            # Set Streamlit's internal theme option
+            st.config.set_option("theme.base", new_theme)
+            st.rerun() # Rerun to apply the theme change immediately
+
+    # Apply the current theme setting
+    st.config.set_option("theme.base", st.session_state.theme)
+
+    # --- 3. Tabs as Fragments ---
+    # Each tab calculates its own component and reruns on its own when one of its widgets
+    # changes; it then publishes its total so the summary column can be redrawn in place.
+    # The derived tabs (projection, regions, chargeback, scenarios) read every component, so they are
+    # only drawn while open: switching to one reruns the app, and a component edit made elsewhere
+    # can never leave them showing stale costs.
+    @st.fragment
+    @timed
+    def databricks_fragment(summary_slots):
+        calculated_dbx_data = calculate_databricks_costs()
+        publish_total("databricks", sum(data['dbu_cost'] + data['ec2_cost'] for data in calculated_dbx_data.values()), summary_slots)
         render_databricks_tab(calculated_dbx_data)
+        render_optimizer()
         render_configuration_guide()
-    with tab2:
+
+    @st.fragment
+    @timed
+    def s3_fragment(summary_slots):
+        s3_costs_per_zone, s3_cost = calculate_s3_cost_per_zone()
+        publish_total("s3", s3_cost, summary_slots)
         render_s3_tab(s3_costs_per_zone, s3_cost)
-    with tab3:
+
+    @st.fragment
+    @timed
+    def sql_warehouse_fragment(summary_slots):
+        sql_cost = calculate_sql_warehouse_cost()
+        publish_total("sql", sql_cost, summary_slots)
         render_sql_warehouse_tab(sql_cost)
 
-with summary_col:
-    render_summary_column(total_cost, databricks_total_cost, s3_cost, sql_cost)
\ No newline at end of file
+    @st.fragment
+    @timed
+    def projection_fragment():
+        render_projection_tab()
+
+    @st.fragment
+    @timed
+    def regions_fragment():
+        render_regions_tab()
+
+    @st.fragment
+    @timed
+    def chargeback_fragment():
+        render_chargeback_tab()
+
+    @st.fragment
+    @timed
+    def scenarios_fragment():
+        render_scenarios_tab()
+
+    # On a full run every tab publishes first and the summary is drawn once at the end.
+    st.session_state.summary_deferred = True
+
+    main_col, summary_col = st.columns([3, 1])
+
+    with summary_col:
+        summary_slots = render_summary_column()
+
+    with main_col:
+        tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs(["Databricks & Compute", "S3 Storage", "SQL Warehouse", "Projection", "Regions", "Chargeback", "Scenarios"],
+                                                           key="main_tab", on_change="rerun")
+
+        with tab1:
+            databricks_fragment(summary_slots)
+        with tab2:
+            s3_fragment(summary_slots)
+        with tab3:
+            sql_warehouse_fragment(summary_slots)
+        with tab4:
+            if tab4.open:
+                projection_fragment()
+        with tab5:
+            if tab5.open:
+                regions_fragment()
+        with tab6:
+            if tab6.open:
+                chargeback_fragment()
+        with tab7:
+            if tab7.open:
+                scenarios_fragment()
+
+    render_summary(summary_slots)
+    st.session_state.summary_deferred = False
+finally:
+    finish_run()
+
+# --- 4. Debug Sidebar (opt-in with ?debug=1) ---
+if st.query_params.get("debug"):
+    with st.sidebar:
+        render_profiling_panel()
+        render_cache_stats()
+        render_memory_panel()
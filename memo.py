@@ -0,0 +1,100 @@
+# memo.py
+# Content-keyed memoization for the cost calculations.
+#
+# Streamlit reruns the whole script on every interaction, but most of the inputs are
+# unchanged between reruns. Results are cached under a fingerprint of the argument
+# *contents* (not their identity), so an unchanged tier frame or config dict hits the
+# cache even though session state hands back a different object after an edit elsewhere.
+# The caches are process-wide and shared by all sessions. Cached values are shared too,
+# so callers must treat them as read-only.
+import functools
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+_registry = {}
+
+def fingerprint(value):
+    """Returns a short hex digest of a value's content (DataFrames, dicts, lists and scalars)."""
+    h = hashlib.blake2b(digest_size=16)
+    _update(h, value)
+    return h.hexdigest()
+
+def _update(h, value):
+    if isinstance(value, pd.DataFrame):
+        h.update(b"df")
+        h.update(repr((list(value.columns), [str(t) for t in value.dtypes])).encode())
+        h.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, pd.Series):
+        h.update(b"series")
+        h.update(repr((value.name, str(value.dtype))).encode())
+        h.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, (dict, list, tuple)):
+        # Nested plain containers may still hold frames (e.g. dbx_jobs), so recurse rather than dump.
+        if isinstance(value, dict):
+            h.update(b"{")
+            for key in sorted(value, key=repr):
+                h.update(repr(key).encode())
+                _update(h, value[key])
+            h.update(b"}")
+        else:
+            h.update(b"[")
+            for item in value:
+                _update(h, item)
+            h.update(b"]")
+    else:
+        h.update(json.dumps(value, default=repr).encode())
+        h.update(b";")
+
+def memoize(maxsize=128):
+    """
+    Decorator: caches results keyed by the content fingerprint of the arguments.
+    At most `maxsize` results are kept; the least recently used entry is evicted first.
+    The wrapper exposes cache_info() (hits/misses/evictions/size) and cache_clear().
+    """
+    def decorator(func):
+        entries = OrderedDict()
+        stats = {"hits": 0, "misses": 0, "evictions": 0}
+        lock = threading.Lock()
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = fingerprint([list(args), kwargs])
+            with lock:
+                if key in entries:
+                    entries.move_to_end(key)
+                    stats["hits"] += 1
+                    return entries[key]
+                stats["misses"] += 1
+
+            result = func(*args, **kwargs)
+
+            with lock:
+                entries[key] = result
+                entries.move_to_end(key)
+                while len(entries) > maxsize:
+                    entries.popitem(last=False)
+                    stats["evictions"] += 1
+            return result
+
+        def cache_info():
+            with lock:
+                return {**stats, "size": len(entries), "maxsize": maxsize}
+
+        def cache_clear():
+            with lock:
+                entries.clear()
+                stats.update(hits=0, misses=0, evictions=0)
+
+        wrapper.cache_info = cache_info
+        wrapper.cache_clear = cache_clear
+        _registry[f"{func.__module__}.{func.__qualname__}"] = wrapper
+        return wrapper
+    return decorator
+
+def cache_stats():
+    """Returns {function name: cache_info()} for every memoized function."""
+    return {name: wrapper.cache_info() for name, wrapper in _registry.items()}
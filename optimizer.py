@@ -0,0 +1,149 @@
+# optimizer.py
+# Cheapest instance / Photon / Spot configuration per job.
+#
+# Every job is priced against every instance in the price list and every Photon/Spot option as one
+# (job x instance x photon x spot) array, using the calculator's cost engine
+# (cost_core.compute_job_cost_arrays). Options are scored on what they are billed: EC2 cost plus
+# DBU units at the tier's DBU rate (with the Photon premium), not on the calculator's Total Cost
+# column, which reports DBUs unpriced. Disallowed options are masked with +inf before the arg-min.
+#
+# A different instance keeps the job's cluster capacity: the node count is scaled up until both the
+# total vCPUs and the total memory are at least what the current configuration has. Photon shortens
+# the runtime by the configured speedup factor; a job already on Photon is assumed to have been sped up.
+import numpy as np
+import pandas as pd
+
+from cost_core import INSTANCE_INDEX, JOB_INPUT_COLUMNS, compute_job_cost_arrays, job_input_arrays
+from data import INSTANCE_SPECS
+
+DEFAULT_CONSTRAINTS = {
+    "families": [],          # allowed instance families; empty allows every family
+    "allow_spot": True,
+    "allow_photon": True,
+    "photon_speedup": 1.0,   # runtime divisor when Photon is on; it pays off once it outweighs the DBU premium
+}
+BLOCK_CELLS = 2_000_000      # job x option cells evaluated at once
+
+RECOMMENDATION_COLUMNS = [
+    "#", "Job Name", "Instance Type", "Nodes", "Photon", "Spot", "Current Cost",
+    "Recommended Instance", "Recommended Nodes", "Recommended Photon", "Recommended Spot",
+    "Recommended Runtime (hrs)", "Recommended Cost", "Savings", "Savings %",
+    "Current Total Cost", "Recommended Total Cost",
+]
+
+def _instance_table():
+    """Per-instance arrays aligned with INSTANCE_INDEX: family, vCPUs and memory (NaN if unknown)."""
+    labels = list(INSTANCE_INDEX)
+    names = [label.split(" (")[0] for label in labels]
+    return {
+        "family": np.array([label.split(" (", 1)[1].rstrip(")") if " (" in label else "" for label in labels]),
+        "vcpu": np.array([INSTANCE_SPECS.get(name, {}).get("vcpu", np.nan) for name in names], dtype=float),
+        "memory_gib": np.array([INSTANCE_SPECS.get(name, {}).get("memory_gib", np.nan) for name in names], dtype=float),
+    }
+
+def billed_cost(costs):
+    """Monthly billed cost of compute_job_cost_arrays output: EC2 plus DBU units at the (Photon-adjusted) DBU rate."""
+    return costs["EC2 Cost"] + costs["DBU Units"] * costs["DBU Rate"]
+
+def _optimize_block(inputs, tier, allowed, instances, constraints):
+    """Returns (best option index, its billed cost, its calculator Total Cost, nodes, runtime) for one block of jobs."""
+    n_instances = len(instances["vcpu"])
+    codes = inputs["codes"]
+    known = codes >= 0
+    speedup = constraints["photon_speedup"]
+
+    # Capacity-preserving node counts, shape (jobs, instances)
+    current_vcpu = np.where(known, instances["vcpu"][codes], np.nan) * inputs["nodes"]
+    current_memory = np.where(known, instances["memory_gib"][codes], np.nan) * inputs["nodes"]
+    ratio = np.fmax(current_vcpu[:, None] / instances["vcpu"], current_memory[:, None] / instances["memory_gib"])
+    nodes = np.ceil(ratio - 1e-9)
+    nodes[np.arange(len(codes))[known], codes[known]] = inputs["nodes"][known]  # the current instance keeps its count
+
+    # Options broadcast as (jobs, instances, photon, spot)
+    photon = np.array([False, True])[None, None, :, None]
+    spot = np.array([False, True])[None, None, None, :]
+    base_runtime = inputs["runtime"] * np.where(inputs["photon"], speedup, 1.0)
+    runtime = base_runtime[:, None, None, None] / np.where(photon, speedup, 1.0)
+    costs = compute_job_cost_arrays(
+        runtime=runtime, runs=inputs["runs"][:, None, None, None], nodes=nodes[:, :, None, None],
+        photon=photon, spot=spot, codes=np.arange(n_instances)[None, :, None, None], tier=tier,
+    )
+    total = np.where(allowed & np.isfinite(nodes)[:, :, None, None], billed_cost(costs), np.inf)
+    total = total.reshape(len(codes), -1)
+
+    best = np.argmin(total, axis=1)
+    best_cost = total[np.arange(len(codes)), best]
+    best_total = costs["Total Cost"].reshape(len(codes), -1)[np.arange(len(codes)), best]
+    instance, photon_on = best // 4, (best // 2) % 2 == 1
+    best_nodes = nodes[np.arange(len(codes)), instance]
+    best_runtime = base_runtime / np.where(photon_on, speedup, 1.0)
+    return best, best_cost, best_total, best_nodes, best_runtime
+
+def optimize_jobs(jobs_df, tier, constraints=None):
+    """
+    Finds the cheapest allowed configuration for every job of one tier.
+    Returns a DataFrame with RECOMMENDATION_COLUMNS, one row per job in jobs_df order. The Cost and Savings
+    columns are billed costs (see billed_cost), which the search minimizes; "Current/Recommended Total Cost"
+    are the calculator's own Total Cost column before and after, as the Databricks tab shows it. Jobs whose
+    current instance is not in the price list, or with no allowed option, keep their configuration.
+    """
+    constraints = {**DEFAULT_CONSTRAINTS, **(constraints or {})}
+    if jobs_df.empty:
+        return pd.DataFrame(columns=RECOMMENDATION_COLUMNS)
+
+    instances = _instance_table()
+    allowed_instance = np.isfinite(instances["vcpu"]) & np.isfinite(instances["memory_gib"])
+    if constraints["families"]:
+        allowed_instance &= np.isin(instances["family"], list(constraints["families"]))
+    allowed = (allowed_instance[None, :, None, None]
+               & np.array([True, constraints["allow_photon"]])[None, None, :, None]
+               & np.array([True, constraints["allow_spot"]])[None, None, None, :])
+
+    inputs = job_input_arrays(jobs_df)
+    inputs = {key: np.nan_to_num(values) if values.dtype.kind == "f" else values for key, values in inputs.items()}
+    current_costs = compute_job_cost_arrays(tier=tier, **inputs)
+    current, current_total = billed_cost(current_costs), current_costs["Total Cost"]
+
+    n_jobs = len(jobs_df)
+    block = max(1, BLOCK_CELLS // (len(instances["vcpu"]) * 4))
+    best, best_cost, best_total, best_nodes, best_runtime = (np.empty(n_jobs, dtype=int), *(np.empty(n_jobs) for _ in range(4)))
+    for start in range(0, n_jobs, block):
+        part = slice(start, start + block)
+        results = _optimize_block({key: values[part] for key, values in inputs.items()}, tier, allowed, instances, constraints)
+        best[part], best_cost[part], best_total[part], best_nodes[part], best_runtime[part] = results
+
+    # Nothing allowed (or unknown current instance): keep the job as it is.
+    keep = ~np.isfinite(best_cost) | (inputs["codes"] < 0) | (best_cost >= current)
+    instance_labels = INSTANCE_INDEX.to_numpy()
+    recommended_instance = np.where(keep, jobs_df["Instance Type"].astype(object).to_numpy(), instance_labels[best // 4])
+    recommended_cost = np.where(keep, current, best_cost)
+    savings = current - recommended_cost
+
+    result = jobs_df[["#", "Job Name", "Instance Type", "Nodes", "Photon", "Spot"]].reset_index(drop=True)
+    return result.assign(**{
+        "Current Cost": current,
+        "Recommended Instance": recommended_instance,
+        # Float, as compact_jobs keeps it: kept jobs may have fractional (edited or imported) node counts
+        "Recommended Nodes": np.where(keep, inputs["nodes"], best_nodes),
+        "Recommended Photon": np.where(keep, inputs["photon"], (best // 2) % 2 == 1),
+        "Recommended Spot": np.where(keep, inputs["spot"], best % 2 == 1),
+        "Recommended Runtime (hrs)": np.where(keep, inputs["runtime"], best_runtime),
+        "Recommended Cost": recommended_cost,
+        "Savings": savings,
+        "Savings %": np.divide(100 * savings, current, out=np.zeros(n_jobs), where=current > 0),
+        "Current Total Cost": current_total,
+        "Recommended Total Cost": np.where(keep, current_total, best_total),
+    })
+
+def apply_recommendations(jobs_df, recommendations):
+    """Returns a copy of jobs_df with every recommended configuration (and Photon runtime) applied."""
+    jobs = jobs_df.reset_index(drop=True).copy()
+    instance_types = recommendations["Recommended Instance"].to_numpy()
+    if isinstance(jobs["Instance Type"].dtype, pd.CategoricalDtype):
+        instance_types = pd.Categorical(instance_types, dtype=jobs["Instance Type"].dtype)
+    jobs["Instance Type"] = instance_types
+    jobs["Nodes"] = recommendations["Recommended Nodes"].to_numpy()
+    jobs["Photon"] = recommendations["Recommended Photon"].to_numpy()
+    jobs["Spot"] = recommendations["Recommended Spot"].to_numpy()
+    jobs["Runtime (hrs)"] = recommendations["Recommended Runtime (hrs)"].to_numpy(dtype=float)
+    return jobs[JOB_INPUT_COLUMNS]
@@ -0,0 +1,283 @@
+# pricing_service.py
+# Local HTTP service for the cost calculations, so other tools can price scenarios without the UI:
+#
+#   python pricing_service.py --port 8765 --workers 4
+#
+# Endpoints (JSON in, JSON out):
+#   POST /price        one scenario (the dict cost_core.scenario_from_dict takes) -> price_scenario's row
+#   POST /price/batch  {"scenarios": [...]} (or a bare list) -> {"results": [row per scenario, in order]}
+#   GET  /health       liveness
+#   GET  /stats        request, cache and pool counters
+# Batch rows carry an "error" column, as batch_cli's do, so one bad scenario doesn't fail the batch.
+#
+# Rows are cached under a fingerprint of the scenario's content (a hash of its canonical JSON, several times
+# cheaper than memo.fingerprint for plain JSON, and computed on the event loop), LRU-evicted, and a
+# scenario already being priced by another request is awaited rather than priced twice. Misses are
+# priced in a process pool in chunks, so the event loop only parses requests and answers from the cache.
+# Scenarios that read files (an inventory or query-history path) are not cached: the file may change.
+#
+# The server speaks just enough HTTP/1.1 for local clients: Content-Length bodies and keep-alive.
+# It binds to 127.0.0.1 by default; scenarios may name local files, so don't expose it further.
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import signal
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from cost_core import price_scenario, scenario_from_dict
+
+DEFAULT_PORT = 8765
+DEFAULT_CACHE_SIZE = 4096
+MAX_BATCH = 10_000
+MAX_BODY_BYTES = 64 * 1024 * 1024
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+            422: "Unprocessable Entity", 500: "Internal Server Error"}
+
+# --- Pricing (runs in the worker processes) ---
+def price_raw_scenario(raw):
+    """Prices one scenario dict, reporting failures as a row instead of raising (as batch_cli does)."""
+    try:
+        if not isinstance(raw, dict):
+            raise ValueError("a scenario must be a JSON object")
+        result = price_scenario(scenario_from_dict(raw))
+        result["error"] = ""
+    except Exception as exc:
+        result = {"scenario": raw.get("name", "") if isinstance(raw, dict) else "", "error": f"{type(exc).__name__}: {exc}"}
+    return result
+
+def price_raw_scenarios(raws):
+    return [price_raw_scenario(raw) for raw in raws]
+
+def cache_key(raw):
+    """Fingerprint of a scenario's content, or None for scenarios that read files (never cached)."""
+    if not isinstance(raw, dict):
+        return None
+    if isinstance(raw.get("s3_inventory_tables"), str):
+        return None
+    if any(isinstance(w, dict) and w.get("query_history_file") for w in raw.get("sql_warehouses", [])):
+        return None
+    canonical = json.dumps(raw, sort_keys=True, separators=(",", ":"), default=repr)
+    return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+# --- Service ---
+def create_service(workers=None, cache_size=DEFAULT_CACHE_SIZE):
+    """
+    Builds the service state: the worker pool, the response cache and its counters.
+    With workers <= 1 scenarios are priced on a single background thread instead of a process pool.
+    """
+    workers = workers or os.cpu_count() or 1
+    return {
+        "workers": workers,
+        "pool": ProcessPoolExecutor(max_workers=workers) if workers > 1 else ThreadPoolExecutor(max_workers=1),
+        "cache": OrderedDict(),
+        "cache_size": cache_size,
+        "pending": {},   # cache key -> future of a row being priced
+        "stats": {"requests": 0, "scenarios": 0, "hits": 0, "misses": 0, "evictions": 0, "uncached": 0, "errors": 0},
+        "started": time.time(),
+    }
+
+def _remember(service, key, row):
+    cache = service["cache"]
+    cache[key] = row
+    cache.move_to_end(key)
+    while len(cache) > service["cache_size"]:
+        cache.popitem(last=False)
+        service["stats"]["evictions"] += 1
+
+async def price_batch(service, raws):
+    """
+    Prices scenarios through the cache and the pool; returns one row per scenario, in order.
+    Duplicates within the batch and scenarios in flight for other requests are priced once.
+    """
+    loop = asyncio.get_running_loop()
+    stats = service["stats"]
+    stats["scenarios"] += len(raws)
+    rows = [None] * len(raws)
+    waits = {}     # position -> future owned by another request
+    misses = {}    # cache key (or position for uncached scenarios) -> (raw, positions)
+
+    for i, raw in enumerate(raws):
+        key = cache_key(raw)
+        if key is None:
+            stats["uncached"] += 1
+            misses[("uncached", i)] = (raw, [i])
+        elif key in service["cache"]:
+            stats["hits"] += 1
+            service["cache"].move_to_end(key)
+            rows[i] = service["cache"][key]
+        elif key in service["pending"]:
+            stats["hits"] += 1
+            waits[i] = service["pending"][key]
+        elif key in misses:
+            stats["hits"] += 1
+            misses[key][1].append(i)
+        else:
+            stats["misses"] += 1
+            misses[key] = (raw, [i])
+
+    keys = list(misses)
+    owned = {key: loop.create_future() for key in keys if not isinstance(key, tuple)}
+    service["pending"].update(owned)
+    try:
+        # A few chunks per worker keeps the pool busy without paying per-scenario task overhead.
+        chunksize = max(1, len(keys) // (service["workers"] * 4))
+        chunks = [keys[start:start + chunksize] for start in range(0, len(keys), chunksize)]
+        priced = await asyncio.gather(*(
+            loop.run_in_executor(service["pool"], price_raw_scenarios, [misses[key][0] for key in chunk]) for chunk in chunks
+        ))
+        for chunk, chunk_rows in zip(chunks, priced):
+            for key, row in zip(chunk, chunk_rows):
+                for i in misses[key][1]:
+                    rows[i] = row
+                if key in owned:
+                    if not row["error"]:
+                        _remember(service, key, row)
+                    owned[key].set_result(row)
+    except BaseException as exc:
+        for future in owned.values():
+            if not future.done():
+                future.set_exception(exc)
+        raise
+    finally:
+        for key in owned:
+            service["pending"].pop(key, None)
+
+    for i, future in waits.items():
+        rows[i] = await asyncio.shield(future)
+    stats["errors"] += sum(1 for row in rows if row["error"])
+    return rows
+
+def service_stats(service):
+    stats = service["stats"]
+    lookups = stats["hits"] + stats["misses"]
+    return {
+        **stats, "hit_rate": stats["hits"] / lookups if lookups else 0.0,
+        "cache_entries": len(service["cache"]), "cache_size": service["cache_size"],
+        "workers": service["workers"], "uptime_s": time.time() - service["started"],
+    }
+
+# --- HTTP ---
+async def handle_request(service, method, path, body):
+    """Routes one request; returns (status, JSON-serializable payload)."""
+    path = path.split("?", 1)[0].rstrip("/") or "/"
+    if path == "/health":
+        return 200, {"status": "ok"}
+    if path == "/stats":
+        return 200, service_stats(service)
+    if path not in ("/price", "/price/batch"):
+        return 404, {"error": f"no such endpoint: {path}"}
+    if method != "POST":
+        return 405, {"error": f"{path} takes POST"}
+
+    try:
+        payload = json.loads(body or b"null")
+    except ValueError as exc:
+        return 400, {"error": f"invalid JSON: {exc}"}
+
+    if path == "/price":
+        row = (await price_batch(service, [payload]))[0]
+        return (422 if row["error"] else 200), row
+
+    scenarios = payload.get("scenarios") if isinstance(payload, dict) else payload
+    if not isinstance(scenarios, list):
+        return 400, {"error": 'expected {"scenarios": [...]} or a list of scenarios'}
+    if len(scenarios) > MAX_BATCH:
+        return 413, {"error": f"at most {MAX_BATCH} scenarios per batch"}
+    return 200, {"results": await price_batch(service, scenarios)}
+
+async def _read_request(reader):
+    """Reads one request; returns (method, path, keep_alive, body), or None when the client has closed."""
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+    method, path, version = request_line.decode("latin-1").split()
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0))
+    if length > MAX_BODY_BYTES:
+        raise OverflowError(length)
+    body = await reader.readexactly(length) if length else b""
+    keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+    return method, path, keep_alive, body
+
+def _response(status, payload, keep_alive):
+    body = json.dumps(payload).encode()
+    head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode("latin-1") + body
+
+async def serve_connection(service, reader, writer):
+    """Answers requests on one connection until the client closes it or asks to."""
+    try:
+        while True:
+            try:
+                request = await _read_request(reader)
+            except OverflowError:
+                writer.write(_response(413, {"error": f"body larger than {MAX_BODY_BYTES} bytes"}, False))
+                break
+            except (ValueError, asyncio.IncompleteReadError):
+                writer.write(_response(400, {"error": "malformed HTTP request"}, False))
+                break
+            if request is None:
+                break
+            method, path, keep_alive, body = request
+            service["stats"]["requests"] += 1
+            try:
+                status, payload = await handle_request(service, method, path, body)
+            except Exception as exc:
+                status, payload = 500, {"error": f"{type(exc).__name__}: {exc}"}
+            writer.write(_response(status, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+async def run_server(host="127.0.0.1", port=DEFAULT_PORT, workers=None, cache_size=DEFAULT_CACHE_SIZE, ready=None):
+    """Serves until cancelled (or sent SIGTERM). `ready(port)` is called once the socket is listening."""
+    service = create_service(workers, cache_size)
+    server = await asyncio.start_server(lambda r, w: serve_connection(service, r, w), host, port)
+    # SIGTERM cancels the server like Ctrl+C does, so the worker pool is shut down rather than orphaned.
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    except (NotImplementedError, RuntimeError):  # no signal handlers on Windows or outside the main thread
+        pass
+    try:
+        async with server:
+            if ready:
+                ready(server.sockets[0].getsockname()[1])
+            await server.serve_forever()
+    finally:
+        service["pool"].shutdown(cancel_futures=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the cost calculations over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port (default: {DEFAULT_PORT}; 0 picks a free one)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes (default: CPU count)")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE, help="Cached scenario results (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    def ready(port):
+        print(f"Pricing service listening on http://{args.host}:{port} ({args.workers} worker(s))", file=sys.stderr, flush=True)
+
+    try:
+        asyncio.run(run_server(args.host, args.port, args.workers, args.cache_size, ready))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+# profiling.py
+# Per-rerun phase timing for the debug sidebar (?debug=1).
+#
+# main.py opens a run with start_run() and closes it with finish_run(); in between, phase("name")
+# blocks and @timed functions record their wall time and the net number of memory blocks they left
+# allocated (sys.getallocatedblocks, which is cheap enough to leave on). Phases nest, and each is
+# recorded under its path ("databricks_fragment/render_databricks_tab/data_editor").
+# A fragment-only rerun never reaches start_run(), so the outermost @timed function opens and closes
+# its own run instead.
+#
+# When profiling is off (no ?debug=1), phase() and @timed add only a thread-local and a session-state lookup.
+# On request, the next rerun can also be captured with cProfile or tracemalloc.
+# session_memory() reports what each session-state key holds, counting buffers shared between keys
+# (or with process-wide objects) once.
+import cProfile
+import functools
+import io
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+HISTORY_RUNS = 50           # runs kept per session
+PROFILE_TOP = 40            # lines kept from a cProfile / tracemalloc capture
+CAPTURE_MODES = ["cprofile", "tracemalloc"]
+
+_local = threading.local()  # the active run of the script thread (sessions run in their own threads)
+
+def _settings():
+    # Created here rather than in state.initialize_state, which is itself one of the timed phases.
+    return st.session_state.setdefault("profiling", {"enabled": False, "capture": None, "history": []})
+
+def start_run(label="full run", enabled=None):
+    """Opens a run; with enabled=None the session's current setting is used."""
+    settings = _settings()
+    if enabled is not None:
+        settings["enabled"] = enabled
+    if not settings["enabled"]:
+        _local.run = None
+        return
+
+    capture, settings["capture"] = settings["capture"], None
+    run = {
+        "label": label, "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "phases": [], "stack": [], "capture": capture, "profile": None,
+        "start": time.perf_counter(), "blocks": sys.getallocatedblocks(),
+    }
+    if capture == "cprofile":
+        run["profiler"] = cProfile.Profile()
+        run["profiler"].enable()
+    elif capture == "tracemalloc":
+        if tracemalloc.is_tracing():  # another session's capture is running; don't interfere with it
+            run["capture"] = None
+        else:
+            tracemalloc.start()
+    _local.run = run
+
+def finish_run():
+    """Closes the active run and stores it in the session's history. Returns the run record (or None)."""
+    run = getattr(_local, "run", None)
+    _local.run = None
+    if run is None:
+        return None
+
+    if run["capture"] == "cprofile":
+        profiler = run.pop("profiler")
+        profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP)
+        run["profile"] = out.getvalue()
+    elif run["capture"] == "tracemalloc":
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        lines = [f"peak traced memory: {peak / 1024:,.1f} KiB"]
+        lines += [str(stat) for stat in snapshot.statistics("lineno")[:PROFILE_TOP]]
+        run["profile"] = "\n".join(lines)
+
+    record = {
+        "label": run["label"], "timestamp": run["timestamp"], "capture": run["capture"], "profile": run["profile"],
+        "wall_ms": (time.perf_counter() - run["start"]) * 1e3,
+        "alloc_blocks": sys.getallocatedblocks() - run["blocks"],
+        "phases": run["phases"],
+    }
+    history = _settings()["history"]
+    history.append(record)
+    del history[:-HISTORY_RUNS]
+    return record
+
+@contextmanager
+def phase(name):
+    """Times the enclosed block as one phase of the active run (a no-op when there is none)."""
+    run = getattr(_local, "run", None)
+    if run is None:
+        yield
+        return
+    run["stack"].append(name)
+    path = "/".join(run["stack"])
+    blocks, start = sys.getallocatedblocks(), time.perf_counter()
+    try:
+        yield
+    finally:
+        wall_ms = (time.perf_counter() - start) * 1e3
+        run["phases"].append({"phase": path, "depth": len(run["stack"]) - 1, "start_ms": (start - run["start"]) * 1e3,
+                              "wall_ms": wall_ms, "alloc_blocks": sys.getallocatedblocks() - blocks})
+        run["stack"].pop()
+
+def timed(func):
+    """Decorator: records each call of func as a phase named after it."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if getattr(_local, "run", None) is not None:
+            with phase(func.__name__):
+                return func(*args, **kwargs)
+        if not _settings()["enabled"]:
+            return func(*args, **kwargs)
+        # Fragment-only rerun: this call is the whole run.
+        start_run(label=f"fragment: {func.__name__}")
+        try:
+            with phase(func.__name__):
+                return func(*args, **kwargs)
+        finally:
+            finish_run()
+    return wrapper
+
+def request_capture(mode):
+    """Asks for the next rerun to be captured with cProfile or tracemalloc."""
+    if mode not in CAPTURE_MODES:
+        raise ValueError(f"Unknown capture mode: {mode!r}")
+    _settings()["capture"] = mode
+
+def history():
+    return _settings()["history"]
+
+def phase_rows(runs):
+    """Flattens runs into one row per phase (plus a "(total)" row per run), for tables and CSV export."""
+    rows = []
+    for i, run in enumerate(runs):
+        base = {"run": i, "label": run["label"], "timestamp": run["timestamp"]}
+        rows.append({**base, "phase": "(total)", "depth": -1, "start_ms": 0.0, "wall_ms": run["wall_ms"], "alloc_blocks": run["alloc_blocks"]})
+        rows.extend({**base, **p} for p in run["phases"])
+    return rows
+
+# --- Session memory ---
+# Frames in session state share column buffers with each other (a costed frame with its job frame,
+# copy-on-write) and with process-wide objects (shared defaults, categorical instance dtypes), so
+# summing DataFrame.memory_usage would count them several times. Buffers are identified by address
+# instead and each is counted once, for the first key that holds it.
+def _column_buffers(column):
+    # For numpy dtypes to_numpy() is a view of the column's own buffer (Series.array would be a fresh wrapper)
+    return _array_buffers(column.to_numpy() if isinstance(column.dtype, np.dtype) else column.array)
+
+def _array_buffers(values):
+    """Yields (key, bytes) for the memory behind a numpy or pandas array; equal keys are the same buffer."""
+    if isinstance(values, np.ndarray):
+        address = values.__array_interface__["data"][0]
+        if values.dtype == object:
+            # The pointer array plus the Python objects it references
+            yield (address, "objects"), int(pd.Series(values, copy=False).memory_usage(deep=True, index=False))
+        else:
+            yield address, values.nbytes
+    elif isinstance(values, pd.Categorical):
+        yield from _array_buffers(values.codes)
+        yield from _column_buffers(values.categories)
+    elif isinstance(values, pd.arrays.ArrowExtensionArray):
+        for chunk in values.__arrow_array__().chunks:
+            for buffer in chunk.buffers():
+                if buffer is not None:
+                    yield buffer.address, buffer.size
+    else:
+        # Other extension arrays are the column's own object, so their identity is stable
+        yield id(values), int(getattr(values, "nbytes", sys.getsizeof(values)))
+
+def _buffers(value):
+    if isinstance(value, pd.DataFrame):
+        for _, column in value.items():
+            yield from _column_buffers(column)
+        if not isinstance(value.index, pd.RangeIndex):
+            yield from _column_buffers(value.index)
+    elif isinstance(value, (pd.Series, pd.Index)):
+        yield from _column_buffers(value)
+    elif isinstance(value, np.ndarray):
+        yield from _array_buffers(value)
+    elif isinstance(value, dict):
+        yield id(value), sys.getsizeof(value)
+        for item in value.values():
+            yield from _buffers(item)
+    elif isinstance(value, (list, tuple)):
+        yield id(value), sys.getsizeof(value)
+        for item in value:
+            yield from _buffers(item)
+    else:
+        yield id(value), sys.getsizeof(value)
+
+def memory_footprint(values, shared=()):
+    """
+    Bytes held by each of `values` ({name: object}), counting every buffer once: one already counted
+    for an earlier name, or held by any of the `shared` objects, adds nothing.
+    Returns ({name: bytes}, bytes of the shared objects).
+    """
+    seen = {}
+    for value in shared:
+        seen.update(_buffers(value))
+    shared_bytes = sum(seen.values())
+    footprint = {}
+    for name, value in values.items():
+        total = 0
+        for key, nbytes in _buffers(value):
+            if key not in seen:
+                seen[key] = nbytes
+                total += nbytes
+        footprint[name] = total
+    return footprint, shared_bytes
+
+def session_memory(shared=()):
+    """memory_footprint of this session's state, largest keys first (the profiling history itself excluded)."""
+    footprint, shared_bytes = memory_footprint({key: value for key, value in st.session_state.items() if key != "profiling"}, shared)
+    return dict(sorted(footprint.items(), key=lambda item: item[1], reverse=True)), shared_bytes
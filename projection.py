@@ -0,0 +1,46 @@
+# projection.py
+# Month-by-month cost projection for any number of components (tiers, S3 zones, warehouses, ...).
+#
+# Each component has a current monthly cost, a compound monthly growth rate and a start month.
+# Step changes add (or remove) a monthly amount from a given month on; the step then grows at
+# its component's rate. The whole (month x component) matrix is built with broadcasting, and the
+# steps are scattered into it with np.add.at, so the cost is the same few array passes whether
+# there are 3 components or several thousand.
+import numpy as np
+import pandas as pd
+
+def project(monthly_cost, growth_pct, start_month=None, horizon=36, steps=None):
+    """
+    Builds the projection matrix.
+
+    monthly_cost, growth_pct, start_month: per-component arrays (growth in % per month,
+    start month 1-based; components cost nothing before they start).
+    steps: optional dict of equal-length arrays {"component": index, "month": 1-based month, "delta": $/month}.
+    Returns an array of shape (horizon, n_components); row 0 is month 1.
+    """
+    monthly_cost = np.asarray(monthly_cost, dtype=float)
+    growth = 1 + np.asarray(growth_pct, dtype=float) / 100
+    start = np.ones(len(monthly_cost)) if start_month is None else np.asarray(start_month, dtype=float)
+    months = np.arange(1, horizon + 1, dtype=float)[:, None]
+
+    elapsed = months - start
+    matrix = np.where(elapsed >= 0, monthly_cost * growth ** np.maximum(elapsed, 0), 0.0)
+
+    if steps is not None and len(steps["component"]):
+        component = np.asarray(steps["component"], dtype=int)
+        step_elapsed = months - np.asarray(steps["month"], dtype=float)
+        contribution = np.where(step_elapsed >= 0, np.asarray(steps["delta"], dtype=float) * growth[component] ** np.maximum(step_elapsed, 0), 0.0)
+        # Several steps may target the same component, so accumulate rather than assign.
+        np.add.at(matrix.T, component, contribution.T)
+
+    return matrix
+
+def projection_frame(matrix, labels, groups=None):
+    """
+    Wraps a projection matrix in a DataFrame indexed by month (1-based).
+    With `groups` (one per component), columns are summed per group instead.
+    """
+    frame = pd.DataFrame(matrix, columns=list(labels), index=pd.RangeIndex(1, len(matrix) + 1, name="Month"))
+    if groups is not None:
+        frame = frame.T.groupby(list(groups), sort=False).sum().T
+    return frame
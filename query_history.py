@@ -0,0 +1,265 @@
+# query_history.py
+# SQL Warehouse billed hours from a query-history export, streamed through a generator pipeline:
+#
+#   read_query_records -> reorder -> concurrency_levels -> billed_sessions -> estimate_billed_hours
+#
+# Supported exports: CSV with a header row, or JSON Lines, of system.query.history rows or
+# /api/2.0/sql/history/queries results (one query, or one {"res": [...]} page, per line), and a single
+# JSON API response. Column names are matched loosely (warehouse_id / compute.warehouse_id / endpoint_id,
+# start_time / query_start_time_ms, end_time / query_end_time_ms or a duration in ms).
+#
+# Each query is a (warehouse, start, end) interval. A warehouse runs as many clusters as its concurrency
+# needs (one per QUERIES_PER_CLUSTER running queries, up to its max_clusters). For every cluster level
+# the intervals in which it is needed are merged with an idle window: suspend_after for the first
+# cluster, which is billed until it auto-suspends, and SCALE_IN_MINUTES for the extra ones. Billed time
+# is the sum of the merged sessions plus that window.
+#
+# Only the running queries of each warehouse and a bounded reorder buffer are held in memory, so memory
+# stays flat however long the log is. Exports need not be sorted: queries arriving up to
+# `max_delay_minutes` out of start-time order are put back in order; later ones are counted as "late"
+# and merged where they land.
+import csv
+import heapq
+import io
+import json
+import math
+from datetime import datetime
+
+QUERY_HISTORY_SUFFIXES = {".csv", ".jsonl", ".json"}
+QUERIES_PER_CLUSTER = 10        # concurrent queries one cluster runs before the warehouse scales out
+SCALE_IN_MINUTES = 15           # an extra cluster is released after this long without enough load
+MAX_DELAY_MINUTES = 360         # reorder window for exports sorted by end time rather than start time
+DAYS_PER_MONTH = 30
+
+# Defaults for warehouses the export mentions but the settings don't
+WAREHOUSE_DEFAULTS = {"auto_suspend": True, "suspend_after": 10, "max_clusters": 1}
+
+_COLUMN_ALIASES = {
+    "warehouse": ["warehouse_id", "compute.warehouse_id", "compute_warehouse_id", "endpoint_id", "warehouse"],
+    "start": ["start_time", "query_start_time", "query_start_time_ms", "start_time_ms", "execution_start_time"],
+    "end": ["end_time", "query_end_time", "query_end_time_ms", "end_time_ms"],
+    "duration_ms": ["total_duration_ms", "duration_ms", "duration", "execution_duration_ms"],
+}
+
+# --- Reading ---
+def _column_key(name):
+    return str(name).strip().lower().replace(" ", "_").replace("-", "_")
+
+def _epoch(value):
+    number = float(value)
+    return number / 1000 if number > 1e11 else number  # milliseconds
+
+def _iso(value):
+    return datetime.fromisoformat(value.strip().replace(" ", "T", 1)).timestamp()
+
+def _timestamp_parser(sample):
+    """Parser for a time column, chosen from its first value: epoch seconds / milliseconds or ISO timestamps."""
+    try:
+        float(sample)
+        return _epoch
+    except (TypeError, ValueError):
+        return _iso
+
+def _flatten(record):
+    # system.query.history nests the warehouse id under "compute"
+    compute = record.get("compute")
+    if isinstance(compute, dict):
+        record = {**record, **{f"compute.{key}": value for key, value in compute.items()}}
+    return record
+
+def _lookup(row):
+    keys = {_column_key(column): column for column in row}
+    return {field: next((keys[alias] for alias in aliases if alias in keys), None) for field, aliases in _COLUMN_ALIASES.items()}
+
+def _parse_row(row, lookup, parsers):
+    """(warehouse, start, end) of one row; raises KeyError / TypeError / ValueError when it lacks them."""
+    warehouse, start = row[lookup["warehouse"]], row[lookup["start"]]
+    end = row.get(lookup["end"]) if lookup["end"] else None
+    start = (parsers.get("start") or parsers.setdefault("start", _timestamp_parser(start)))(start)
+    if end in (None, ""):
+        end = start + float(row[lookup["duration_ms"]]) / 1000
+    else:
+        end = (parsers.get("end") or parsers.setdefault("end", _timestamp_parser(end)))(end)
+    return warehouse, start, end
+
+def _record_reader(rows, report):
+    """Maps raw row dicts to (warehouse, start, end) tuples; rows without a warehouse or times are skipped."""
+    lookup, parsers = None, {}
+    for row in rows:
+        report["rows"] += 1
+        if lookup is None:
+            lookup = _lookup(row)
+        try:
+            warehouse, start, end = _parse_row(row, lookup, parsers)
+        except (KeyError, TypeError, ValueError):
+            # JSON rows need not share the first row's columns; try this row's own before skipping it.
+            try:
+                warehouse, start, end = _parse_row(row, _lookup(row), parsers)
+            except (KeyError, TypeError, ValueError):
+                warehouse = None
+        if not warehouse or end < start:
+            report["skipped"] += 1
+            continue
+        yield str(warehouse), start, end
+
+def _json_rows(lines):
+    for line in lines:
+        if line.strip():
+            obj = json.loads(line)
+            for row in obj.get("res", [obj]) if isinstance(obj, dict) else obj:
+                yield _flatten(row)
+
+def read_query_records(f, fmt, report):
+    """Yields (warehouse id, start, end) in seconds from an open binary file ("csv", "jsonl" or "json")."""
+    text = io.TextIOWrapper(f, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        yield from _record_reader(csv.DictReader(text), report)
+    elif fmt == "jsonl":
+        yield from _record_reader(_json_rows(text), report)
+    elif fmt == "json":
+        # A single JSON document has to be parsed whole.
+        yield from _record_reader(_json_rows([text.read()]), report)
+    else:
+        raise ValueError(f"Unsupported query history format: {fmt!r}")
+
+# --- Pipeline stages ---
+def reorder(records, max_delay_s, report):
+    """Re-sorts records by start time within a window of max_delay_s; records later than that pass through as "late"."""
+    buffer, emitted, counter = [], float("-inf"), 0
+    for record in records:
+        if record[1] < emitted:
+            report["late"] += 1
+            yield record
+            continue
+        heapq.heappush(buffer, (record[1], counter, record))
+        counter += 1
+        while buffer and buffer[0][0] < record[1] - max_delay_s:
+            emitted = buffer[0][0]
+            yield heapq.heappop(buffer)[2]
+    while buffer:
+        yield heapq.heappop(buffer)[2]
+
+def concurrency_levels(records, settings, report):
+    """
+    Sweeps each warehouse's running queries and yields (warehouse, level, start, end) for every interval
+    in which cluster `level` (1 = the warehouse itself) is needed. Records must arrive by start time.
+    """
+    running = {}  # warehouse -> [heap of running queries' end times, clusters needed, {level: needed since}, max clusters]
+
+    def close_levels(warehouse, state, needed, t):
+        for level in range(state[1], needed, -1):
+            yield warehouse, level, state[2].pop(level), t
+        state[1] = needed
+
+    for warehouse, start, end in records:
+        state = running.get(warehouse)
+        if state is None:
+            state = running[warehouse] = [[], 0, {}, max(int(settings(warehouse)["max_clusters"]), 1)]
+            report["queries"][warehouse] = report["peak_clusters"][warehouse] = 0
+        ends, max_clusters = state[0], state[3]
+        # Queries that ended before this one started (the level only changes when a cluster's worth ends)
+        while ends and ends[0] <= start:
+            t = heapq.heappop(ends)
+            needed = min(-(-len(ends) // QUERIES_PER_CLUSTER), max_clusters)
+            if needed < state[1]:
+                yield from close_levels(warehouse, state, needed, t)
+
+        heapq.heappush(ends, end)
+        report["queries"][warehouse] += 1
+        demand = -(-len(ends) // QUERIES_PER_CLUSTER)
+        if demand > report["peak_clusters"][warehouse]:
+            report["peak_clusters"][warehouse] = demand
+        needed = min(demand, max_clusters)
+        for level in range(state[1] + 1, needed + 1):
+            state[2][level] = start
+        state[1] = max(state[1], needed)
+
+    for warehouse, state in running.items():
+        ends = state[0]
+        while ends:
+            t = heapq.heappop(ends)
+            needed = min(-(-len(ends) // QUERIES_PER_CLUSTER), state[3])
+            if needed < state[1]:
+                yield from close_levels(warehouse, state, needed, t)
+
+def billed_sessions(intervals, settings):
+    """
+    Merges each (warehouse, level)'s intervals with its idle window and yields
+    (warehouse, level, start, billed_until) per session. Without auto-suspend the first cluster
+    stays up from the first query to the last.
+    """
+    open_sessions = {}
+
+    def window(warehouse, level):
+        config = settings(warehouse)
+        if level > 1:
+            return SCALE_IN_MINUTES * 60
+        return config["suspend_after"] * 60 if config["auto_suspend"] else float("inf")
+
+    for warehouse, level, start, end in intervals:
+        key = (warehouse, level)
+        session = open_sessions.get(key)
+        if session is not None and start - session[1] <= window(warehouse, level):
+            session[1] = max(session[1], end)
+            continue
+        if session is not None:
+            yield warehouse, level, session[0], session[1] + window(warehouse, level)
+        open_sessions[key] = [start, end]
+
+    for (warehouse, level), (start, end) in open_sessions.items():
+        idle = window(warehouse, level)
+        yield warehouse, level, start, end + (idle if math.isfinite(idle) else 0)
+
+# --- Estimating ---
+def estimate_billed_hours(f, fmt, warehouse_settings=None, max_delay_minutes=MAX_DELAY_MINUTES, default_settings=None):
+    """
+    Streams a query-history export and estimates billed hours per warehouse.
+    `warehouse_settings` maps the export's warehouse ids to {"auto_suspend", "suspend_after" (minutes),
+    "max_clusters"}; other warehouses use default_settings (WAREHOUSE_DEFAULTS when not given).
+    Returns (estimates, report): estimates maps warehouse id to queries, billed_hours (first cluster),
+    cluster_hours (all clusters), peak_clusters (needed, before the max_clusters cap) and
+    cluster_hours_per_month, scaled from the period the export covers; report counts rows, skipped and
+    late rows and gives that period in days.
+    """
+    warehouse_settings = warehouse_settings or {}
+    resolved = {}
+
+    def settings(warehouse):
+        if warehouse not in resolved:
+            resolved[warehouse] = {**WAREHOUSE_DEFAULTS, **(default_settings or {}), **warehouse_settings.get(warehouse, {})}
+        return resolved[warehouse]
+
+    report = {"rows": 0, "skipped": 0, "late": 0, "queries": {}, "peak_clusters": {}}
+    span = [float("inf"), float("-inf")]
+
+    def observed(records):
+        for record in records:
+            span[0] = min(span[0], record[1])
+            span[1] = max(span[1], record[2])
+            yield record
+
+    records = reorder(observed(read_query_records(f, fmt, report)), max_delay_minutes * 60, report)
+    billed = {}
+    for warehouse, level, start, end in billed_sessions(concurrency_levels(records, settings, report), settings):
+        hours = billed.setdefault(warehouse, [0.0, 0.0])
+        hours[1] += (end - start) / 3600
+        if level == 1:
+            hours[0] += (end - start) / 3600
+
+    days = max((span[1] - span[0]) / 86400, 1.0) if billed else 0.0
+    estimates = {
+        warehouse: {
+            "queries": report["queries"].get(warehouse, 0),
+            "billed_hours": first, "cluster_hours": total,
+            "peak_clusters": report["peak_clusters"].get(warehouse, 0),
+            "cluster_hours_per_month": total * DAYS_PER_MONTH / days,
+        }
+        for warehouse, (first, total) in billed.items()
+    }
+    return estimates, {"rows": report["rows"], "skipped": report["skipped"], "late": report["late"], "days": days}
+
+def estimate_billed_hours_file(path, warehouse_settings=None, max_delay_minutes=MAX_DELAY_MINUTES, default_settings=None):
+    """estimate_billed_hours for a file on disk; the format is taken from the file suffix."""
+    fmt = str(path).rsplit(".", 1)[-1].lower()
+    with open(path, "rb") as f:
+        return estimate_billed_hours(f, fmt, warehouse_settings, max_delay_minutes, default_settings)
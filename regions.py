@@ -0,0 +1,173 @@
+# regions.py
+# Prices a scenario in several AWS regions at once.
+#
+# The region-aware price tables are one (regions x price columns) array, REGION_PRICES, with a block of
+# columns per price kind (PRICE_COLUMNS): instance types, DBU tiers, S3 storage / PUT / GET per class,
+# SQL Warehouse sizes, a relative S3 column for costs only known as home-region totals (lifecycle
+# transitions, retrievals and requests) and a trailing 0.0 column for unknown labels.
+# The home region row holds the prices the calculator itself uses (data.py). Other regions take the
+# configured price list's prices (DBU_CALC_PRICE_LIST) where it has them, and otherwise the home
+# prices scaled by data.REGION_PRICE_FACTORS.
+#
+# A scenario is reduced once to region-independent quantities, a (components x price columns) array of
+# node-hours, GB-months, requests and warehouse hours, so the comparison is a single matrix product:
+#   REGION_PRICES @ quantities.T -> (regions x components)
+# Job DBU costs are node-hours (see cost_core.compute_job_cost_arrays); other regions scale them by
+# their tier's DBU rate relative to the home region's, so the home column matches the calculator.
+import numpy as np
+
+import cost_core
+from catalog import DEFAULT_REGION, load_catalog, lookup_prices
+from data import (DBU_RATES, PRICE_LIST_PATH, PRICE_LIST_REGION, REGION_PRICE_FACTORS, S3_PRICING, S3_STORAGE_CLASSES,
+                  SPOT_DISCOUNT_MULTIPLIER, SQL_WAREHOUSE_PRICING, SQL_WAREHOUSE_SIZES)
+from s3_inventory import zone_summary
+from s3_lifecycle import LIFECYCLE_CLASSES
+
+HOME_REGION = PRICE_LIST_REGION if PRICE_LIST_PATH else DEFAULT_REGION
+
+# --- Price tables ---
+# (block, catalog kind, REGION_PRICE_FACTORS kind, catalog names, home-region prices)
+_PRICE_BLOCKS = [
+    ("instance", "ec2", "ec2", [label.rsplit(" (", 1)[0] for label in cost_core.INSTANCE_INDEX], cost_core.INSTANCE_PRICE_ARRAY[:-1]),
+    ("dbu", "dbu", "dbu", list(DBU_RATES), list(DBU_RATES.values())),
+    ("s3_storage", "s3_storage", "s3", S3_STORAGE_CLASSES, [S3_PRICING[c]["storage_gb"] for c in S3_STORAGE_CLASSES]),
+    ("s3_put", "s3_put_1k", "s3", S3_STORAGE_CLASSES, [S3_PRICING[c]["put_1k"] for c in S3_STORAGE_CLASSES]),
+    ("s3_get", "s3_get_1k", "s3", S3_STORAGE_CLASSES, [S3_PRICING[c]["get_1k"] for c in S3_STORAGE_CLASSES]),
+    ("sql", "sql_warehouse", "sql", SQL_WAREHOUSE_SIZES, [SQL_WAREHOUSE_PRICING[s]["cost_per_hr"] for s in SQL_WAREHOUSE_SIZES]),
+]
+
+def _region_list(catalog):
+    regions = [HOME_REGION, *REGION_PRICE_FACTORS]
+    if catalog is not None:
+        regions += sorted(str(region) for region in np.unique(np.asarray(catalog["region"])) if region)
+    return list(dict.fromkeys(regions))
+
+def _relative_factor(region, kind):
+    home = REGION_PRICE_FACTORS.get(HOME_REGION, {}).get(kind, 1.0)
+    return REGION_PRICE_FACTORS.get(region, {}).get(kind, home) / home
+
+def build_price_tables(catalog=None):
+    """
+    Builds the region-aware price tables from a catalog (or the sample factors alone when None).
+    Returns (regions, prices, columns): prices is (regions x price columns) and columns maps each
+    block name to its first column.
+    """
+    regions = _region_list(catalog)
+    columns, blocks, offset = {}, [], 0
+    for block, kind, factor_kind, names, home_prices in _PRICE_BLOCKS:
+        home_prices = np.asarray(home_prices, dtype=float)
+        prices = np.outer([_relative_factor(region, factor_kind) for region in regions], home_prices)
+        if catalog is not None:
+            for i, region in enumerate(regions[1:], start=1):
+                listed = lookup_prices(catalog, kind, names, region)
+                prices[i] = np.where(np.isnan(listed), prices[i], listed)
+        columns[block] = offset
+        blocks.append(prices)
+        offset += len(names)
+
+    # Costs only known as home-region totals follow each region's Standard storage price
+    storage = blocks[list(columns).index("s3_storage")][:, S3_STORAGE_CLASSES.index("Standard")]
+    columns["s3_relative"] = offset
+    columns["none"] = offset + 1
+    blocks += [(storage / storage[0])[:, None], np.zeros((len(regions), 1))]
+    return regions, np.hstack(blocks), columns
+
+REGIONS, REGION_PRICES, PRICE_COLUMNS = build_price_tables(load_catalog(PRICE_LIST_PATH) if PRICE_LIST_PATH else None)
+
+# --- Quantities ---
+def _column(block, positions):
+    """Price columns of `block` for label positions; unknown labels (-1) price at zero."""
+    positions = np.asarray(positions)
+    return np.where(positions >= 0, PRICE_COLUMNS[block] + positions, PRICE_COLUMNS["none"])
+
+def _position(names, name):
+    return names.index(name) if name in names else -1
+
+def _s3_terms(scenario, add):
+    method = scenario.get("s3_calc_method", "Direct Storage")
+    if method == "Direct Storage":
+        for zone, config in scenario["s3_direct"].items():
+            c = add(f"s3:{zone}", f"S3 {zone}", "S3 Storage")
+            storage_class = _position(S3_STORAGE_CLASSES, config["class"])
+            storage_gb = config["amount"] * 1024 if config["unit"] == "TB" else config["amount"]
+            yield c, _column("s3_storage", storage_class), storage_gb
+            yield c, _column("s3_put", storage_class), config["put"]
+            yield c, _column("s3_get", storage_class), config["get"]
+
+    elif method == "Lifecycle Simulation":
+        # Average month over the horizon, as calculate_s3_cost_per_zone reports it
+        zones, simulation = cost_core.simulate_s3_lifecycle(scenario)
+        storage_gb = simulation["storage_gb"].mean(axis=1)
+        other = (simulation["total_cost"] - simulation["storage_cost"]).mean(axis=1)
+        classes = _column("s3_storage", [S3_STORAGE_CLASSES.index(c) for c in LIFECYCLE_CLASSES])
+        for i, zone in enumerate(zones):
+            c = add(f"s3:{zone}", f"S3 {zone}", "S3 Storage")
+            yield np.full(len(classes), c), classes, storage_gb[i]
+            yield c, PRICE_COLUMNS["s3_relative"], other[i]
+
+    elif method == "Table Inventory":
+        priced = cost_core.price_s3_inventory(scenario)
+        zones = {zone: add(f"s3:{zone}", f"S3 {zone}", "S3 Storage") for zone in zone_summary(priced)["Zone"]}
+        component = np.array([zones.get(zone, -1) for zone in priced["Zone"].cat.categories] + [-1])[priced["Zone"].cat.codes.to_numpy()]
+        yield component, _column("s3_storage", priced["Storage Class"].cat.codes.to_numpy()), priced["Stored (GB)"].to_numpy()
+
+    else: # Table-Based
+        for zone, config in scenario["s3_table_based"].items():
+            c = add(f"s3:{zone}", f"S3 {zone}", "S3 Storage")
+            estimated_gb = (config["tables"] * config["records"] * config["size_kb"]) / (1024 * 1024)
+            yield c, _column("s3_storage", S3_STORAGE_CLASSES.index("Standard")), estimated_gb
+
+def scenario_quantities(scenario):
+    """
+    Reduces a scenario to region-independent quantities.
+    Returns (components, quantities): components is a dict of equal-length lists (id, label, group), one
+    entry per tier, S3 zone and SQL Warehouse as calculations.projection_components lists them, and
+    quantities is a (components x price columns) array to be multiplied by REGION_PRICES.
+    """
+    components = {"id": [], "label": [], "group": []}
+
+    def add(component_id, label, group):
+        components["id"].append(component_id)
+        components["label"].append(label)
+        components["group"].append(group)
+        return len(components["id"]) - 1
+
+    def job_terms():
+        for tier_position, (tier, home_rate) in enumerate(DBU_RATES.items()):
+            c = add(f"dbx:{tier}", f"Databricks {tier}", "Databricks & Compute")
+            jobs = cost_core.job_input_arrays(scenario["dbx_jobs"][tier])
+            units = np.nan_to_num(jobs["runtime"] * jobs["runs"] * jobs["nodes"])
+            yield c, _column("instance", jobs["codes"]), units * np.where(jobs["spot"], SPOT_DISCOUNT_MULTIPLIER, 1.0)
+            yield c, PRICE_COLUMNS["dbu"] + tier_position, units.sum() / home_rate
+
+    def sql_terms():
+        for warehouse in scenario["sql_warehouses"]:
+            c = add(f"sql:{warehouse['id']}", f"SQL {warehouse['name']}", "SQL Warehouse")
+            estimate = warehouse.get("query_history_estimate")
+            if estimate:
+                hours = estimate["cluster_hours_per_month"]
+            elif warehouse["auto_suspend"] and warehouse["hours_per_day"] > 0 and warehouse["days_per_month"] > 0:
+                hours = warehouse["hours_per_day"] * warehouse["days_per_month"]
+            else:
+                hours = 0
+            yield c, _column("sql", _position(SQL_WAREHOUSE_SIZES, warehouse["size"])), hours
+
+    terms = [np.broadcast_arrays(*term) for term in [*job_terms(), *_s3_terms(scenario, add), *sql_terms()]]
+    component, column, quantity = (np.concatenate([np.ravel(term[i]) for term in terms]) for i in range(3))
+    n_columns = REGION_PRICES.shape[1]
+    # Sum the terms per (component, price column); rows outside any component (-1) are dropped
+    keep = component >= 0
+    quantities = np.bincount(component[keep] * n_columns + column[keep], weights=quantity[keep].astype(float),
+                             minlength=len(components["id"]) * n_columns)
+    return components, quantities.reshape(len(components["id"]), n_columns)
+
+# --- Comparison ---
+def region_cost_matrix(scenario, regions=None):
+    """
+    Monthly cost of every component of a scenario in every region.
+    Returns (components, regions, matrix) with matrix shaped (regions x components); regions defaults to REGIONS.
+    """
+    regions = list(regions or REGIONS)
+    components, quantities = scenario_quantities(scenario)
+    rows = [REGIONS.index(region) for region in regions]
+    return components, regions, REGION_PRICES[rows] @ quantities.T
@@ -0,0 +1,378 @@
+# run_history.py
+# Job runtime and node-hours measured from local logs, turned into per-tier job frames.
+#
+# Supported files (plain or .gz), found recursively under one or more paths:
+#   * Spark event logs (one JSON event per line, e.g. cluster-logs/<cluster>/eventlog/<app>/eventlog*).
+#     Nodes are the driver plus the live executors, integrated over SparkListenerExecutorAdded/Removed
+#     events between application start and end. Rolled logs of one application (eventlog-*.gz in the
+#     same directory) are combined. Job name, id, node type, Photon and Spot come from the Spark
+#     properties and the cluster's default tags (JobId, RunName).
+#   * Jobs run history: /api/2.1/jobs/runs/list responses ({"runs": [...]}, pages or JSON Lines).
+#     Tasks that share a cluster (same cluster_id, or same job_cluster_key) are merged: the cluster is
+#     priced once, from its first task's start to its last task's end, idle time between tasks included.
+#   * Cluster event history: /api/2.0/clusters/events responses ({"events": [...]}). A run whose cluster
+#     has events is integrated over current_num_workers; otherwise its cluster spec gives the nodes
+#     (the midpoint of min and max workers for autoscaling clusters).
+#
+# Files are parsed in parallel across processes into small summaries (executor deltas, run windows,
+# worker steps), and each summary is cached on disk under the file's path, size and mtime, so a
+# re-import only parses new or changed logs. Summaries are combined afterwards, because a run and
+# its cluster's events usually live in different files.
+#
+# Per job: Runtime (hrs) is the mean wall-clock run time, Runs/Month the run count scaled to 30 days of
+# the period the logs cover, and Nodes the time-weighted average node count (fractional for autoscaling
+# clusters), so Runtime x Runs x Nodes is the measured node-hours.
+import gzip
+import hashlib
+import json
+import os
+import re
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from cost_core import JOB_INPUT_COLUMNS
+from importer import normalize_jobs
+
+LOG_SUFFIXES = {"", ".json", ".jsonl", ".log", ".gz"}
+CACHE_DIR_NAME = ".run_history_cache"
+DAYS_PER_MONTH = 30
+_CACHE_FORMAT_VERSION = 2
+# Spark writes "Event" first, so matching the start of a line tells which events to decode
+_SPARK_EVENT = re.compile(r'"Event"\s*:\s*"SparkListener(?:ExecutorAdded|ExecutorRemoved|ApplicationStart|ApplicationEnd|EnvironmentUpdate)"')
+
+# --- Finding and caching files ---
+def find_log_files(paths):
+    """Every candidate log file under the given files / directories (cache directories excluded), sorted."""
+    files = []
+    for path in map(Path, paths):
+        if path.is_file():
+            files.append(path)
+        elif path.is_dir():
+            files.extend(p for p in path.rglob("*") if p.is_file() and CACHE_DIR_NAME not in p.parts
+                         and p.suffix.lower() in LOG_SUFFIXES and not p.name.startswith("."))
+    return sorted(set(files))
+
+def _file_fingerprint(path):
+    stat = os.stat(path)
+    token = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}|{_CACHE_FORMAT_VERSION}"
+    return hashlib.sha1(token.encode()).hexdigest()[:16]
+
+def cached_summary_path(path, cache_dir):
+    return Path(cache_dir) / f"{Path(path).name}-{_file_fingerprint(path)}.json"
+
+# --- Parsing one file ---
+def _open_text(path):
+    if str(path).endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, encoding="utf-8-sig")
+
+def _spark_key(path):
+    # Rolled event logs of one application share a directory; a single-file log is its own key.
+    path = Path(path)
+    return str(path.parent) if path.name.startswith("eventlog") else str(path)
+
+def _chain_events(first, lines):
+    # Task and stage events are the bulk of an event log; only the few kinds used here are decoded.
+    yield first
+    for line in lines:
+        if _SPARK_EVENT.search(line, 0, 120):
+            yield json.loads(line)
+
+def _parse_spark(first, lines, path):
+    summary = {"key": _spark_key(path), "deltas": [], "start": None, "end": None, "first": None, "last": None, "properties": {}}
+
+    def seen(t):
+        summary["first"] = t if summary["first"] is None else min(summary["first"], t)
+        summary["last"] = t if summary["last"] is None else max(summary["last"], t)
+
+    for event in _chain_events(first, lines):
+        kind = event.get("Event")
+        t = event.get("Timestamp")
+        if t is not None:
+            t = t / 1000
+            seen(t)
+        if kind == "SparkListenerExecutorAdded":
+            summary["deltas"].append([t, 1])
+        elif kind == "SparkListenerExecutorRemoved":
+            summary["deltas"].append([t, -1])
+        elif kind == "SparkListenerApplicationStart":
+            summary["start"] = t
+            summary["properties"]["app_name"] = event.get("App Name")
+        elif kind == "SparkListenerApplicationEnd":
+            summary["end"] = t
+        elif kind == "SparkListenerEnvironmentUpdate":
+            properties = event.get("Spark Properties", {})
+            if isinstance(properties, list):  # older logs write [[key, value], ...]
+                properties = dict(properties)
+            summary["properties"].update({key: value for key, value in properties.items() if key.startswith("spark.databricks.")})
+    return summary
+
+def _cluster_summary(spec):
+    spec = spec or {}
+    autoscale = spec.get("autoscale") or {}
+    return {
+        "node_type": spec.get("node_type_id"),
+        "workers": spec.get("num_workers") if not autoscale else None,
+        "min_workers": autoscale.get("min_workers"), "max_workers": autoscale.get("max_workers"),
+        "photon": spec.get("runtime_engine") == "PHOTON" or "photon" in str(spec.get("spark_version", "")),
+        "spot": str(spec.get("aws_attributes", {}).get("availability", "")).startswith("SPOT"),
+        "tier": (spec.get("custom_tags") or {}).get("tier"),
+    }
+
+def _run_summary(run):
+    """
+    One Jobs API run -> {job, name, start, end, tier, clusters: [{cluster_id, start, end, spec...}]} (times in seconds),
+    with one cluster entry per distinct cluster the run's tasks ran on, spanning all of its tasks.
+    """
+    job_clusters = {c.get("job_cluster_key"): c.get("new_cluster") for c in run.get("job_clusters", [])}
+    run_spec = (run.get("cluster_spec") or {}).get("new_cluster")
+    clusters = {}
+    for position, task in enumerate(run.get("tasks") or [run]):
+        spec = task.get("new_cluster") or job_clusters.get(task.get("job_cluster_key")) or (task.get("cluster_spec") or {}).get("new_cluster") or run_spec
+        cluster_id = (task.get("cluster_instance") or run.get("cluster_instance") or {}).get("cluster_id")
+        start, end = task.get("start_time") or run.get("start_time"), task.get("end_time") or run.get("end_time")
+        if not start or not end or (spec is None and cluster_id is None):
+            continue
+        # Tasks on one cluster share it; a task with its own new_cluster is a cluster of its own
+        key = cluster_id or (f"job_cluster:{task['job_cluster_key']}" if task.get("job_cluster_key") in job_clusters else f"task:{position}")
+        cluster = clusters.get(key)
+        if cluster is None:
+            clusters[key] = {"cluster_id": cluster_id, "start": start / 1000, "end": end / 1000, **_cluster_summary(spec)}
+        else:
+            cluster["start"], cluster["end"] = min(cluster["start"], start / 1000), max(cluster["end"], end / 1000)
+    clusters = list(clusters.values())
+    if not clusters or not run.get("end_time"):
+        return None
+    return {
+        "job": str(run.get("job_id", run.get("run_name", ""))), "name": run.get("run_name") or str(run.get("job_id", "")),
+        "start": run["start_time"] / 1000, "end": run["end_time"] / 1000, "tier": (run.get("tags") or {}).get("tier"),
+        "clusters": clusters,
+    }
+
+def _collect_objects(obj, summary):
+    for item in obj if isinstance(obj, list) else [obj]:
+        if not isinstance(item, dict):
+            continue
+        if "runs" in item or "events" in item:  # a list-API page
+            _collect_objects(item.get("runs", []), summary)
+            _collect_objects(item.get("events", []), summary)
+        elif "run_id" in item:
+            run = _run_summary(item)
+            if run:
+                summary["runs"].append(run)
+        elif "cluster_id" in item and "timestamp" in item:
+            details = item.get("details") or {}
+            if item.get("type") in ("TERMINATING", "TERMINATED"):
+                summary["clusters"].setdefault(item["cluster_id"], []).append([item["timestamp"] / 1000, -1])
+            elif "current_num_workers" in details:
+                summary["clusters"].setdefault(item["cluster_id"], []).append([item["timestamp"] / 1000, details["current_num_workers"]])
+
+def parse_log_file(path):
+    """
+    Summarizes one log file: {"spark": [app part], "runs": [...], "clusters": {cluster_id: [[t, workers], ...]}}
+    (workers -1: the cluster is down). Files that are none of the supported kinds give an empty summary.
+    """
+    summary = {"spark": [], "runs": [], "clusters": {}}
+    with _open_text(path) as f:
+        first_line = next((line for line in f if line.strip()), None)
+        if first_line is None:
+            return summary
+        try:
+            first = json.loads(first_line)
+        except json.JSONDecodeError:
+            first = None
+        if isinstance(first, dict) and "Event" in first:
+            summary["spark"].append(_parse_spark(first, f, path))
+        elif first is not None:
+            # JSON Lines of runs / events / pages (or a one-line JSON document)
+            _collect_objects(first, summary)
+            for line in f:
+                if line.strip():
+                    _collect_objects(json.loads(line), summary)
+        else:
+            # A pretty-printed JSON document has to be parsed whole.
+            _collect_objects(json.loads(first_line + f.read()), summary)
+    return summary
+
+def _parse_and_cache(path, cache_dir):
+    """Worker entry point: parses a file and writes its summary to the cache. Failures are returned, not raised."""
+    try:
+        summary = parse_log_file(path)
+    except Exception as exc:
+        return str(path), None, f"{type(exc).__name__}: {exc}"
+    target = cached_summary_path(path, cache_dir)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    staging = target.with_name(f".{target.name}.{os.getpid()}")
+    staging.write_text(json.dumps(summary))
+    os.replace(staging, target)
+    return str(path), summary, None
+
+def load_summaries(files, cache_dir, workers=None, progress=None):
+    """
+    Summaries of all files: cached ones are read back, the rest are parsed across `workers` processes.
+    `progress(files_done, total)` is called as files complete. Returns (summaries, report).
+    """
+    summaries, pending = [], []
+    report = {"files": len(files), "cached": 0, "parsed": 0, "errors": {}}
+    for path in files:
+        target = cached_summary_path(path, cache_dir)
+        if target.exists():
+            summaries.append(json.loads(target.read_text()))
+            report["cached"] += 1
+        else:
+            pending.append(str(path))
+
+    workers = workers or os.cpu_count() or 1
+    done = report["cached"]
+    if workers <= 1 or len(pending) <= 1:
+        results = (_parse_and_cache(path, cache_dir) for path in pending)
+    else:
+        executor = ProcessPoolExecutor(max_workers=min(workers, len(pending)))
+        results = executor.map(_parse_and_cache, pending, [cache_dir] * len(pending), chunksize=max(1, len(pending) // (workers * 4)))
+    try:
+        for path, summary, error in results:
+            done += 1
+            if error:
+                report["errors"][path] = error
+            else:
+                summaries.append(summary)
+                report["parsed"] += 1
+            if progress:
+                progress(done, len(files))
+    finally:
+        if workers > 1 and len(pending) > 1:
+            executor.shutdown()
+    return summaries, report
+
+# --- Combining ---
+def _step_integral(times, values, start, end):
+    """Integral of a step function (value[i] from times[i] on; the first value also before it) over [start, end]."""
+    if end <= start:
+        return 0.0
+    widths = np.diff(np.clip(np.concatenate([[start], times, [end]]), start, end))
+    return float(np.dot(widths, np.concatenate([[values[0]], values])))
+
+def _cluster_timelines(summaries):
+    steps = defaultdict(list)
+    for summary in summaries:
+        for cluster_id, events in summary["clusters"].items():
+            steps[cluster_id].extend(events)
+    timelines = {}
+    for cluster_id, events in steps.items():
+        events.sort()
+        times = np.array([t for t, _ in events], dtype=float)
+        workers = np.array([w for _, w in events], dtype=float)
+        timelines[cluster_id] = (times, np.where(workers < 0, 0.0, workers + 1))  # driver + workers while up
+    return timelines
+
+def _spark_apps(summaries):
+    """Combines the parts of each Spark application (rolled logs) into run records."""
+    parts = defaultdict(list)
+    for summary in summaries:
+        for part in summary["spark"]:
+            parts[part["key"]].append(part)
+    runs = []
+    for app_parts in parts.values():
+        deltas = sorted(delta for part in app_parts for delta in part["deltas"] if delta[0] is not None)
+        properties = {key: value for part in app_parts for key, value in part["properties"].items()}
+        start = next((p["start"] for p in app_parts if p["start"] is not None), None) or min((p["first"] for p in app_parts if p["first"] is not None), default=None)
+        end = next((p["end"] for p in app_parts if p["end"] is not None), None) or max((p["last"] for p in app_parts if p["last"] is not None), default=None)
+        if start is None or end is None or end <= start:
+            continue
+        times = np.array([t for t, _ in deltas], dtype=float)
+        nodes = 1 + np.maximum(np.cumsum([d for _, d in deltas]), 0) if deltas else np.array([], dtype=float)
+        node_seconds = _step_integral(np.concatenate([[start], times]), np.concatenate([[1.0], nodes]), start, end)
+
+        try:
+            tags = {tag["key"]: tag["value"] for tag in json.loads(properties.get("spark.databricks.clusterUsageTags.clusterAllTags", "[]"))}
+        except (TypeError, ValueError, KeyError):
+            tags = {}
+        availability = " ".join(str(value) for key, value in properties.items() if key.lower().endswith("availability"))
+        runs.append({
+            "job": str(tags.get("JobId") or properties.get("spark.databricks.job.id") or properties.get("app_name") or ""),
+            "name": tags.get("RunName") or properties.get("app_name") or tags.get("ClusterName") or "Spark application",
+            "start": start, "end": end, "node_seconds": node_seconds, "tier": tags.get("tier"),
+            "node_type": properties.get("spark.databricks.clusterUsageTags.clusterNodeType"),
+            "photon": "photon" in str(properties.get("spark.databricks.clusterUsageTags.sparkVersion", "")).lower()
+                      or str(properties.get("spark.databricks.photon.enabled", "")).lower() == "true",
+            "spot": "SPOT" in availability.upper(),
+        })
+    return runs
+
+def _api_runs(summaries, timelines):
+    """Jobs API runs with node-seconds from their clusters' events, or from the cluster spec."""
+    runs = []
+    for summary in summaries:
+        for run in summary["runs"]:
+            node_seconds, largest = 0.0, (-1.0, None)
+            for cluster in run["clusters"]:
+                timeline = timelines.get(cluster["cluster_id"])
+                if timeline is not None:
+                    seconds = _step_integral(*timeline, cluster["start"], cluster["end"])
+                else:
+                    workers = cluster["workers"]
+                    if workers is None:
+                        workers = ((cluster["min_workers"] or 0) + (cluster["max_workers"] or 0)) / 2
+                    seconds = (1 + workers) * max(cluster["end"] - cluster["start"], 0)
+                node_seconds += seconds
+                largest = max(largest, (seconds, cluster), key=lambda item: item[0])
+            cluster = largest[1] or run["clusters"][0]
+            runs.append({"job": run["job"], "name": run["name"], "start": run["start"], "end": run["end"], "node_seconds": node_seconds,
+                         "tier": run["tier"] or cluster["tier"], "node_type": cluster["node_type"], "photon": cluster["photon"], "spot": cluster["spot"]})
+    return runs
+
+def summarize_runs(summaries):
+    """One row per measured run: job, name, start, end, node_seconds, tier, node_type, photon, spot."""
+    runs = _spark_apps(summaries) + _api_runs(summaries, _cluster_timelines(summaries))
+    return pd.DataFrame(runs, columns=["job", "name", "start", "end", "node_seconds", "tier", "node_type", "photon", "spot"])
+
+def runs_to_jobs(runs, default_tier=None):
+    """
+    Aggregates measured runs into one job row per job and returns (jobs by tier, report), like
+    importer.import_jobs. The period the runs cover (at least a day) scales run counts to a month.
+    """
+    if runs.empty:
+        return {}, {"runs": 0, "jobs": 0, "days": 0.0, "skipped_tier": 0, "unknown_instance": 0, "imported": {}}
+    days = max(float(runs["end"].max() - runs["start"].min()) / 86400, 1.0)
+    runs = runs.assign(hours=(runs["end"] - runs["start"]) / 3600, node_hours=runs["node_seconds"] / 3600)
+    grouped = runs.sort_values("start").groupby("job", sort=False)
+    jobs = grouped.agg(
+        name=("name", "last"), tier=("tier", "last"), node_type=("node_type", "last"), photon=("photon", "last"),
+        spot=("spot", "last"), count=("hours", "size"), hours=("hours", "sum"), node_hours=("node_hours", "sum"),
+    ).reset_index()
+
+    raw = pd.DataFrame({
+        "Tier": jobs["tier"], "Job Name": jobs["name"],
+        "Runtime (hrs)": (jobs["hours"] / jobs["count"]).round(4),
+        "Runs/Month": np.maximum(np.rint(jobs["count"] * DAYS_PER_MONTH / days), 1),
+        # Time-weighted average nodes; fractional for autoscaling clusters
+        "Instance Type": jobs["node_type"], "Nodes": (jobs["node_hours"] / jobs["hours"].where(jobs["hours"] > 0)).fillna(1.0).round(2),
+        "Photon": jobs["photon"], "Spot": jobs["spot"],
+    })
+    normalized = normalize_jobs(raw, default_tier)
+
+    report = {"runs": len(runs), "jobs": len(jobs), "days": days,
+              "skipped_tier": int(normalized["Tier"].isna().sum()), "unknown_instance": int(normalized["Instance Type"].isna().sum())}
+    jobs_by_tier = {}
+    for tier, group in normalized.groupby("Tier", observed=True, sort=False):
+        group = group.drop(columns="Tier").reset_index(drop=True)
+        group.insert(0, "#", np.arange(1, len(group) + 1))
+        jobs_by_tier[tier] = group[JOB_INPUT_COLUMNS]
+    report["imported"] = {tier: len(jobs) for tier, jobs in jobs_by_tier.items()}
+    return jobs_by_tier, report
+
+def import_run_history(paths, default_tier=None, cache_dir=None, workers=None, progress=None):
+    """
+    Parses (or reads cached summaries of) every log under `paths` and returns (jobs by tier, report).
+    The cache defaults to a .run_history_cache directory in the first path (or next to it, for a file).
+    """
+    paths = [Path(p) for p in ([paths] if isinstance(paths, (str, os.PathLike)) else paths)]
+    if cache_dir is None:
+        cache_dir = (paths[0] if paths[0].is_dir() else paths[0].parent) / CACHE_DIR_NAME
+    summaries, file_report = load_summaries(find_log_files(paths), cache_dir, workers, progress)
+    jobs_by_tier, report = runs_to_jobs(summarize_runs(summaries), default_tier)
+    return jobs_by_tier, {**file_report, **report}
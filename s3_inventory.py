@@ -0,0 +1,250 @@
+# s3_inventory.py
+# Per-table S3 storage costs from a table inventory.
+#
+# Supported exports (CSV with a header row, Parquet, or JSON Lines):
+#   * DESCRIBE DETAIL output, one table per row: name, sizeInBytes and, when present, the table
+#     properties (for delta.deletedFileRetentionDuration).
+#   * S3 Inventory reports, one object per row: bucket, key, size, storage_class. Objects are rolled up
+#     to their table root, i.e. the key up to "_delta_log/", the first "column=value/" partition
+#     directory or the file name, per storage class.
+#   * A planned inventory: table, records and average record size (KB), which is uncompressed.
+# Column names are matched loosely, as in importer.py; an optional zone/layer column assigns tables
+# to zones directly.
+#
+# Tables are kept in one compact frame (INVENTORY_COLUMNS) and priced column-wise against the zone
+# settings, then summed per zone with one groupby, so 50k+ tables price in milliseconds:
+#   stored GB = (measured size, or logical size / compression ratio)
+#               * (1 + daily churn % / 100 * retention days)
+# The second factor approximates data files that Delta keeps for retained versions until VACUUM.
+# Object-level sizes already include those files, so their retention is 0.
+import io
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from data import S3_PRICING, S3_STORAGE_CLASSES
+
+INVENTORY_SUFFIXES = {".csv", ".parquet", ".jsonl"}
+CHUNK_ROWS = 200_000
+UNASSIGNED_ZONE = "Unassigned"
+DEFAULT_RETENTION_DAYS = 7  # Delta's default delta.deletedFileRetentionDuration
+
+INVENTORY_COLUMNS = ["Zone", "Table", "Storage Class", "Size (GB)", "Logical (GB)", "Retention (days)"]
+STORAGE_CLASS_DTYPE = pd.CategoricalDtype(S3_STORAGE_CLASSES)
+SUMMARY_COLUMNS = ["Zone", "Tables", "Reported (GB)", "Stored (GB)", "Cost"]
+
+# Per-zone settings (scenario["s3_inventory"]); "match" is a case-insensitive regex tried against
+# the zone column and the table name of rows the export doesn't assign to a known zone.
+ZONE_DEFAULTS = {"match": "", "storage_class": "Standard", "compression_ratio": 1.0, "daily_churn_pct": 0.0, "retention_days": DEFAULT_RETENTION_DAYS}
+
+_GB = 1024 ** 3
+_COLUMN_ALIASES = {
+    "Zone": ["zone", "layer", "medallion", "tier"],
+    "Table": ["table", "table_name", "full_name", "name", "location"],
+    "Bucket": ["bucket"],
+    "Key": ["key", "object_key"],
+    "Bytes": ["size_in_bytes", "sizeinbytes", "size_bytes", "bytes", "size"],
+    "Records": ["records", "num_records", "numrecords", "row_count", "rows"],
+    "Record KB": ["record_kb", "avg_record_kb", "record_size_kb", "size_kb"],
+    "Retention (days)": ["retention_days", "deleted_file_retention_days"],
+    "Properties": ["properties"],
+    "Storage Class": ["storage_class", "storageclass", "class"],
+}
+# S3 Inventory storage class names -> the calculator's; anything else takes the zone's class
+_STORAGE_CLASS_NAMES = {
+    **{name.lower(): name for name in S3_STORAGE_CLASSES},
+    "standard": "Standard", "intelligent_tiering": "Intelligent-Tiering", "standard_ia": "Infrequent Access",
+    "onezone_ia": "Infrequent Access", "glacier_ir": "Glacier Instant Retrieval",
+}
+# Table root of an object key: everything before "_delta_log/", a "col=value/" directory or the file name
+_TABLE_ROOT = r"^(.*?)/(?:_delta_log/|[^/=]+=[^/]*/|[^/]+$)"
+_RETENTION_PROPERTY = r"deletedFileRetentionDuration\W+(?:interval\s+)?(\d+)\s*day"
+
+def empty_inventory():
+    return normalize_inventory(pd.DataFrame())
+
+# --- Reading ---
+def _column_key(name):
+    return str(name).strip().lower().replace(" ", "_").replace("-", "_").replace("/", "_")
+
+def iter_inventory_chunks(f, fmt, chunk_rows=CHUNK_ROWS):
+    """Yields raw DataFrame chunks from an open binary file ("csv", "parquet" or "jsonl")."""
+    if fmt == "csv":
+        yield from pd.read_csv(f, chunksize=chunk_rows)
+    elif fmt == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Reading Parquet inventories requires pyarrow (pip install pyarrow)")
+        parquet = pq.ParquetFile(f)
+        total_rows = parquet.metadata.num_rows
+        for batch in parquet.iter_batches(batch_size=chunk_rows):
+            chunk = batch.to_pandas()
+            chunk.attrs["total_rows"] = total_rows
+            yield chunk
+    elif fmt == "jsonl":
+        yield from pd.read_json(io.TextIOWrapper(f, encoding="utf-8-sig"), lines=True, chunksize=chunk_rows)
+    else:
+        raise ValueError(f"Unsupported inventory format: {fmt!r}")
+
+# --- Normalizing ---
+def normalize_inventory(chunk):
+    """
+    Maps a raw chunk onto INVENTORY_COLUMNS. Object-level rows (a key column) are rolled up to one row
+    per table root and storage class. Values the export doesn't have are NaN and fall back to the
+    zone settings when priced.
+    """
+    lookup = {_column_key(alias): canonical for canonical, aliases in _COLUMN_ALIASES.items() for alias in [canonical, *aliases]}
+    renamed = {}
+    for column in chunk.columns:
+        canonical = lookup.get(_column_key(column))
+        if canonical and canonical not in renamed.values():
+            renamed[column] = canonical
+    chunk = chunk.rename(columns=renamed)
+    n = len(chunk)
+
+    def column(name, default=np.nan):
+        return chunk[name] if name in chunk else pd.Series(default, index=chunk.index, dtype=object if isinstance(default, str) else float)
+
+    def numeric(name):
+        return pd.to_numeric(column(name), errors="coerce").to_numpy(dtype=float)
+
+    storage_class = pd.Categorical(column("Storage Class", "").astype(str).str.strip().str.lower().map(_STORAGE_CLASS_NAMES),
+                                   dtype=STORAGE_CLASS_DTYPE)
+    zone = column("Zone", "").fillna("").astype(str).to_numpy(dtype=object)
+    size_gb = numeric("Bytes") / _GB
+
+    if "Key" in chunk:
+        # S3 Inventory: roll objects up to their table root
+        root = chunk["Key"].astype(str).str.extract(_TABLE_ROOT, expand=False).fillna("")
+        table = (column("Bucket", "").fillna("").astype(str) + "/" + root).to_numpy(dtype=object)
+        objects = pd.DataFrame({"Zone": zone, "Table": table, "Storage Class": storage_class, "Size (GB)": np.nan_to_num(size_gb)})
+        rolled = objects.groupby(["Zone", "Table", "Storage Class"], observed=True, sort=False, dropna=False)["Size (GB)"].sum().reset_index()
+        rolled["Logical (GB)"] = np.nan
+        rolled["Retention (days)"] = 0.0  # measured sizes already include retained files
+        rolled = rolled[INVENTORY_COLUMNS]
+        rolled.attrs["objects"] = True
+        return rolled
+
+    retention = numeric("Retention (days)")
+    if "Properties" in chunk:
+        parsed = chunk["Properties"].astype(str).str.extract(_RETENTION_PROPERTY, expand=False)
+        retention = np.where(np.isnan(retention), pd.to_numeric(parsed, errors="coerce").to_numpy(dtype=float), retention)
+
+    return pd.DataFrame({
+        "Zone": zone,
+        "Table": column("Table", "").fillna("").astype(str).to_numpy(dtype=object),
+        "Storage Class": storage_class,
+        "Size (GB)": size_gb,
+        "Logical (GB)": numeric("Records") * numeric("Record KB") / (1024 * 1024),
+        "Retention (days)": retention,
+    }, index=pd.RangeIndex(n))
+
+def _combine(frames):
+    """Concatenates normalized chunks; object-level rollups of the same table in different chunks are merged."""
+    objects = any(frame.attrs.get("objects") for frame in frames)
+    tables = pd.concat(frames, ignore_index=True) if frames else empty_inventory()
+    if objects:
+        keys = ["Zone", "Table", "Storage Class"]
+        tables = (tables.groupby(keys, observed=True, sort=False, dropna=False)
+                  .agg({"Size (GB)": "sum", "Logical (GB)": "first", "Retention (days)": "first"}).reset_index()[INVENTORY_COLUMNS])
+    tables["Storage Class"] = tables["Storage Class"].astype(STORAGE_CLASS_DTYPE)
+    return tables
+
+def import_inventory(f, fmt, chunk_rows=CHUNK_ROWS, total_bytes=None, progress=None):
+    """
+    Reads a table inventory into one INVENTORY_COLUMNS frame.
+    `progress(rows_read, fraction)` is called after each chunk, as in importer.import_jobs.
+    Returns (tables, report) where report counts rows read and tables kept.
+    """
+    frames, rows = [], 0
+    for chunk in iter_inventory_chunks(f, fmt, chunk_rows):
+        frames.append(normalize_inventory(chunk))
+        rows += len(chunk)
+        if progress:
+            if "total_rows" in chunk.attrs:
+                fraction = rows / max(chunk.attrs["total_rows"], 1)
+            else:
+                fraction = min(f.tell() / total_bytes, 1.0) if total_bytes else None
+            progress(rows, fraction)
+    tables = _combine(frames)
+    return tables, {"rows": rows, "tables": len(tables)}
+
+def import_inventory_file(path, chunk_rows=CHUNK_ROWS, progress=None):
+    """import_inventory for a file on disk; the format is taken from the file suffix."""
+    fmt = os.path.splitext(str(path))[1].lower().lstrip(".")
+    with open(path, "rb") as f:
+        return import_inventory(f, fmt, chunk_rows, os.path.getsize(path), progress)
+
+# --- Pricing ---
+def pattern_error(pattern):
+    """The error message for an invalid zone pattern, or None if it compiles."""
+    try:
+        re.compile(pattern)
+    except re.error as exc:
+        return str(exc)
+    return None
+
+def _matches(text, pattern):
+    # An invalid pattern matches nothing, so one bad zone setting can't stop the inventory being priced.
+    # (Arrow-backed strings use RE2, which also rejects some patterns Python accepts: ArrowInvalid is a ValueError.)
+    if pattern_error(pattern) is not None:
+        return np.zeros(len(text), dtype=bool)
+    try:
+        return text.str.contains(pattern, case=False, regex=True).to_numpy(dtype=bool, na_value=False)
+    except ValueError:
+        return np.zeros(len(text), dtype=bool)
+
+def assign_zones(tables, zone_settings):
+    """
+    Zone of every table: its own zone column if that names a configured zone, else the first zone whose
+    pattern matches. A pattern that is not a valid regular expression matches no table.
+    """
+    zones = list(zone_settings)
+    given = tables["Zone"].astype(str)
+    exact = given.str.strip().str.lower().map({zone.lower(): zone for zone in zones})
+    text = given + " " + tables["Table"].astype(str)
+    conditions = [_matches(text, zone_settings[zone]["match"]) for zone in zones if zone_settings[zone].get("match")]
+    matched = np.select(conditions, [zone for zone in zones if zone_settings[zone].get("match")], default=UNASSIGNED_ZONE)
+    return pd.Categorical(exact.fillna(pd.Series(matched, index=tables.index)), categories=[*zones, UNASSIGNED_ZONE])
+
+def price_inventory(tables, zone_settings):
+    """
+    Prices every table against the zone settings ({zone: ZONE_DEFAULTS-like dict}).
+    Returns the tables with Zone assigned and "Stored (GB)" and "Cost" columns added.
+    Tables that match no zone are priced with ZONE_DEFAULTS under UNASSIGNED_ZONE.
+    """
+    zone = assign_zones(tables, zone_settings)
+    settings = [{**ZONE_DEFAULTS, **zone_settings[name]} for name in zone.categories[:-1]] + [ZONE_DEFAULTS]
+    codes = zone.codes
+
+    def per_zone(key):
+        return np.array([s[key] for s in settings], dtype=float)[codes]
+
+    default_class = pd.Categorical([s["storage_class"] for s in settings], dtype=STORAGE_CLASS_DTYPE).codes[codes]
+    class_codes = tables["Storage Class"].cat.codes.to_numpy()
+    class_codes = np.where(class_codes >= 0, class_codes, default_class)
+    prices = np.append([S3_PRICING[name]["storage_gb"] for name in S3_STORAGE_CLASSES], 0.0)
+
+    base_gb = tables["Size (GB)"].to_numpy(dtype=float)
+    logical_gb = tables["Logical (GB)"].to_numpy(dtype=float) / np.maximum(per_zone("compression_ratio"), 1e-9)
+    base_gb = np.nan_to_num(np.where(np.isnan(base_gb), logical_gb, base_gb))
+    retention = tables["Retention (days)"].to_numpy(dtype=float)
+    retention = np.where(np.isnan(retention), per_zone("retention_days"), retention)
+    stored_gb = base_gb * (1 + per_zone("daily_churn_pct") / 100 * retention)
+
+    priced = tables.assign(Zone=zone, **{"Storage Class": pd.Categorical.from_codes(class_codes, dtype=STORAGE_CLASS_DTYPE)})
+    priced["Reported (GB)"] = base_gb
+    priced["Stored (GB)"] = stored_gb
+    priced["Cost"] = stored_gb * prices[class_codes]
+    return priced
+
+def zone_summary(priced):
+    """Per-zone totals of a priced inventory (SUMMARY_COLUMNS); the Unassigned row only when it has tables."""
+    summary = priced.groupby("Zone", observed=False, sort=False).agg(
+        Tables=("Table", "nunique"), **{"Reported (GB)": ("Reported (GB)", "sum"), "Stored (GB)": ("Stored (GB)", "sum")}, Cost=("Cost", "sum"),
+    ).reindex(priced["Zone"].cat.categories, fill_value=0).rename_axis("Zone").reset_index()
+    keep = (summary["Zone"] != UNASSIGNED_ZONE) | (summary["Tables"] > 0)
+    return summary[keep].reset_index(drop=True)[SUMMARY_COLUMNS]
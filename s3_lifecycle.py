@@ -0,0 +1,99 @@
+# s3_lifecycle.py
+# Month-by-month S3 cost of datasets that grow and move between storage classes under lifecycle rules.
+#
+# Each dataset has an initial size, a monthly ingest volume (optionally growing), and lifecycle rules:
+# transition to Infrequent Access after N days, to Glacier Instant Retrieval after M days, and
+# expiration after R days (a rule set to 0 is off). Data ingested in month m is "age 0" in month m.
+#
+# Storage is tracked by ingest cohort without materializing the (month x cohort) triangle: the GB held
+# in a class in month t is the ingest of the months whose age falls inside that class's age window,
+# i.e. a difference of two positions in the cumulative ingest. Every dataset and month is computed
+# at once as (datasets x months) arrays, so hundreds of datasets over 60 months take milliseconds.
+import numpy as np
+
+from data import S3_PRICING, S3_LIFECYCLE_PRICING
+
+LIFECYCLE_CLASSES = ["Standard", "Infrequent Access", "Glacier Instant Retrieval"]
+DAYS_PER_MONTH = 30
+DEFAULT_HORIZON = 60
+
+# Per-dataset inputs (all arrays of equal length); missing keys take these defaults
+DATASET_DEFAULTS = {
+    "initial_gb": 0.0,          # data already stored at the start, counted as month-1 ingest
+    "ingest_gb": 0.0,           # GB written per month
+    "ingest_growth_pct": 0.0,   # compound monthly growth of the ingest volume
+    "ia_after_days": 0,         # transition to Infrequent Access (0: never)
+    "glacier_after_days": 0,    # transition to Glacier Instant Retrieval (0: never)
+    "expire_after_days": 0,     # delete (0: keep forever)
+    "object_mb": 64.0,          # average object size, for PUT and transition request counts
+    "retrieval_pct": 0.0,       # share of IA / Glacier data read back each month
+    "get_1k": 0.0,              # GET requests per month, in thousands
+}
+
+def _age_months(days, never):
+    """Lifecycle rule in days -> first age (in whole months) at which it applies; `never` when off."""
+    days = np.asarray(days, dtype=float)
+    return np.where(days > 0, np.ceil(days / DAYS_PER_MONTH), never).astype(int)
+
+def _window_sum(cumulative, t, lo, hi):
+    """Sum of ingest over cohort ages [lo, hi) at month t: cumulative[t - lo + 1] - cumulative[t - hi + 1], clipped."""
+    n = cumulative.shape[1] - 1
+    upper = np.clip(t - lo + 1, 0, n)
+    lower = np.clip(t - hi + 1, 0, n)
+    rows = np.arange(cumulative.shape[0])[:, None]
+    return cumulative[rows, upper] - cumulative[rows, lower]
+
+def simulate_lifecycle(datasets, horizon=DEFAULT_HORIZON):
+    """
+    Simulates `horizon` months for every dataset.
+    `datasets` is a dict of equal-length arrays keyed like DATASET_DEFAULTS.
+    Returns a dict of arrays:
+      "storage_gb": (datasets, months, classes) GB held per class (LIFECYCLE_CLASSES order),
+      "storage_cost", "transition_cost", "retrieval_cost", "request_cost", "total_cost": (datasets, months) USD.
+    """
+    n = len(next(iter(datasets.values()))) if datasets else 0
+    p = {key: np.broadcast_to(np.asarray(datasets.get(key, default), dtype=float), (n,)) for key, default in DATASET_DEFAULTS.items()}
+    months = np.arange(horizon)
+    never = horizon + 1
+
+    # Monthly ingest per dataset, with the initial data as part of month 1
+    ingest = p["ingest_gb"][:, None] * (1 + p["ingest_growth_pct"][:, None] / 100) ** months
+    ingest[:, 0] += p["initial_gb"]
+    cumulative = np.concatenate([np.zeros((n, 1)), np.cumsum(ingest, axis=1)], axis=1)
+
+    # Age (in months) at which each class starts; later rules can't start before earlier ones
+    expire = _age_months(p["expire_after_days"], never)
+    glacier = np.minimum(_age_months(p["glacier_after_days"], never), expire)
+    ia = np.minimum(_age_months(p["ia_after_days"], never), glacier)
+    bounds = [np.zeros(n, dtype=int), ia, glacier, expire]
+
+    t = months[None, :]
+    storage = np.stack([
+        _window_sum(cumulative, t, bounds[i][:, None], bounds[i + 1][:, None]) for i in range(len(LIFECYCLE_CLASSES))
+    ], axis=2)
+
+    storage_price = np.array([S3_PRICING[c]["storage_gb"] for c in LIFECYCLE_CLASSES])
+    transition_price = np.array([S3_LIFECYCLE_PRICING[c]["transition_1k"] for c in LIFECYCLE_CLASSES])
+    retrieval_price = np.array([S3_LIFECYCLE_PRICING[c]["retrieval_gb"] for c in LIFECYCLE_CLASSES])
+    objects_per_gb = 1024 / np.maximum(p["object_mb"], 1e-9)
+
+    # The cohort that reaches a class's starting age this month transitions into it
+    # (unless the class is skipped: it starts at the same age as the next one).
+    starts = [np.where(ia < glacier, ia, never), np.where(glacier < expire, glacier, never)]
+    transitions = np.stack([np.zeros((n, horizon))] + [
+        _window_sum(cumulative, t, start[:, None], start[:, None] + 1) for start in starts
+    ], axis=2)
+    transition_cost = (transitions * objects_per_gb[:, None, None] / 1000 * transition_price).sum(axis=2)
+    retrieval_cost = (storage * p["retrieval_pct"][:, None, None] / 100 * retrieval_price).sum(axis=2)
+    request_cost = (ingest * objects_per_gb[:, None] / 1000 * S3_PRICING["Standard"]["put_1k"]
+                    + p["get_1k"][:, None] * S3_PRICING["Standard"]["get_1k"])
+    storage_cost = (storage * storage_price).sum(axis=2)
+
+    return {
+        "storage_gb": storage,
+        "storage_cost": storage_cost,
+        "transition_cost": transition_cost,
+        "retrieval_cost": retrieval_cost,
+        "request_cost": request_cost,
+        "total_cost": storage_cost + transition_cost + retrieval_cost + request_cost,
+    }
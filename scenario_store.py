@@ -0,0 +1,164 @@
+# scenario_store.py
+# Named scenarios saved to a local SQLite database, and cost comparisons between them.
+#
+# A scenario's settings (S3 zones, SQL Warehouses, growth) are stored as one JSON document and each
+# tier's job frame (and the S3 table inventory) as a Parquet blob, so loading thousands of jobs is a single columnar decode per tier
+# (dtypes, including the categorical Instance Type of imported inventories, round-trip unchanged).
+#
+# Comparisons reprice every scenario with the current prices and line them up with one pivot over a
+# long (scenario, group, component, cost) frame; job-level changes come from one outer merge on
+# (tier, job name). Neither loops over jobs.
+import io
+import json
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from cost_core import SCENARIO_KEYS, calculate_databricks_costs_for_tier, calculate_s3_cost_per_zone, calculate_sql_warehouse_costs, compact_jobs, default_scenario
+from data import DBU_RATES
+
+DEFAULT_DB_PATH = os.environ.get("DBU_CALC_SCENARIO_DB", "scenarios.sqlite")
+# Scenario keys saved in the settings document (the job frames and the table inventory are stored separately)
+SETTINGS_KEYS = [key for key in SCENARIO_KEYS if key not in ("dbx_jobs", "s3_inventory_tables")]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scenarios (
+    name TEXT PRIMARY KEY,
+    saved_at TEXT NOT NULL,
+    settings TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scenario_jobs (
+    name TEXT NOT NULL REFERENCES scenarios(name) ON DELETE CASCADE,
+    tier TEXT NOT NULL,
+    job_count INTEGER NOT NULL,
+    jobs BLOB NOT NULL,
+    PRIMARY KEY (name, tier)
+);
+CREATE TABLE IF NOT EXISTS scenario_s3_inventory (
+    name TEXT PRIMARY KEY REFERENCES scenarios(name) ON DELETE CASCADE,
+    table_count INTEGER NOT NULL,
+    tables BLOB NOT NULL
+);
+"""
+
+def connect(db_path=DEFAULT_DB_PATH):
+    """Opens the store, creating the tables on first use."""
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+# --- Save / load ---
+def _to_parquet(jobs_df):
+    buffer = io.BytesIO()
+    jobs_df.reset_index(drop=True).to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
+def save_scenario(name, scenario, db_path=DEFAULT_DB_PATH):
+    """Saves (or overwrites) a named scenario."""
+    settings = json.dumps({key: scenario[key] for key in SETTINGS_KEYS if key in scenario})
+    rows = [(name, tier, len(jobs), _to_parquet(jobs)) for tier, jobs in scenario["dbx_jobs"].items()]
+    with closing(connect(db_path)) as conn, conn:
+        conn.execute("DELETE FROM scenarios WHERE name = ?", (name,))
+        conn.execute("INSERT INTO scenarios VALUES (?, ?, ?)",
+                     (name, datetime.now(timezone.utc).isoformat(timespec="seconds"), settings))
+        conn.executemany("INSERT INTO scenario_jobs VALUES (?, ?, ?, ?)", rows)
+        inventory = scenario.get("s3_inventory_tables")
+        if inventory is not None and len(inventory):
+            conn.execute("INSERT INTO scenario_s3_inventory VALUES (?, ?, ?)", (name, len(inventory), _to_parquet(inventory)))
+
+def load_scenario(name, db_path=DEFAULT_DB_PATH):
+    """Loads a named scenario as a scenario dict; raises KeyError if there is none."""
+    with closing(connect(db_path)) as conn:
+        row = conn.execute("SELECT settings FROM scenarios WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise KeyError(f"No saved scenario named {name!r}")
+        jobs = conn.execute("SELECT tier, jobs FROM scenario_jobs WHERE name = ?", (name,)).fetchall()
+        inventory = conn.execute("SELECT tables FROM scenario_s3_inventory WHERE name = ?", (name,)).fetchone()
+
+    scenario = default_scenario()
+    scenario.update(json.loads(row[0]))
+    scenario["name"] = name
+    for tier, blob in jobs:
+        if tier in DBU_RATES:
+            scenario["dbx_jobs"][tier] = compact_jobs(pd.read_parquet(io.BytesIO(blob)))
+    if inventory is not None:
+        scenario["s3_inventory_tables"] = pd.read_parquet(io.BytesIO(inventory[0]))
+    return scenario
+
+def list_scenarios(db_path=DEFAULT_DB_PATH):
+    """Returns a DataFrame of saved scenarios (name, saved_at, jobs), newest first."""
+    with closing(connect(db_path)) as conn:
+        return pd.read_sql_query(
+            "SELECT s.name, s.saved_at, COALESCE(SUM(j.job_count), 0) AS jobs FROM scenarios s "
+            "LEFT JOIN scenario_jobs j ON j.name = s.name GROUP BY s.name ORDER BY s.saved_at DESC",
+            conn,
+        )
+
+def delete_scenario(name, db_path=DEFAULT_DB_PATH):
+    with closing(connect(db_path)) as conn, conn:
+        conn.execute("DELETE FROM scenarios WHERE name = ?", (name,))
+
+# --- Comparison ---
+def job_costs(scenario):
+    """Long frame of per-job costs: Tier, Job Name, Total Cost."""
+    frames = []
+    for tier, jobs in scenario["dbx_jobs"].items():
+        costed, _, _ = calculate_databricks_costs_for_tier(jobs, tier)
+        frames.append(pd.DataFrame({"Tier": tier, "Job Name": costed["Job Name"].to_numpy(dtype=object), "Total Cost": costed["Total Cost"].to_numpy(dtype=float)}))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["Tier", "Job Name", "Total Cost"])
+
+def cost_breakdown(scenario, jobs=None):
+    """
+    Long frame of monthly cost per component: Group, Component, Cost (tiers, S3 zones, SQL Warehouses).
+    `jobs` may pass in job_costs(scenario) when it has already been computed.
+    """
+    jobs = job_costs(scenario) if jobs is None else jobs
+    tiers = jobs.groupby("Tier", sort=False)["Total Cost"].sum()
+    s3_costs, _ = calculate_s3_cost_per_zone(scenario)
+    names = {warehouse["id"]: warehouse["name"] for warehouse in scenario["sql_warehouses"]}
+    sql_costs = calculate_sql_warehouse_costs(scenario)
+    return pd.concat([
+        pd.DataFrame({"Group": "Databricks & Compute", "Component": tiers.index.astype(str), "Cost": tiers.to_numpy()}),
+        pd.DataFrame({"Group": "S3 Storage", "Component": list(s3_costs), "Cost": list(s3_costs.values())}),
+        pd.DataFrame({"Group": "SQL Warehouse", "Component": [names[i] for i in sql_costs], "Cost": list(sql_costs.values())}),
+    ], ignore_index=True)
+
+def compare_scenarios(scenarios):
+    """
+    Compares {label: scenario} for two or more scenarios.
+    Returns (components, jobs):
+      components: one row per (Group, Component) with a cost column per scenario and a
+                  "Δ <label>" column per scenario after the first (difference from the first);
+      jobs: per-job costs side by side (outer join on Tier and Job Name) for jobs whose cost differs.
+    """
+    labels = list(scenarios)
+    base = labels[0]
+    costs = {label: job_costs(scenario) for label, scenario in scenarios.items()}
+
+    breakdown = pd.concat([cost_breakdown(scenarios[label], costs[label]).assign(Scenario=label) for label in labels], ignore_index=True)
+    order = pd.MultiIndex.from_frame(breakdown[["Group", "Component"]].drop_duplicates())
+    components = breakdown.pivot_table(index=["Group", "Component"], columns="Scenario", values="Cost",
+                                       aggfunc="sum", fill_value=0.0).reindex(index=order, columns=labels)
+    for label in labels[1:]:
+        components[f"Δ {label}"] = components[label] - components[base]
+    components = components.reset_index()
+    components.columns.name = None
+
+    jobs = costs[base].rename(columns={"Total Cost": base})
+    for label in labels[1:]:
+        other = costs[label].rename(columns={"Total Cost": label})
+        # Duplicate job names within a tier are paired up in order.
+        jobs["_n"] = jobs.groupby(["Tier", "Job Name"]).cumcount()
+        other["_n"] = other.groupby(["Tier", "Job Name"]).cumcount()
+        jobs = jobs.merge(other, on=["Tier", "Job Name", "_n"], how="outer")
+    jobs = jobs.drop(columns="_n").fillna({label: 0.0 for label in labels})
+    changed = (jobs[labels].sub(jobs[base], axis=0).abs() > 1e-9).any(axis=1)
+    jobs = jobs[changed].reset_index(drop=True)
+    for label in labels[1:]:
+        jobs[f"Δ {label}"] = jobs[label] - jobs[base]
+    return components, jobs
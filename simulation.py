@@ -0,0 +1,139 @@
+# simulation.py
+# Monte Carlo distribution of the monthly Databricks bill.
+#
+# Each trial draws, per job:
+#   * the month's average runtime: lognormal around "Runtime (hrs)" with a given coefficient of variation,
+#   * the number of runs: Poisson around "Runs/Month",
+#   * for Spot jobs, how many runs were interrupted: Binomial(runs, interruption rate). An interrupted
+#     run falls back to on-demand EC2 and also pays for the spot time lost before the interruption.
+# Per-node-hour DBU and EC2 rates come from the cost engine itself (cost_core.compute_job_cost_arrays),
+# so a trial with no randomness reproduces the point estimate exactly.
+#
+# Trials are computed as (trial block x job) arrays. Jobs are split into fixed-size shards, each with
+# its own seed, so the result for a given seed does not depend on how many worker processes ran them.
+# Large job sets are spread over a process pool.
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from cost_core import compute_job_cost_arrays, job_input_arrays
+
+DEFAULT_SIMULATION = {
+    "enabled": False,
+    "trials": 10_000,
+    "runtime_cv": 0.25,                # std dev / mean of the monthly average runtime
+    "spot_interruption_rate": 0.05,    # probability that a spot run is interrupted
+    "interruption_overhead": 0.5,      # share of the run already spent on spot when interrupted
+    "seed": 42,
+}
+PERCENTILES = [10, 50, 90]
+
+SHARD_JOBS = 20_000                    # jobs per shard (fixed, so results are worker-count independent)
+BLOCK_CELLS = 2_000_000                # trial x job cells materialized at once per shard
+PARALLEL_MIN_CELLS = 50_000_000        # below this many trial x job cells, stay in-process
+POISSON_NORMAL_MIN_MEAN = 20           # run counts at or above this mean are drawn from the normal approximation
+
+def job_rate_arrays(jobs_by_tier):
+    """
+    Flattens {tier: jobs DataFrame} into the per-job arrays the simulation needs:
+    expected runtime, runs and nodes, plus DBU cost, on-demand EC2 and spot EC2 per node-hour.
+    """
+    parts = []
+    for tier, jobs_df in jobs_by_tier.items():
+        if jobs_df.empty:
+            continue
+        inputs = job_input_arrays(jobs_df)
+        unit = np.ones(len(jobs_df))
+        unit_inputs = {**inputs, "runtime": unit, "runs": unit, "nodes": unit}
+        on_demand = compute_job_cost_arrays(tier=tier, **{**unit_inputs, "spot": np.zeros(len(jobs_df), dtype=bool)})
+        spot = compute_job_cost_arrays(tier=tier, **{**unit_inputs, "spot": np.ones(len(jobs_df), dtype=bool)})
+        parts.append({
+            "runtime": np.nan_to_num(inputs["runtime"]),
+            "runs": np.nan_to_num(inputs["runs"]),
+            "nodes": np.nan_to_num(inputs["nodes"]),
+            "is_spot": inputs["spot"],
+            "dbu_rate": on_demand["DBU Cost"],
+            "on_demand_rate": on_demand["EC2 Cost"],
+            "spot_rate": spot["EC2 Cost"],
+        })
+    keys = ["runtime", "runs", "nodes", "is_spot", "dbu_rate", "on_demand_rate", "spot_rate"]
+    if not parts:
+        return {key: np.zeros(0, dtype=bool if key == "is_spot" else float) for key in keys}
+    return {key: np.concatenate([part[key] for part in parts]) for key in keys}
+
+def _poisson(rng, lam, b):
+    """Poisson draws of shape (b, len(lam)); large means use the normal approximation, which is ~10x cheaper."""
+    draws = np.empty((b, len(lam)))
+    small = lam < POISSON_NORMAL_MIN_MEAN
+    draws[:, small] = rng.poisson(lam[small], size=(b, int(small.sum())))
+    large_lam = lam[~small]
+    draws[:, ~small] = np.maximum(np.rint(large_lam + np.sqrt(large_lam) * rng.standard_normal((b, len(large_lam)))), 0)
+    return draws
+
+def _simulate_shard(shard, n_trials, params, seed_seq):
+    """Returns the Databricks cost of every trial for one shard of jobs, shape (n_trials,)."""
+    rng = np.random.default_rng(seed_seq)
+    n_jobs = len(shard["runtime"])
+    totals = np.zeros(n_trials)
+    if n_jobs == 0:
+        return totals
+
+    sigma = np.sqrt(np.log1p(params["runtime_cv"] ** 2))
+    p_interrupt = params["spot_interruption_rate"]
+    overhead = params["interruption_overhead"]
+    spot = np.flatnonzero(shard["is_spot"])
+    spot_rate, on_demand_rate = shard["spot_rate"][spot], shard["on_demand_rate"][spot]
+    block = max(1, BLOCK_CELLS // n_jobs)
+
+    for start in range(0, n_trials, block):
+        b = min(block, n_trials - start)
+        # Lognormal with mean equal to the configured runtime
+        runtime = shard["runtime"] * np.exp(sigma * rng.standard_normal((b, n_jobs)) - sigma ** 2 / 2)
+        runs = _poisson(rng, shard["runs"], b)
+        node_hours = runtime * runs * shard["nodes"]
+        ec2_rate = np.broadcast_to(shard["on_demand_rate"], (b, n_jobs)).copy()
+
+        # Spot jobs: interrupted runs are re-run on demand after losing part of the spot run
+        if len(spot) and p_interrupt > 0:
+            spot_runs = runs[:, spot].astype(np.int64)
+            interrupted_share = rng.binomial(spot_runs, p_interrupt) / np.maximum(spot_runs, 1)
+            ec2_rate[:, spot] = spot_rate * (1 - interrupted_share) + (on_demand_rate + overhead * spot_rate) * interrupted_share
+        else:
+            ec2_rate[:, spot] = spot_rate
+
+        totals[start:start + b] = (node_hours * (shard["dbu_rate"] + ec2_rate)).sum(axis=1)
+
+    return totals
+
+def _simulate_shard_args(args):
+    return _simulate_shard(*args)
+
+def simulate_databricks_costs(jobs_by_tier, params=None, workers=1):
+    """
+    Simulates the monthly Databricks cost of all jobs. Returns an array with one total per trial.
+    `workers` > 1 shards large job sets across a process pool.
+    """
+    params = {**DEFAULT_SIMULATION, **(params or {})}
+    arrays = job_rate_arrays(jobs_by_tier)
+    n_jobs, n_trials = len(arrays["runtime"]), int(params["trials"])
+
+    bounds = list(range(0, n_jobs, SHARD_JOBS)) or [0]
+    seeds = np.random.SeedSequence(params["seed"]).spawn(len(bounds))
+    tasks = [
+        ({key: values[lo:lo + SHARD_JOBS] for key, values in arrays.items()}, n_trials, params, seed)
+        for lo, seed in zip(bounds, seeds)
+    ]
+
+    if workers > 1 and len(tasks) > 1 and n_jobs * n_trials >= PARALLEL_MIN_CELLS:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            shard_totals = list(executor.map(_simulate_shard_args, tasks))
+    else:
+        shard_totals = [_simulate_shard_args(task) for task in tasks]
+    return np.sum(shard_totals, axis=0)
+
+def summarize(trial_totals, fixed_cost=0.0):
+    """Percentile bands (P10/P50/P90) and mean of the simulated totals plus any deterministic cost."""
+    totals = np.asarray(trial_totals) + fixed_cost
+    summary = {f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(totals, PERCENTILES))}
+    summary["mean"] = float(totals.mean())
+    return summary
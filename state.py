@@ -1,7 +1,18 @@
 # state.py
 import streamlit as st
-import pandas as pd
-from data import INSTANCE_LIST, SQL_WAREHOUSE_SIZES, S3_STORAGE_CLASSES, DBU_RATES
+from cost_core import SCENARIO_KEYS, default_scenario, apply_job_edits, compact_jobs
+from simulation import DEFAULT_SIMULATION
+from optimizer import DEFAULT_CONSTRAINTS
+
+@st.cache_resource
+def shared_defaults():
+    """
+    The default tier frames and empty table inventory, built once per server process.
+    Every new session starts from these same frames; edits replace a session's frames
+    (copy-on-write) rather than writing into them, so they are never copied per session.
+    """
+    scenario = default_scenario()
+    return {"dbx_jobs": scenario["dbx_jobs"], "s3_inventory_tables": scenario["s3_inventory_tables"]}
 
 def initialize_state():
     """Initializes session state variables if they don't exist."""
@@ -10,34 +21,80 @@ def initialize_state():
 
     st.session_state.initialized = True
 
-    # Databricks state
-    st.session_state.dbx_jobs = {
-        tier: pd.DataFrame([{
-            "#": 1, "Job Name": f"{tier.split(' / ')[1]} Job 1", "Runtime (hrs)": 0, "Runs/Month": 0,
-            "Instance Type": INSTANCE_LIST[0], "Nodes": 1, "Photon": False, "Spot": False
-        }]) for tier in DBU_RATES.keys()
-    }
-
-    # S3 state
-    st.session_state.s3_calc_method = "Direct Storage"
-    st.session_state.s3_direct = {
-        "Landing Zone": {"class": "Standard", "amount": 0, "unit": "GB", "put": 0, "get": 0},
-        "L0 / Bronze": {"class": "Standard", "amount": 0, "unit": "GB", "put": 0, "get": 0},
-        "L1 / Silver": {"class": "Infrequent Access", "amount": 0, "unit": "GB", "put": 0, "get": 0},
-        "L2 / Gold": {"class": "Standard", "amount": 0, "unit": "GB", "put": 0, "get": 0},
-    }
-    st.session_state.s3_table_based = {
-        "Landing Zone": {"tables": 0, "records": 100000, "size_kb": 1.0},
-        "L0 / Bronze": {"tables": 0, "records": 100000, "size_kb": 1.5},
-        "L1 / Silver": {"tables": 0, "records": 100000, "size_kb": 2.0},
-        "L2 / Gold": {"tables": 0, "records": 100000, "size_kb": 2.5},
-    }
-
-    # SQL Warehouse state
-    st.session_state.sql_warehouses = [{
-        "id": "warehouse_0", "name": "Primary BI Warehouse", "size": SQL_WAREHOUSE_SIZES[0], # Default to 2X-Small
-        "hours_per_day": 8, "days_per_month": 22, "auto_suspend": True, "suspend_after": 10
-    }]
-
-    #Monthly Growth Rate for Databricks & S3
-    st.session_state.monthly_growth_percent = 0.0 
\ No newline at end of file
+    # Databricks jobs, S3 zones, SQL Warehouses and the growth rate all start from the
+    # same defaults the headless cost core uses (see cost_core.default_scenario).
+    shared = shared_defaults()
+    for key, value in default_scenario().items():
+        st.session_state[key] = value
+    st.session_state.dbx_jobs = dict(shared["dbx_jobs"])
+    st.session_state.s3_inventory_tables = shared["s3_inventory_tables"]
+
+    # Costed tier frames ({"df", "dbu_cost", "ec2_cost"} per tier), kept current by row-level edits
+    st.session_state.dbx_costs = {}
+
+    # Monte Carlo settings for the summary column's percentile bands
+    st.session_state.simulation = dict(DEFAULT_SIMULATION)
+
+    # Constraints for the instance / Photon / Spot optimizer
+    st.session_state.optimizer = dict(DEFAULT_CONSTRAINTS)
+    # Last search ({"jobs", "constraints", "recommendations"}), run on request from the optimizer panel
+    st.session_state.optimizer_results = None
+
+    # Multi-year projection: per-component growth (% per month) and start month overrides keyed
+    # by component id ("dbx:Bronze", "s3:Landing Zone", "sql:warehouse_0", ...), plus step changes
+    # ({"component", "month", "delta"}) that add a monthly amount from a given month on.
+    st.session_state.projection = {"horizon": 36, "growth": {}, "start": {}, "steps": []}
+
+# Widget keys that hold a copy of scenario values; they are dropped when a scenario is loaded
+# so the widgets pick up the loaded values instead of their previous state.
+_SCENARIO_WIDGET_PREFIXES = ("num_jobs_", "editor_", "s3_class_", "s3_amount_", "s3_unit_", "s3_tbl_", "s3_lc_", "s3_inv_", "sql_name_",
+                             "sql_size_", "sql_hours_", "sql_days_", "sql_suspend_after_", "sql_max_clusters_", "sql_history_id_", "sql_tag_",
+                             "s3_tag_", "projection_", "chargeback_")
+
+# View settings of widgets in the lazily drawn tabs. Streamlit drops a widget's state while it isn't
+# drawn, so keep_view_state stores them back at the top of every run to survive the tab being closed.
+_VIEW_WIDGET_KEYS = ("projection_by", "region_compare_regions", "region_compare_by", "chargeback_sort")
+
+def keep_view_state():
+    """Keeps the derived tabs' view settings across runs in which their tab is closed. Call before any tab renders."""
+    for key in _VIEW_WIDGET_KEYS:
+        if key in st.session_state:
+            st.session_state[key] = st.session_state[key]
+
+def current_scenario():
+    """Returns the session's configuration as a scenario dict (see cost_core.default_scenario)."""
+    return {key: st.session_state[key] for key in SCENARIO_KEYS}
+
+def load_scenario_state(scenario):
+    """
+    Replaces the session's configuration with a scenario. Call it before the tabs render
+    (or from a callback) and rerun the whole app afterwards.
+    """
+    for key in list(st.session_state.keys()):
+        if key.startswith(_SCENARIO_WIDGET_PREFIXES):
+            del st.session_state[key]
+    for key in SCENARIO_KEYS:
+        st.session_state[key] = scenario[key]
+    st.session_state.dbx_jobs = {tier: compact_jobs(jobs) for tier, jobs in scenario["dbx_jobs"].items()}
+    st.session_state.dbx_costs = {}
+
+def set_tier_jobs(tier, jobs_df):
+    """
+    Replaces a tier's job frame and drops its cached costs so the next run recomputes them.
+    Call it from a widget callback (or before the Databricks tab renders): it also resets
+    the tier's "Number of Jobs" input to match, and drops the tier's editor state, whose
+    position-keyed edits would otherwise be laid over the new rows.
+    """
+    st.session_state.dbx_jobs[tier] = compact_jobs(jobs_df)
+    st.session_state[f"num_jobs_{tier}"] = len(jobs_df)
+    st.session_state.pop(f"editor_{tier}", None)
+    st.session_state.dbx_costs.pop(tier, None)
+
+def apply_tier_edits(tier, edited_rows):
+    """Applies a data_editor edited_rows delta to a tier, re-pricing only the edited rows."""
+    costs = st.session_state.dbx_costs.get(tier)
+    if costs is None:
+        return
+    jobs, costed, dbu_cost, ec2_cost = apply_job_edits(st.session_state.dbx_jobs[tier], costs["df"], tier, edited_rows)
+    st.session_state.dbx_jobs[tier] = jobs
+    st.session_state.dbx_costs[tier] = {"df": costed, "dbu_cost": dbu_cost, "ec2_cost": ec2_cost}
@@ -1,18 +1,65 @@
 # ui_components.py
+import json
+import os
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
-from data import DBU_RATES, INSTANCE_LIST, S3_STORAGE_CLASSES, SQL_WAREHOUSE_SIZES, SQL_WAREHOUSE_PRICING
+from memo import cache_stats
+import profiling
+from profiling import timed, phase
+from cost_core import INSTANCE_DTYPE, TAG_COLUMNS, resize_jobs
+from importer import IMPORT_SUFFIXES, import_jobs
+from run_history import import_run_history
+from state import set_tier_jobs, apply_tier_edits, current_scenario, load_scenario_state, shared_defaults
+import scenario_store
+from calculations import simulate_s3_lifecycle, price_s3_inventory, simulate_cost_distribution, project_costs, optimize_databricks_jobs, compare_scenarios, compare_regions, chargeback_rollup
+from chargeback import SOURCES, children, items_under
+from optimizer import apply_recommendations
+from s3_lifecycle import LIFECYCLE_CLASSES
+from query_history import QUERY_HISTORY_SUFFIXES, WAREHOUSE_DEFAULTS, estimate_billed_hours
+from s3_inventory import INVENTORY_SUFFIXES, import_inventory, pattern_error, zone_summary
+from projection import projection_frame
+from regions import HOME_REGION, REGIONS
+from data import DBU_RATES, INSTANCE_LIST, S3_STORAGE_CLASSES, SQL_WAREHOUSE_SIZES, SQL_WAREHOUSE_LABELS, SQL_WAREHOUSE_PRICING
 
-def render_summary_column(total_cost, databricks_cost, s3_cost, sql_cost):
-    """Renders the right-hand summary column with the donut chart."""
+@timed
+def render_summary_column():
+    """
+    Renders the static parts of the right-hand summary column and returns placeholders
+    ("total", "projection", "distribution") that render_summary fills in. The tabs run as
+    fragments, so the summary is redrawn through these slots instead of by rerunning the app.
+    """
     st.header("📈 Monthly Total")
-    st.metric("Total Cloud Cost", f"${total_cost:,.2f}")
+    slots = {"total": st.empty()}
     st.divider()
 
-        # New: Monthly Growth Input
     st.subheader("Growth Projection")
-    st.session_state.monthly_growth_percent = st.number_input(
+    slots["projection"] = st.empty()
+    _growth_input_fragment(slots)
+    st.divider()
+
+    st.subheader("Cost Range")
+    slots["simulation"] = st.empty()
+    _simulation_settings_fragment(slots)
+    st.divider()
+
+    st.header("Cost Distribution")
+    slots["distribution"] = st.empty()
+
+    st.divider()
+    st.header("Cost Insights")
+    st.info("""
+    - Consider **spot instances** for non-critical workloads to save ~70% on EC2.
+    - Enable **auto-suspend** for SQL warehouses to avoid paying for idle compute.
+    - Use appropriate **S3 storage classes** for data to optimize storage costs.
+    """)
+    return slots
+
+@st.fragment
+@timed
+def _growth_input_fragment(slots):
+    # New: Monthly Growth Input
+    growth = st.number_input(
         "Monthly Databricks + S3 Growth %",
         min_value=0.0,
         max_value=100.0,
@@ -21,33 +68,58 @@ def render_summary_column(total_cost, databricks_cost, s3_cost, sql_cost):
         format="%.1f",
         help="Anticipated monthly percentage increase in Databricks and S3 costs."
     )
+    if growth != st.session_state.monthly_growth_percent:
+        st.session_state.monthly_growth_percent = growth
+        _render_projection(slots["projection"])
+    elif st.session_state.summary_deferred:
+        slots["projection"].empty() # claim the slot so later fragment reruns can redraw it
 
-    # Calculate 12-month projected cost
-    projected_cost_12_months = 0
-    current_dbx_s3_cost = databricks_cost + s3_cost
-    sql_warehouse_cost_fixed = sql_cost # SQL warehouse cost is assumed not to grow with this percentage
-
-    if st.session_state.monthly_growth_percent > 0:
-        growth_factor = 1 + (st.session_state.monthly_growth_percent / 100)
-        # Calculate sum of a geometric series for 12 months for growing costs
-        # Sum = a * (r^n - 1) / (r - 1)
-        # a = current_dbx_s3_cost (cost for month 1)
-        # r = growth_factor
-        # n = 12 months
-        if growth_factor != 1: # Avoid division by zero if growth is 0%
-            projected_cost_12_months = current_dbx_s3_cost * (growth_factor**12 - 1) / (growth_factor - 1)
-        else: # If growth is 0%, it's just 12 * current_dbx_s3_cost
-            projected_cost_12_months = current_dbx_s3_cost * 12
-    else:
-        projected_cost_12_months = current_dbx_s3_cost * 12 # No growth, just 12x current cost
+@st.fragment
+@timed
+def _simulation_settings_fragment(slots):
+    settings = st.session_state.simulation
+    before = dict(settings)
+    settings["enabled"] = st.toggle("Simulate P50/P90 (Monte Carlo)", value=settings["enabled"],
+                                    help="Draws runtimes, run counts and spot interruptions per job to estimate a cost range.")
+    if settings["enabled"]:
+        with st.expander("Simulation settings"):
+            settings["trials"] = st.number_input("Trials", min_value=100, max_value=200_000, step=1000, value=settings["trials"])
+            settings["runtime_cv"] = st.slider("Runtime variability (CV)", 0.0, 1.0, value=settings["runtime_cv"], step=0.05,
+                                               help="Standard deviation of a job's monthly average runtime, relative to the configured runtime.")
+            settings["spot_interruption_rate"] = st.slider("Spot interruption rate", 0.0, 0.5, value=settings["spot_interruption_rate"], step=0.01,
+                                                           help="Share of spot runs interrupted and re-run on on-demand instances.")
+    if settings != before:
+        _render_simulation(slots["simulation"])
+    elif st.session_state.summary_deferred:
+        slots["simulation"].empty() # claim the slot so later fragment reruns can redraw it
 
-    # Add the fixed SQL warehouse cost for 12 months
-    projected_cost_12_months += sql_warehouse_cost_fixed * 12
+def publish_total(component, total, slots):
+    """
+    Stores a tab's monthly total ("databricks", "s3" or "sql") for the summary column.
+    During a fragment-only rerun the summary is redrawn right away if the total changed;
+    during a full run main.py draws it once after every tab has published.
+    """
+    totals = st.session_state.cost_totals
+    changed = totals.get(component) != total
+    totals[component] = total
+    if st.session_state.summary_deferred:
+        # Fragments may only redraw outside placeholders they wrote to during a full run,
+        # so claim each slot with a cheap empty write; main.py fills them afterwards.
+        for slot in slots.values():
+            slot.empty()
+    elif changed:
+        render_summary(slots)
 
-    st.metric("12-Month Projected Total", f"${projected_cost_12_months:,.2f}")
-    st.divider()
+@timed
+def render_summary(slots):
+    """Draws the total, the 12-month projection and the donut chart from the published totals."""
+    totals = st.session_state.cost_totals
+    databricks_cost, s3_cost, sql_cost = totals.get("databricks", 0), totals.get("s3", 0), totals.get("sql", 0)
+
+    slots["total"].metric("Total Cloud Cost", f"${databricks_cost + s3_cost + sql_cost:,.2f}")
+    _render_projection(slots["projection"])
+    _render_simulation(slots["simulation"])
 
-    st.header("Cost Distribution")
     cost_data = {
         "Databricks & Compute": databricks_cost,
         "S3 Storage": s3_cost,
@@ -74,19 +146,32 @@ def render_summary_column(total_cost, databricks_cost, s3_cost, sql_cost):
         height=250
         )
 
-        st.plotly_chart(fig, use_container_width=True)
+        with phase("plotly_chart"):
+            slots["distribution"].plotly_chart(fig, use_container_width=True)
 
     else:
-        st.info("No costs configured yet.")
+        slots["distribution"].info("No costs configured yet.")
 
-    st.divider()
-    st.header("Cost Insights")
-    st.info("""
-    - Consider **spot instances** for non-critical workloads to save ~70% on EC2.
-    - Enable **auto-suspend** for SQL warehouses to avoid paying for idle compute.
-    - Use appropriate **S3 storage classes** for data to optimize storage costs.
-    """)
+def _render_simulation(slot):
+    if not st.session_state.simulation["enabled"]:
+        slot.empty()
+        return
+    totals = st.session_state.cost_totals
+    bands = simulate_cost_distribution(fixed_cost=totals.get("s3", 0) + totals.get("sql", 0))
+    with slot.container():
+        c1, c2 = st.columns(2)
+        c1.metric("P50", f"${bands['p50']:,.2f}")
+        c2.metric("P90", f"${bands['p90']:,.2f}")
+        st.caption(f"P10–P90: ${bands['p10']:,.2f} – ${bands['p90']:,.2f} • mean ${bands['mean']:,.2f} "
+                   f"over {st.session_state.simulation['trials']:,} trials")
 
+def _render_projection(slot):
+    # Month-by-month sum from the projection engine, so per-component growth, start months
+    # and step changes set on the Projection tab are reflected here too.
+    _, matrix = project_costs(horizon=12)
+    slot.metric("12-Month Projected Total", f"${matrix.sum():,.2f}")
+
+@timed
 def render_databricks_tab(calculated_dbx_data):
     """Renders the detailed Databricks & Compute tab UI."""
     st.header("Databricks & Compute Costs")
@@ -96,6 +181,10 @@ def render_databricks_tab(calculated_dbx_data):
     total_ec2_cost = sum(data['ec2_cost'] for data in calculated_dbx_data.values())
     total_jobs = sum(len(st.session_state.dbx_jobs[tier]) for tier in DBU_RATES.keys())
 
+    # Before the per-tier inputs: an import resets their "Number of Jobs" values.
+    _render_job_import()
+    _render_run_history_import()
+
     with st.container(border=True):
         c1, c2, c3, c4 = st.columns(4)
         c1.metric("Total Jobs", f"{total_jobs}")
@@ -112,61 +201,134 @@ def render_databricks_tab(calculated_dbx_data):
             c1.markdown(f"### {tier} <span style='background-color:#E8E8E8; border-radius:5px; padding: 2px 8px; font-size:90%; font-weight:bold; color:black;'>${tier_total_cost:,.2f}</span>", unsafe_allow_html=True)
             
             c2.write(f"{tier}")
-            num_jobs = c2.number_input("Number of Jobs", min_value=0, max_value=20, value=len(df_state), key=f"num_jobs_{tier}", label_visibility="collapsed")
-
-            # --- THIS IS THE FIX ---
-            # This logic robustly handles adding or removing rows and prevents errors.
-            current_len = len(df_state)
-            if num_jobs != current_len:
-                if num_jobs > current_len:
-                    # Add new rows
-                    new_rows_count = num_jobs - current_len
-                    new_rows = pd.DataFrame([{
-                        "Job Name": "New Job", "Runtime (hrs)": 0, "Runs/Month": 0,
-                        "Instance Type": INSTANCE_LIST[0], "Nodes": 1, "Photon": False, "Spot": False
-                    }] * new_rows_count)
-                    updated_df = pd.concat([df_state, new_rows], ignore_index=True)
-                else: # num_jobs < current_len
-                    # Remove rows from the end
-                    updated_df = df_state.head(num_jobs)
-                
-                # Always re-index the '#' column after any change
-                updated_df['#'] = updated_df.index + 1
-                st.session_state.dbx_jobs[tier] = updated_df
-                st.rerun()
-
+            # The widget value lives in session state so set_tier_jobs can keep it in sync with the frame.
+            st.session_state.setdefault(f"num_jobs_{tier}", len(df_state))
+            c2.number_input("Number of Jobs", min_value=0, key=f"num_jobs_{tier}", label_visibility="collapsed",
+                            on_change=_on_num_jobs_change, args=(tier,))
 
             if not df_state.empty:
-                display_df = data['df']
-                editable_cols = ["Job Name", "Runtime (hrs)", "Runs/Month", "Instance Type", "Nodes", "Photon", "Spot"]
-                
-                edited_df = st.data_editor(
-                    display_df,
-                    column_order=["Job Name", "#", "Runtime (hrs)", "Runs/Month", "Instance Type", "Nodes", "Photon", "Spot", "DBU Units", "EC2 Cost", "DBU Cost" ],
-                    column_config={
-                        "#": st.column_config.NumberColumn("Job.no", disabled=True, width="small"),
-                        "Instance Type": st.column_config.SelectboxColumn("Instance Type", options=INSTANCE_LIST, required=True),
-                       # "DBU Rate": st.column_config.NumberColumn("DBU Rate", format="$%.4f", disabled=True),
-                        #"Cost": st.column_config.TextColumn("Cost", disabled=True),
-                        "DBU Units": st.column_config.NumberColumn("DBU", format="%.2f", disabled=True),
-                        "DBU Cost": st.column_config.NumberColumn("DBX", format="$%.2f", disabled=True),
-                        "EC2 Cost": st.column_config.NumberColumn("EC2", format="$%.2f", disabled=True),
-                    },
-                    hide_index=True, key=f"editor_{tier}", use_container_width=True
-                )
-                
-                # if not edited_df[editable_cols].reset_index(drop=True).equals(df_state[editable_cols].reset_index(drop=True)):
-                #     st.session_state.dbx_jobs[tier] = edited_df[["#"] + editable_cols]
-                #     st.rerun()
+                # Edits are applied row by row in _on_jobs_edited before the rerun, so the
+                # frame passed in here is already up to date and no second rerun is needed.
+                with phase(f"data_editor ({tier.split(' / ')[-1]})"):
+                    st.data_editor(
+                        data['df'],
+                        column_order=["Job Name", "#", "Runtime (hrs)", "Runs/Month", "Instance Type", "Nodes", "Photon", "Spot", "DBU Units", "EC2 Cost", "DBU Cost", *TAG_COLUMNS],
+                        column_config={
+                            "#": st.column_config.NumberColumn("Job.no", disabled=True, width="small"),
+                            "Instance Type": st.column_config.SelectboxColumn("Instance Type", options=INSTANCE_LIST, required=True),
+                           # "DBU Rate": st.column_config.NumberColumn("DBU Rate", format="$%.4f", disabled=True),
+                            #"Cost": st.column_config.TextColumn("Cost", disabled=True),
+                            "DBU Units": st.column_config.NumberColumn("DBU", format="%.2f", disabled=True),
+                            "DBU Cost": st.column_config.NumberColumn("DBX", format="$%.2f", disabled=True),
+                            "EC2 Cost": st.column_config.NumberColumn("EC2", format="$%.2f", disabled=True),
+                            # Free text: a new org, team or pipeline label becomes a category of the tier frame
+                            **{column: st.column_config.TextColumn(column, help="Chargeback tag (see the Chargeback tab)") for column in TAG_COLUMNS},
+                        },
+                        hide_index=True, key=f"editor_{tier}", use_container_width=True,
+                        on_change=_on_jobs_edited, args=(tier,)
+                    )
+
+def _render_job_import():
+    """Bulk import of a job inventory export (CSV, Parquet or Jobs API JSON) into the tier tables."""
+    with st.expander("📥 Import Job Inventory"):
+        uploaded = st.file_uploader("Job inventory export", type=[suffix.lstrip(".") for suffix in IMPORT_SUFFIXES], key="job_import_file")
+        c1, c2 = st.columns(2)
+        default_tier = c1.selectbox("Tier for rows without a known tier", [None, *DBU_RATES.keys()],
+                                    format_func=lambda tier: "Skip row" if tier is None else tier)
+        append = c2.checkbox("Append to existing jobs", value=False)
+        if uploaded is not None and st.button("Import", type="primary"):
+            _import_job_file(uploaded, default_tier, append)
+
+    report = st.session_state.pop("job_import_report", None)
+    if report:
+        imported = ", ".join(f"{tier}: {count:,}" for tier, count in report["imported"].items()) or "no jobs"
+        st.success(f"Imported {report['rows']:,} rows ({imported}).")
+        if report["skipped_tier"] or report["unknown_instance"]:
+            st.warning(f"{report['skipped_tier']:,} rows skipped (unknown tier); "
+                       f"{report['unknown_instance']:,} rows with an instance type that is not priced.")
 
-                if not edited_df[editable_cols].reset_index(drop=True).equals(df_state[editable_cols].reset_index(drop=True)):
-                    st.session_state.dbx_jobs[tier] = edited_df[["#"] + editable_cols ] 
-                    st.rerun()
+def _import_job_file(uploaded, default_tier, append):
+    """Reads an uploaded inventory chunk by chunk with a progress bar, then replaces (or extends) the tiers it covers."""
+    bar = st.progress(0.0, text="Importing jobs…")
+    def progress(rows, fraction):
+        bar.progress(fraction or 0.0, text=f"Imported {rows:,} rows…")
 
+    try:
+        jobs_by_tier, report = import_jobs(uploaded, uploaded.name.rsplit(".", 1)[-1].lower(), default_tier,
+                                           total_bytes=uploaded.size, progress=progress)
+    except Exception as exc:
+        bar.empty()
+        st.error(f"Could not import {uploaded.name}: {exc}")
+        return
+
+    _store_imported_jobs(jobs_by_tier, append)
+    st.session_state.job_import_report = report
+    st.rerun(scope="fragment")
+
+def _store_imported_jobs(jobs_by_tier, append):
+    """Replaces (or extends) the tiers an import covers."""
+    for tier, jobs in jobs_by_tier.items():
+        if append:
+            jobs = pd.concat([st.session_state.dbx_jobs[tier], jobs], ignore_index=True)
+            jobs["#"] = range(1, len(jobs) + 1)
+        set_tier_jobs(tier, jobs)
+
+def _render_run_history_import():
+    """Jobs measured from local Spark event logs, Jobs run history and cluster events (see run_history.py)."""
+    with st.expander("📥 Import Run History"):
+        st.caption("A local directory (or file) of Spark event logs, /api/2.1/jobs/runs/list and /api/2.0/clusters/events exports. "
+                   "Runtime, runs per month and average nodes are measured per job; logs already read are taken from the cache.")
+        path = st.text_input("Log directory", key="run_history_path", placeholder="/dbfs/cluster-logs")
+        c1, c2 = st.columns(2)
+        default_tier = c1.selectbox("Tier for jobs without a tier tag", [None, *DBU_RATES.keys()],
+                                    format_func=lambda tier: "Skip job" if tier is None else tier, key="run_history_tier")
+        append = c2.checkbox("Append to existing jobs", value=False, key="run_history_append")
+        if path and st.button("Import", type="primary", key="run_history_import"):
+            _import_run_history(path, default_tier, append)
+
+    report = st.session_state.pop("run_history_report", None)
+    if report:
+        imported = ", ".join(f"{tier}: {count:,}" for tier, count in report["imported"].items()) or "no jobs"
+        st.success(f"Measured {report['runs']:,} runs of {report['jobs']:,} jobs over {report['days']:.1f} days ({imported}) "
+                   f"from {report['files']:,} files ({report['cached']:,} cached).")
+        if report["errors"] or report["skipped_tier"] or report["unknown_instance"]:
+            st.warning(f"{len(report['errors']):,} files could not be read; {report['skipped_tier']:,} jobs skipped (unknown tier); "
+                       f"{report['unknown_instance']:,} jobs with an instance type that is not priced.")
+
+def _import_run_history(path, default_tier, append):
+    """Parses (or reads cached summaries of) the logs under a path with a progress bar, then stores the measured jobs."""
+    if not os.path.exists(path):
+        st.error(f"{path} does not exist.")
+        return
+    bar = st.progress(0.0, text="Reading logs…")
+    def progress(done, total):
+        bar.progress(done / max(total, 1), text=f"Read {done:,} of {total:,} files…")
+
+    try:
+        jobs_by_tier, report = import_run_history(path, default_tier, progress=progress)
+    except Exception as exc:
+        bar.empty()
+        st.error(f"Could not import {path}: {exc}")
+        return
+
+    _store_imported_jobs(jobs_by_tier, append)
+    st.session_state.run_history_report = report
+    st.rerun(scope="fragment")
+
+def _on_num_jobs_change(tier):
+    """Callback: grows or truncates the tier's job frame to the requested number of jobs."""
+    num_jobs = st.session_state[f"num_jobs_{tier}"]
+    set_tier_jobs(tier, resize_jobs(st.session_state.dbx_jobs[tier], num_jobs))
+
+def _on_jobs_edited(tier):
+    """Callback: applies the data_editor's edited-rows delta to the stored tier frame and its costs."""
+    apply_tier_edits(tier, st.session_state[f"editor_{tier}"]["edited_rows"])
+
+@timed
 def render_s3_tab(s3_costs_per_zone, total_s3_cost):
     """Renders the S3 Storage tab UI with a vertical layout and summary."""
     st.header("AWS S3 Storage Costs")
-    st.radio("Calculation Method", ["Direct Storage", "Table-Based"], key="s3_calc_method", horizontal=True)
+    st.radio("Calculation Method", ["Direct Storage", "Table-Based", "Table Inventory", "Lifecycle Simulation"], key="s3_calc_method", horizontal=True)
     
     st.divider()
 
@@ -182,6 +344,10 @@ def render_s3_tab(s3_costs_per_zone, total_s3_cost):
                 # c4, c5, _ = st.columns(3)
                 # config["put"] = c4.number_input("PUTs (x1000)", min_value=0, key=f"s3_put_{zone}", value=config["put"])
                 # config["get"] = c5.number_input("GETs (x1000)", min_value=0, key=f"s3_get_{zone}", value=config["get"])
+    elif st.session_state.s3_calc_method == "Lifecycle Simulation":
+        _render_s3_lifecycle_inputs()
+    elif st.session_state.s3_calc_method == "Table Inventory":
+        _render_s3_inventory()
     else: # Table-Based
         for zone, config in st.session_state.s3_table_based.items():
             with st.container(border=True):
@@ -192,32 +358,166 @@ def render_s3_tab(s3_costs_per_zone, total_s3_cost):
                 # Changed format to integer and step to 1
                 config["size_kb"] = c3.number_input("Avg Rec Size (KB)", min_value=0, key=f"s3_tbl_size_{zone}", value=int(config["size_kb"]), step=1)
 
+    _render_s3_zone_tags(s3_costs_per_zone)
+
     st.divider()
 
     with st.container(border=True):
         st.subheader("Total S3 Storage Cost")
         st.markdown(f"<h2 style='text-align: center;'>${total_s3_cost:,.2f}/month</h2>", unsafe_allow_html=True)
-        st.caption(f"Calculated using {st.session_state.s3_calc_method} method")
+        st.caption(f"Calculated using {st.session_state.s3_calc_method} method"
+                   + (f" (average month over {st.session_state.s3_lifecycle_horizon} months)"
+                      if st.session_state.s3_calc_method == "Lifecycle Simulation" else ""))
         
         st.divider()
         
-        cols = st.columns(4)
+        cols = st.columns(max(4, len(s3_costs_per_zone)))
         for i, (zone, cost) in enumerate(s3_costs_per_zone.items()):
             with cols[i]:
                 st.metric(label=zone, value=f"${cost:,.2f}")
 
+def _render_s3_zone_tags(s3_costs_per_zone):
+    """Chargeback tags of each priced zone; they follow the zone whichever method prices it."""
+    with st.expander("🏷️ Chargeback Tags"):
+        zone_tags = st.session_state.s3_zone_tags
+        for zone in s3_costs_per_zone:
+            tags = zone_tags.get(zone) or {}
+            cols = st.columns([1, 1, 1, 1])
+            cols[0].markdown(f"**{zone}**")
+            zone_tags[zone] = {column: col.text_input(column, value=tags.get(column, ""), key=f"s3_tag_{column}_{zone}")
+                               for col, column in zip(cols[1:], TAG_COLUMNS)}
+
+INVENTORY_TOP_TABLES = 200  # rows of the largest-tables drill-down
+
+def _render_s3_inventory():
+    """Table inventory import, per-zone rules, and the per-zone and largest-table breakdown."""
+    with st.expander("📥 Import Table Inventory", expanded=st.session_state.s3_inventory_tables.empty):
+        st.caption("DESCRIBE DETAIL output (name, sizeInBytes, properties), an S3 Inventory report with a header row "
+                   "(bucket, key, size, storage_class), or planned tables (table, records, record_kb). "
+                   "An optional zone column assigns tables directly; otherwise the zone patterns below are used.")
+        uploaded = st.file_uploader("Inventory export", type=[suffix.lstrip(".") for suffix in INVENTORY_SUFFIXES], key="s3_inventory_file")
+        if uploaded is not None and st.button("Import", type="primary", key="s3_inventory_import"):
+            _import_inventory_file(uploaded)
+
+    report = st.session_state.pop("s3_inventory_report", None)
+    if report:
+        st.success(f"Imported {report['rows']:,} rows as {report['tables']:,} tables.")
+
+    for zone, config in st.session_state.s3_inventory.items():
+        with st.container(border=True):
+            st.subheader(zone)
+            c1, c2, c3, c4, c5 = st.columns(5)
+            config["match"] = c1.text_input("Zone pattern", key=f"s3_inv_match_{zone}", value=config["match"],
+                                            help="Case-insensitive regular expression matched against the table name.")
+            error = pattern_error(config["match"])
+            if error:
+                c1.error(f"Invalid pattern ({error}); it matches no table.")
+            config["storage_class"] = c2.selectbox("Storage Class", S3_STORAGE_CLASSES, key=f"s3_inv_class_{zone}",
+                                                   index=S3_STORAGE_CLASSES.index(config["storage_class"]),
+                                                   help="For tables whose export has no storage class.")
+            config["compression_ratio"] = c3.number_input("Compression ratio", min_value=1.0, step=0.5, key=f"s3_inv_compression_{zone}",
+                                                          value=float(config["compression_ratio"]),
+                                                          help="Applied to sizes estimated from records × record size.")
+            config["daily_churn_pct"] = c4.number_input("Daily churn (%)", min_value=0.0, max_value=100.0, step=0.5, key=f"s3_inv_churn_{zone}",
+                                                        value=float(config["daily_churn_pct"]),
+                                                        help="Share of a table rewritten per day; the replaced files are kept for the retention period.")
+            config["retention_days"] = c5.number_input("Retention (days)", min_value=0, key=f"s3_inv_retention_{zone}",
+                                                       value=int(config["retention_days"]),
+                                                       help="delta.deletedFileRetentionDuration for tables whose export doesn't give it.")
+
+    if st.session_state.s3_inventory_tables.empty:
+        st.info("Import a table inventory to price it.")
+        return
+
+    priced = price_s3_inventory()
+    st.dataframe(zone_summary(priced), hide_index=True, use_container_width=True,
+                 column_config={"Reported (GB)": st.column_config.NumberColumn(format="%.1f"),
+                                "Stored (GB)": st.column_config.NumberColumn(format="%.1f"),
+                                "Cost": st.column_config.NumberColumn(format="$%.2f")})
+    st.caption(f"Largest tables by cost (top {INVENTORY_TOP_TABLES:,} of {len(priced):,}):")
+    st.dataframe(priced.nlargest(INVENTORY_TOP_TABLES, "Cost")[["Zone", "Table", "Storage Class", "Reported (GB)", "Stored (GB)", "Cost"]],
+                 hide_index=True, use_container_width=True,
+                 column_config={"Reported (GB)": st.column_config.NumberColumn(format="%.2f"),
+                                "Stored (GB)": st.column_config.NumberColumn(format="%.2f"),
+                                "Cost": st.column_config.NumberColumn(format="$%.4f")})
+
+def _import_inventory_file(uploaded):
+    """Reads an uploaded table inventory chunk by chunk with a progress bar and replaces the current one."""
+    bar = st.progress(0.0, text="Importing tables…")
+    def progress(rows, fraction):
+        bar.progress(fraction or 0.0, text=f"Read {rows:,} rows…")
+
+    try:
+        tables, report = import_inventory(uploaded, uploaded.name.rsplit(".", 1)[-1].lower(), total_bytes=uploaded.size, progress=progress)
+    except Exception as exc:
+        bar.empty()
+        st.error(f"Could not import {uploaded.name}: {exc}")
+        return
+
+    st.session_state.s3_inventory_tables = tables
+    st.session_state.s3_inventory_report = report
+    st.rerun(scope="fragment")
+
+def _render_s3_lifecycle_inputs():
+    """Per-zone ingest and lifecycle rules, plus the month-by-month storage and cost chart."""
+    st.session_state.s3_lifecycle_horizon = st.slider("Horizon (months)", min_value=12, max_value=60, step=6,
+                                                      value=st.session_state.s3_lifecycle_horizon, key="s3_lc_horizon")
+    for zone, config in st.session_state.s3_lifecycle.items():
+        with st.container(border=True):
+            st.subheader(zone)
+            c1, c2, c3, c4 = st.columns(4)
+            config["initial_gb"] = c1.number_input("Initial (GB)", min_value=0, key=f"s3_lc_initial_{zone}", value=int(config["initial_gb"]))
+            config["ingest_gb"] = c2.number_input("Ingest (GB/month)", min_value=0, key=f"s3_lc_ingest_{zone}", value=int(config["ingest_gb"]))
+            config["ingest_growth_pct"] = c3.number_input("Ingest growth (%/month)", min_value=0.0, max_value=100.0, step=0.5,
+                                                          key=f"s3_lc_growth_{zone}", value=float(config["ingest_growth_pct"]))
+            config["retrieval_pct"] = c4.number_input("Read back (%/month)", min_value=0.0, max_value=100.0, step=0.5,
+                                                      key=f"s3_lc_retrieval_{zone}", value=float(config["retrieval_pct"]),
+                                                      help="Share of Infrequent Access / Glacier data retrieved each month.")
+            c1, c2, c3 = st.columns(3)
+            config["ia_after_days"] = c1.number_input("→ Infrequent Access after (days)", min_value=0, key=f"s3_lc_ia_{zone}",
+                                                      value=int(config["ia_after_days"]), help="0 = never")
+            config["glacier_after_days"] = c2.number_input("→ Glacier IR after (days)", min_value=0, key=f"s3_lc_glacier_{zone}",
+                                                           value=int(config["glacier_after_days"]), help="0 = never")
+            config["expire_after_days"] = c3.number_input("Expire after (days)", min_value=0, key=f"s3_lc_expire_{zone}",
+                                                          value=int(config["expire_after_days"]), help="0 = keep forever")
+
+    zones, simulation = simulate_s3_lifecycle()
+    months = list(range(1, simulation["total_cost"].shape[1] + 1))
+    storage = simulation["storage_gb"].sum(axis=0)
+    fig = go.Figure([
+        go.Scatter(x=months, y=storage[:, i], name=storage_class, stackgroup="gb", mode="lines")
+        for i, storage_class in enumerate(LIFECYCLE_CLASSES)
+    ] + [go.Scatter(x=months, y=simulation["total_cost"].sum(axis=0), name="Monthly cost ($)", yaxis="y2", line=dict(color="black", dash="dot"))])
+    fig.update_layout(xaxis_title="Month", yaxis=dict(title="Stored (GB)"), yaxis2=dict(title="Cost ($)", overlaying="y", side="right"),
+                      margin=dict(t=20, b=0, l=0, r=0), height=320,
+                      legend=dict(orientation="h", yanchor="bottom", y=-0.4, xanchor="center", x=0.5))
+    with phase("plotly_chart"):
+        st.plotly_chart(fig, use_container_width=True)
+
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Storage", f"${simulation['storage_cost'].sum():,.2f}")
+    c2.metric("Transitions", f"${simulation['transition_cost'].sum():,.2f}")
+    c3.metric("Retrievals", f"${simulation['retrieval_cost'].sum():,.2f}")
+    c4.metric("Requests", f"${simulation['request_cost'].sum():,.2f}")
+    st.caption(f"Totals over {len(months)} months.")
+
+@timed
 def render_sql_warehouse_tab(total_sql_cost):
     """Renders the SQL Warehouse tab UI with a total cost summary."""
     st.header("Databricks SQL Warehouse Costs")
-    
+    _render_query_history_import()
+
     for i, warehouse in enumerate(st.session_state.sql_warehouses):
         with st.container(border=True):
             c1, c2, c3 = st.columns([2, 2, 1])
             with c1:
                 st.subheader(warehouse["name"])
-                size_key = warehouse["size"].split(" - ")[0]
-                dbt_per_hr = SQL_WAREHOUSE_PRICING.get(size_key, {}).get("dbt_per_hr", 0)
-                st.caption(f"{dbt_per_hr} DBUs • {warehouse['hours_per_day']}h/day • {warehouse['days_per_month']} days/month")
+                dbt_per_hr = SQL_WAREHOUSE_PRICING.get(warehouse["size"], {}).get("dbt_per_hr", 0)
+                estimate = warehouse.get("query_history_estimate")
+                if estimate:
+                    st.caption(f"{dbt_per_hr} DBUs • {estimate['cluster_hours_per_month']:,.1f} billed cluster-hours/month from query history")
+                else:
+                    st.caption(f"{dbt_per_hr} DBUs • {warehouse['hours_per_day']}h/day • {warehouse['days_per_month']} days/month")
             # with c3:
             #     if warehouse["auto_suspend"]:
             #         hourly_rate = SQL_WAREHOUSE_PRICING.get(size_key, {}).get("cost_per_hr", 0)
@@ -231,13 +531,29 @@ def render_sql_warehouse_tab(total_sql_cost):
             st.markdown("**Basic Configuration**")
             c1, c2 = st.columns(2)
             warehouse["name"] = c1.text_input("Warehouse Name", value=warehouse["name"], key=f"sql_name_{i}", label_visibility="collapsed")
-            warehouse["size"] = c2.selectbox("Warehouse Size", SQL_WAREHOUSE_SIZES, index=SQL_WAREHOUSE_SIZES.index(warehouse["size"]), key=f"sql_size_{i}", label_visibility="collapsed")
+            warehouse["size"] = c2.selectbox("Warehouse Size", SQL_WAREHOUSE_SIZES, index=SQL_WAREHOUSE_SIZES.index(warehouse["size"]), format_func=SQL_WAREHOUSE_LABELS.get, key=f"sql_size_{i}", label_visibility="collapsed")
 
             st.markdown("**Usage Configuration**")
             c3, c4 = st.columns(2)
             warehouse["hours_per_day"] = c3.number_input("Hours per Day", min_value=0, max_value=24, value=warehouse["hours_per_day"], key=f"sql_hours_{i}")
             warehouse["days_per_month"] = c4.number_input("Days per Month", min_value=0, max_value=31, value=warehouse["days_per_month"], key=f"sql_days_{i}")
 
+            st.markdown("**Query History**")
+            c5, c6, c7 = st.columns(3)
+            warehouse["suspend_after"] = c5.number_input("Auto-suspend after (min)", min_value=1, value=warehouse["suspend_after"], key=f"sql_suspend_after_{i}")
+            warehouse["max_clusters"] = c6.number_input("Max clusters", min_value=1, max_value=40, value=warehouse.get("max_clusters", 1), key=f"sql_max_clusters_{i}")
+            warehouse["query_history_id"] = c7.text_input("Warehouse id in query history", value=warehouse.get("query_history_id", ""), key=f"sql_history_id_{i}")
+            if estimate:
+                st.caption(f"{estimate['queries']:,} queries over {estimate['days']:.1f} days: {estimate['billed_hours']:,.1f} h billed, "
+                           f"{estimate['cluster_hours']:,.1f} cluster-hours, concurrency needed up to {estimate['peak_clusters']} cluster(s). "
+                           "Re-estimate after changing the suspend or scaling settings.")
+                st.button("Use hours per day instead", key=f"sql_clear_estimate_{i}", on_click=_on_clear_estimate, args=(i,))
+
+            st.markdown("**Chargeback Tags**")
+            tags = warehouse.get("tags") or {}
+            warehouse["tags"] = {column: col.text_input(column, value=tags.get(column, ""), key=f"sql_tag_{column}_{i}")
+                                 for col, column in zip(st.columns(len(TAG_COLUMNS)), TAG_COLUMNS)}
+
             # st.markdown("**Auto-Suspend Configuration**")
             # warehouse["auto_suspend"] = st.checkbox("Enable Auto-Suspend", value=warehouse["auto_suspend"], key=f"sql_suspend_{i}")
             # if warehouse["auto_suspend"]:
@@ -245,8 +561,9 @@ def render_sql_warehouse_tab(total_sql_cost):
 
     if st.button("＋ Add SQL Warehouse"):
         new_id = f"warehouse_{len(st.session_state.sql_warehouses)}"
-        st.session_state.sql_warehouses.append({"id": new_id, "name": "New Warehouse", "size": SQL_WAREHOUSE_SIZES[0], "hours_per_day": 8, "days_per_month": 22, "auto_suspend": True, "suspend_after": 10})
-        st.rerun()
+        st.session_state.sql_warehouses.append({"id": new_id, "name": "New Warehouse", "size": SQL_WAREHOUSE_SIZES[0], "hours_per_day": 8, "days_per_month": 22, "auto_suspend": True, "suspend_after": 10,
+                                                "max_clusters": 1, "query_history_id": "", "query_history_estimate": None, "tags": {}})
+        st.rerun(scope="fragment")
 
     st.divider()
 
@@ -256,6 +573,326 @@ def render_sql_warehouse_tab(total_sql_cost):
         st.markdown(f"<h2 style='text-align: center;'>${total_sql_cost:,.2f}/month</h2>", unsafe_allow_html=True)
         st.caption(f"{warehouse_count} warehouse(s) configured")
 
+def _on_clear_estimate(i):
+    """Callback: prices a warehouse from hours per day again instead of its query-history estimate."""
+    st.session_state.sql_warehouses[i]["query_history_estimate"] = None
+
+def _render_query_history_import():
+    """Billed-hours estimate from a query-history export, for the warehouses whose id it contains."""
+    with st.expander("📥 Estimate Billed Hours from Query History"):
+        st.caption("A system.query.history or Query History API export (CSV with a header row, JSON Lines or JSON). "
+                   "Queries are matched to warehouses by their query history id; warehouses that aren't configured "
+                   "yet are added. Each warehouse's auto-suspend and max clusters settings are applied.")
+        uploaded = st.file_uploader("Query history export", type=[suffix.lstrip(".") for suffix in QUERY_HISTORY_SUFFIXES], key="query_history_file")
+        if uploaded is not None and st.button("Estimate", type="primary", key="query_history_estimate"):
+            _estimate_from_query_history(uploaded)
+
+    report = st.session_state.pop("query_history_report", None)
+    if report:
+        st.success(f"Read {report['rows']:,} queries covering {report['days']:.1f} days for {report['warehouses']} warehouse(s).")
+        if report["skipped"] or report["late"]:
+            st.warning(f"{report['skipped']:,} rows skipped (no warehouse or times); "
+                       f"{report['late']:,} rows too far out of order to be re-sorted.")
+
+def _estimate_from_query_history(uploaded):
+    """Streams an uploaded query history through the estimator and stores the result on each warehouse."""
+    warehouses = st.session_state.sql_warehouses
+    by_source = {w["query_history_id"]: w for w in warehouses if w.get("query_history_id")}
+    settings = {source: {"auto_suspend": w["auto_suspend"], "suspend_after": w["suspend_after"], "max_clusters": w.get("max_clusters", 1)}
+                for source, w in by_source.items()}
+    try:
+        with st.spinner("Reading query history…"):
+            estimates, report = estimate_billed_hours(uploaded, uploaded.name.rsplit(".", 1)[-1].lower(), settings)
+    except Exception as exc:
+        st.error(f"Could not read {uploaded.name}: {exc}")
+        return
+
+    for source, estimate in estimates.items():
+        warehouse = by_source.get(source)
+        if warehouse is None:
+            warehouse = {**warehouses[0], "id": f"warehouse_{len(warehouses)}", "name": source, "query_history_id": source,
+                         "auto_suspend": True, "suspend_after": WAREHOUSE_DEFAULTS["suspend_after"], "max_clusters": WAREHOUSE_DEFAULTS["max_clusters"], "tags": {}}
+            warehouses.append(warehouse)
+        warehouse["query_history_estimate"] = {**estimate, "days": report["days"]}
+    st.session_state.query_history_report = {**report, "warehouses": len(estimates)}
+    st.rerun(scope="fragment")
+
+@timed
+def render_projection_tab():
+    """Renders the multi-year projection: per-component growth, step changes and a stacked chart."""
+    settings = st.session_state.projection
+    st.header("Multi-Year Projection")
+    st.markdown("Set growth and start month per component, and add step changes (e.g. a new pipeline from month 7).")
+
+    c1, c2 = st.columns([3, 1])
+    settings["horizon"] = c1.slider("Horizon (months)", min_value=12, max_value=60, step=6, value=settings["horizon"])
+    by_group = c2.radio("Chart by", ["Group", "Component"], horizontal=True, key="projection_by") == "Group"
+
+    components, matrix = project_costs()
+    labels = components["label"]
+
+    with st.container(border=True):
+        c1, c2, c3 = st.columns(3)
+        c1.metric(f"{settings['horizon']}-Month Total", f"${matrix.sum():,.2f}")
+        c2.metric(f"Month {settings['horizon']} Cost", f"${matrix[-1].sum():,.2f}")
+        c3.metric("Components", f"{len(labels)}")
+
+    frame = projection_frame(matrix, labels, components["group"] if by_group else None)
+    fig = go.Figure([
+        go.Scatter(x=frame.index, y=frame[column], name=column, stackgroup="cost", mode="lines")
+        for column in frame.columns
+    ])
+    fig.update_layout(xaxis_title="Month", yaxis_title="Monthly cost ($)", margin=dict(t=20, b=0, l=0, r=0), height=380,
+                      legend=dict(orientation="h", yanchor="bottom", y=-0.35, xanchor="center", x=0.5))
+    with phase("plotly_chart"):
+        st.plotly_chart(fig, use_container_width=True)
+
+    st.subheader("Components")
+    st.data_editor(
+        pd.DataFrame({
+            "Component": labels, "Group": components["group"], "Monthly Cost": components["cost"],
+            "Growth %/month": components["growth"], "Start Month": components["start"],
+        }),
+        column_config={
+            "Component": st.column_config.TextColumn(disabled=True),
+            "Group": st.column_config.TextColumn(disabled=True),
+            "Monthly Cost": st.column_config.NumberColumn(format="$%.2f", disabled=True),
+            "Growth %/month": st.column_config.NumberColumn(min_value=-100.0, max_value=100.0, step=0.1, format="%.1f"),
+            "Start Month": st.column_config.NumberColumn(min_value=1, max_value=60, step=1),
+        },
+        hide_index=True, key="projection_components", use_container_width=True,
+        on_change=_on_projection_components_edited, args=(components["id"],)
+    )
+
+    st.subheader("Step Changes")
+    label_by_id = dict(zip(components["id"], labels))
+    steps = [step for step in settings["steps"] if step["component"] in label_by_id]
+    st.data_editor(
+        pd.DataFrame({
+            "Component": pd.Series([label_by_id[step["component"]] for step in steps], dtype=object),
+            "Month": pd.Series([step["month"] for step in steps], dtype=int),
+            "Delta $/month": pd.Series([step["delta"] for step in steps], dtype=float),
+        }),
+        column_config={
+            "Component": st.column_config.SelectboxColumn(options=labels, required=True),
+            "Month": st.column_config.NumberColumn(min_value=1, max_value=60, step=1, required=True),
+            "Delta $/month": st.column_config.NumberColumn(format="$%.2f", required=True),
+        },
+        num_rows="dynamic", hide_index=True, key="projection_steps", use_container_width=True,
+        on_change=_on_projection_steps_edited, args=(dict(zip(labels, components["id"])),)
+    )
+
+def _on_projection_components_edited(component_ids):
+    """Callback: stores growth and start-month overrides from the components editor by component id."""
+    settings = st.session_state.projection
+    for row, delta in st.session_state["projection_components"]["edited_rows"].items():
+        component_id = component_ids[int(row)]
+        if "Growth %/month" in delta:
+            settings["growth"][component_id] = float(delta["Growth %/month"] or 0.0)
+        if "Start Month" in delta:
+            settings["start"][component_id] = int(delta["Start Month"] or 1)
+
+def _on_projection_steps_edited(id_by_label):
+    """Callback: applies the step editor's edited, deleted and added rows to the stored step list."""
+    settings = st.session_state.projection
+    changes = st.session_state["projection_steps"]
+    columns = {"Component": "component", "Month": "month", "Delta $/month": "delta"}
+    steps = [step for step in settings["steps"] if step["component"] in id_by_label.values()]
+
+    for row, delta in changes["edited_rows"].items():
+        for column, value in delta.items():
+            if column == "Component":
+                value = id_by_label.get(value, steps[int(row)]["component"])
+            steps[int(row)][columns[column]] = value
+    deleted = set(changes["deleted_rows"])
+    steps = [step for i, step in enumerate(steps) if i not in deleted]
+    for added in changes["added_rows"]:
+        if added.get("Component") in id_by_label:
+            steps.append({
+                "component": id_by_label[added["Component"]],
+                "month": int(added.get("Month") or 1),
+                "delta": float(added.get("Delta $/month") or 0.0),
+            })
+    settings["steps"] = steps
+
+@timed
+def render_regions_tab():
+    """Renders the multi-region comparison: every job, zone and warehouse priced in each selected region."""
+    st.header("Region Comparison")
+    st.markdown(f"The current configuration priced in every region, against the calculator's own {HOME_REGION} prices.")
+
+    c1, c2 = st.columns([3, 1])
+    # The selection lives in session state so it survives the tab being hidden (see state.keep_view_state)
+    st.session_state.setdefault("region_compare_regions", list(REGIONS))
+    selected = c1.multiselect("Regions", REGIONS, key="region_compare_regions")
+    by_group = c2.radio("Break down by", ["Group", "Component"], horizontal=True, key="region_compare_by") == "Group"
+    if not selected:
+        st.info("Select at least one region.")
+        return
+
+    components, regions, matrix = compare_regions([HOME_REGION, *(region for region in selected if region != HOME_REGION)])
+    # The home region is always priced (it is the baseline), but only shown when selected
+    totals = pd.Series(matrix.sum(axis=1), index=regions)
+    shown = totals.index.isin(selected)
+    home_total, cheapest = totals[HOME_REGION], totals[shown].idxmin()
+    with st.container(border=True):
+        c1, c2, c3 = st.columns(3)
+        c1.metric(f"Monthly Total ({HOME_REGION})", f"${home_total:,.2f}")
+        c2.metric("Cheapest Region", cheapest)
+        c3.metric("Cheapest Region Total", f"${totals[cheapest]:,.2f}",
+                  delta=f"${totals[cheapest] - home_total:,.2f}", delta_color="inverse")
+
+    # Regions as rows, component (or group) costs as columns
+    frame = projection_frame(matrix, components["label"], components["group"] if by_group else None)
+    frame = frame.set_axis(pd.Index(regions, name="Region"))[shown]
+
+    fig = go.Figure(go.Heatmap(z=frame.to_numpy(), x=list(frame.columns), y=list(frame.index), colorscale="Blues",
+                               hovertemplate="%{y}<br>%{x}<br>$%{z:,.2f}<extra></extra>"))
+    fig.update_layout(margin=dict(t=20, b=0, l=0, r=0), height=max(240, 40 * len(frame) + 120), yaxis=dict(autorange="reversed"))
+    with phase("plotly_chart"):
+        st.plotly_chart(fig, use_container_width=True)
+
+    table = frame.assign(Total=totals[shown], **{"vs " + HOME_REGION: totals[shown] / home_total - 1 if home_total else 0.0})
+    st.dataframe(
+        table.reset_index(),
+        column_config={
+            **{column: st.column_config.NumberColumn(format="$%.2f") for column in [*frame.columns, "Total"]},
+            "vs " + HOME_REGION: st.column_config.NumberColumn(format="percent"),
+        },
+        hide_index=True, use_container_width=True,
+    )
+
+CHARGEBACK_ALL = "(all)"
+CHARGEBACK_TOP_ITEMS = 500  # rows of the item drill-down; the CSV export has every item
+
+@timed
+def render_chargeback_tab():
+    """Renders chargeback rollups: costs by org, team and pipeline tag with drill-down and CSV export."""
+    st.header("Chargeback")
+    st.markdown("Monthly costs billed back by the Org, Team and Pipeline tags of jobs (in the Databricks tables), "
+                "S3 zones and SQL Warehouses. Untagged costs are shown as their own group at every level.")
+    items, rolled = chargeback_rollup()
+
+    # Drill down one level at a time; the table below shows the level under the selection
+    path = []
+    for col, level in zip(st.columns(len(TAG_COLUMNS) - 1), TAG_COLUMNS[:-1]):
+        options = [CHARGEBACK_ALL, *children(rolled, path)[level]] if len(path) == TAG_COLUMNS.index(level) else [CHARGEBACK_ALL]
+        label = col.selectbox(level, options, key=f"chargeback_{level}", disabled=len(options) == 1)
+        if label != CHARGEBACK_ALL:
+            path.append(label)
+    selected = items_under(items, path)
+    level = TAG_COLUMNS[len(path)]
+    groups = children(rolled, path).sort_values("Total", ascending=False)
+
+    with st.container(border=True):
+        c1, c2, c3 = st.columns(3)
+        c1.metric(" / ".join(path) or "All costs", f"${selected['Cost'].sum():,.2f}")
+        c2.metric(f"{level}s", f"{len(groups):,}")
+        c3.metric("Items", f"{len(selected):,}", help="Jobs, S3 zones and SQL Warehouses")
+
+    top = groups.head(25)
+    fig = go.Figure([go.Bar(name=source, y=top[level], x=top[source], orientation="h") for source in SOURCES])
+    fig.update_layout(barmode="stack", margin=dict(t=20, b=0, l=0, r=0), height=max(240, 28 * len(top) + 100),
+                      yaxis=dict(autorange="reversed"), legend=dict(orientation="h", yanchor="bottom", y=-0.35, xanchor="center", x=0.5))
+    with phase("plotly_chart"):
+        st.plotly_chart(fig, use_container_width=True)
+
+    money = st.column_config.NumberColumn(format="$%.2f")
+    st.markdown(f"**By {level.lower()}**" + (f" ({len(groups) - len(top):,} smaller ones not charted)" if len(groups) > len(top) else ""))
+    st.dataframe(groups[[level, "Items", *SOURCES, "Total", "Share"]],
+                 column_config={**{column: money for column in [*SOURCES, "Total"]}, "Share": st.column_config.NumberColumn(format="percent")},
+                 hide_index=True, use_container_width=True)
+
+    st.markdown("**Items**")
+    c1, c2, c3 = st.columns([2, 1, 1])
+    sort_by = c1.selectbox("Sort items by", ["Cost", "Item", "Component", *TAG_COLUMNS], key="chargeback_sort")
+    ascending = c2.toggle("Ascending", value=sort_by != "Cost", key="chargeback_ascending")
+    if sort_by == "Cost":
+        # Only the rows shown are sorted
+        shown = selected.nsmallest(CHARGEBACK_TOP_ITEMS, "Cost") if ascending else selected.nlargest(CHARGEBACK_TOP_ITEMS, "Cost")
+    else:
+        shown = selected.sort_values(sort_by, ascending=ascending, kind="stable").head(CHARGEBACK_TOP_ITEMS)
+    if len(selected) > len(shown):
+        c3.caption(f"First {len(shown):,} of {len(selected):,} items")
+    st.dataframe(shown, column_config={"Cost": money}, hide_index=True, use_container_width=True)
+
+    # CSVs are only built when a button is clicked
+    c1, c2 = st.columns(2)
+    c1.download_button("⬇️ Rollup CSV (every level)", lambda: rolled.to_csv(index=False), file_name="chargeback_rollup.csv",
+                       mime="text/csv", on_click="ignore", use_container_width=True)
+    c2.download_button("⬇️ Items CSV (this selection)", lambda: selected.to_csv(index=False), file_name="chargeback_items.csv",
+                       mime="text/csv", on_click="ignore", use_container_width=True)
+
+CURRENT_SCENARIO_LABEL = "(current session)"
+
+def _on_load_scenario(name):
+    """Callback: replaces the session's configuration with a saved scenario."""
+    load_scenario_state(scenario_store.load_scenario(name))
+
+@timed
+def render_scenarios_tab():
+    """Renders saving, loading and side-by-side comparison of named scenarios."""
+    st.header("Scenarios")
+    st.markdown("Save the current configuration under a name, load it back later, or compare scenarios by tier, zone and warehouse.")
+
+    with st.container(border=True):
+        st.subheader("Save")
+        c1, c2 = st.columns([3, 1])
+        name = c1.text_input("Scenario name", key="scenario_name", label_visibility="collapsed", placeholder="Scenario name")
+        if c2.button("💾 Save", use_container_width=True, disabled=not name.strip()):
+            scenario_store.save_scenario(name.strip(), current_scenario())
+            st.success(f"Saved scenario {name.strip()!r}.")
+
+    saved = scenario_store.list_scenarios()
+    if saved.empty:
+        st.info("No saved scenarios yet.")
+        return
+
+    with st.container(border=True):
+        st.subheader("Saved Scenarios")
+        st.dataframe(saved, column_config={"name": "Name", "saved_at": "Saved (UTC)", "jobs": "Jobs"},
+                     hide_index=True, use_container_width=True)
+        c1, c2, c3 = st.columns([2, 1, 1])
+        selected = c1.selectbox("Scenario", saved["name"], label_visibility="collapsed")
+        # The load happens in the callback, before any widget holding scenario values exists;
+        # the whole app then reruns so every tab picks it up.
+        if c2.button("📂 Load", use_container_width=True, on_click=_on_load_scenario, args=(selected,)):
+            st.rerun()
+        if c3.button("🗑️ Delete", use_container_width=True):
+            scenario_store.delete_scenario(selected)
+            st.rerun(scope="fragment")
+
+    with st.container(border=True):
+        st.subheader("Compare")
+        labels = st.multiselect("Scenarios to compare (the first is the baseline)", [CURRENT_SCENARIO_LABEL, *saved["name"]],
+                                default=[CURRENT_SCENARIO_LABEL, saved["name"].iloc[0]])
+        if len(labels) < 2:
+            st.caption("Pick at least two scenarios.")
+            return
+        components, jobs = compare_scenarios(labels, CURRENT_SCENARIO_LABEL)
+
+        totals = components[labels].sum()
+        for col, label in zip(st.columns(len(labels)), labels):
+            delta = totals[label] - totals[labels[0]]
+            col.metric(label, f"${totals[label]:,.2f}", None if label == labels[0] else f"{delta:+,.2f}", delta_color="inverse")
+
+        money = st.column_config.NumberColumn(format="$%.2f")
+        st.dataframe(components, column_config={column: money for column in components.columns[2:]},
+                     hide_index=True, use_container_width=True)
+
+        fig = go.Figure([go.Bar(name=label, x=components["Component"], y=components[label]) for label in labels])
+        fig.update_layout(barmode="group", margin=dict(t=20, b=0, l=0, r=0), height=320,
+                          legend=dict(orientation="h", yanchor="bottom", y=-0.35, xanchor="center", x=0.5))
+        with phase("plotly_chart"):
+            st.plotly_chart(fig, use_container_width=True)
+
+        st.markdown(f"**Changed jobs** ({len(jobs):,})")
+        if not jobs.empty:
+            largest = jobs.reindex(jobs[[c for c in jobs.columns if c.startswith("Δ ")]].abs().max(axis=1).sort_values(ascending=False).index)
+            st.dataframe(largest.head(500), column_config={column: money for column in jobs.columns[2:]},
+                         hide_index=True, use_container_width=True)
+
+@timed
 def render_configuration_guide():
     """Renders the configuration guide expander at the bottom of a tab."""
     with st.expander("ℹ️ Configuration Guide", expanded=True):
@@ -273,4 +910,147 @@ def render_configuration_guide():
             """)
             st.markdown("""
             **Instance Families** Choose instance types based on workload: General Purpose (`m5`), Compute Optimized (`c5`), Memory Optimized (`r5`/`r5d`).
-            """)
\ No newline at end of file
+            """)
+
+@timed
+def render_optimizer():
+    """Renders the configuration optimizer: constraints, per-job recommendations and an apply button."""
+    settings = st.session_state.optimizer
+    families = sorted({label.split(" (", 1)[1].rstrip(")") for label in INSTANCE_LIST if " (" in label})
+    with st.expander("💡 Configuration Optimizer"):
+        st.caption("Prices every job on every instance type with and without Photon and Spot, keeping at least "
+                   "the job's current vCPUs and memory, and recommends the cheapest allowed option.")
+        c1, c2, c3, c4 = st.columns([2, 1, 1, 1])
+        settings["families"] = c1.multiselect("Allowed instance families", families, default=settings["families"],
+                                              placeholder="Any family")
+        settings["allow_spot"] = c2.toggle("Allow Spot", value=settings["allow_spot"])
+        settings["allow_photon"] = c3.toggle("Allow Photon", value=settings["allow_photon"])
+        settings["photon_speedup"] = c4.number_input("Photon speedup", min_value=1.0, max_value=5.0, step=0.1,
+                                                     value=float(settings["photon_speedup"]),
+                                                     help="How many times faster a job runs with Photon.")
+
+        # The search prices every job on every option, so it only runs on request. Results are shown
+        # while the tier frames (replaced on every edit) and the constraints are the ones searched.
+        results = st.session_state.optimizer_results
+        current_results = (results is not None and results["constraints"] == settings
+                           and all(results["jobs"].get(tier) is jobs for tier, jobs in st.session_state.dbx_jobs.items()))
+        st.button("Find cheaper configurations", on_click=_on_find_recommendations)
+        if not current_results:
+            if results is not None:
+                st.caption("Jobs or constraints changed since the last search.")
+            return
+
+        recommendations = results["recommendations"]
+        current = sum(rec["Current Cost"].sum() for rec in recommendations.values())
+        savings = sum(rec["Savings"].sum() for rec in recommendations.values())
+        changed = sum(int((rec["Savings"] > 0).sum()) for rec in recommendations.values())
+        total_before = sum(rec["Current Total Cost"].sum() for rec in recommendations.values())
+        total_after = sum(rec["Recommended Total Cost"].sum() for rec in recommendations.values())
+
+        st.caption("Options are compared on what they are billed: EC2 plus DBUs at the tier's DBU rate (with the Photon "
+                   "premium). The Monthly Total on this tab counts DBUs as unpriced node-hours, so it is shown separately "
+                   "and can move differently.")
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Billed Cost After", f"${current - savings:,.2f}", help=f"Billed now: ${current:,.2f}")
+        c2.metric("Billed Savings", f"${savings:,.2f}", f"{100 * savings / current:.1f}%" if current else None)
+        c3.metric("Monthly Total After", f"${total_after:,.2f}", f"{total_after - total_before:+,.2f}", delta_color="inverse",
+                  help=f"The Databricks Monthly Total above, after applying: now ${total_before:,.2f}")
+        c4.metric("Jobs to Change", f"{changed}")
+
+        rows = pd.concat([rec.assign(Tier=tier) for tier, rec in recommendations.items()], ignore_index=True)
+        rows = rows[rows["Savings"] > 0].sort_values("Savings", ascending=False)
+        if rows.empty:
+            st.info("Every job is already on its cheapest allowed configuration.")
+            return
+        st.dataframe(
+            rows.head(500),
+            column_order=["Tier", "Job Name", "Instance Type", "Nodes", "Photon", "Spot", "Recommended Instance",
+                          "Recommended Nodes", "Recommended Photon", "Recommended Spot", "Current Cost", "Recommended Cost", "Savings", "Savings %",
+                          "Current Total Cost", "Recommended Total Cost"],
+            column_config={
+                "Current Cost": st.column_config.NumberColumn("Billed Now", format="$%.2f"),
+                "Recommended Cost": st.column_config.NumberColumn("Billed After", format="$%.2f"),
+                "Savings": st.column_config.NumberColumn("Billed Savings", format="$%.2f"),
+                "Current Total Cost": st.column_config.NumberColumn("Total Now", format="$%.2f"),
+                "Recommended Total Cost": st.column_config.NumberColumn("Total After", format="$%.2f"),
+                "Savings %": st.column_config.NumberColumn(format="%.1f%%"),
+            },
+            hide_index=True, use_container_width=True,
+        )
+        if len(rows) > 500:
+            st.caption(f"Showing the 500 largest of {len(rows):,} savings.")
+        st.button("Apply all recommendations", type="primary", on_click=_on_apply_recommendations, args=(recommendations,))
+
+def _on_find_recommendations():
+    """Callback: searches every tier under the current constraints and keeps the results with what was searched."""
+    st.session_state.optimizer_results = {
+        "jobs": dict(st.session_state.dbx_jobs),
+        "constraints": dict(st.session_state.optimizer),
+        "recommendations": optimize_databricks_jobs(),
+    }
+
+def _on_apply_recommendations(recommendations):
+    """Callback: replaces every tier's jobs with their recommended configurations."""
+    for tier, rec in recommendations.items():
+        if (rec["Savings"] > 0).any():
+            set_tier_jobs(tier, apply_recommendations(st.session_state.dbx_jobs[tier], rec))
+
+@timed
+def render_cache_stats():
+    """Renders hit/miss statistics for the memoized calculations (debug sidebar)."""
+    st.subheader("Calculation Cache")
+    stats = pd.DataFrame.from_dict(cache_stats(), orient="index")
+    stats.index = [name.rsplit(".", 1)[-1] for name in stats.index]
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit rate"] = (100 * stats["hits"] / lookups.where(lookups > 0)).fillna(0)
+    st.dataframe(stats, column_config={"hit rate": st.column_config.ProgressColumn("Hit rate", min_value=0, max_value=100, format="%.0f%%")})
+
+def render_memory_panel():
+    """Renders what this session's state holds (debug sidebar); buffers shared with other keys or sessions count once."""
+    st.subheader("Session Memory")
+    footprint, shared_bytes = profiling.session_memory(shared=[shared_defaults(), INSTANCE_DTYPE.categories])
+    st.caption(f"This session: {sum(footprint.values()) / 2**20:,.2f} MiB; shared by all sessions: {shared_bytes / 2**20:,.2f} MiB")
+    st.dataframe(
+        pd.DataFrame({"key": list(footprint), "KiB": [nbytes / 1024 for nbytes in footprint.values()]}).head(15),
+        column_config={"KiB": st.column_config.NumberColumn(format="%.1f")}, hide_index=True,
+    )
+
+def render_profiling_panel():
+    """Renders per-phase timings of the recent reruns, exports and on-demand profiling (debug sidebar)."""
+    st.subheader("Rerun Timing")
+    runs = profiling.history()
+    if not runs:
+        st.caption("No reruns recorded yet.")
+        return
+
+    latest = runs[-1]
+    st.caption(f"Last run ({latest['label']}): {latest['wall_ms']:,.1f} ms, {latest['alloc_blocks']:+,} blocks")
+    # Phases are recorded when they finish; list them in the order they started, indented by depth.
+    phases = pd.DataFrame(latest["phases"], columns=["phase", "depth", "start_ms", "wall_ms", "alloc_blocks"]).sort_values("start_ms", kind="stable")
+    phases["phase"] = ["\u2003" * depth + path.rsplit("/", 1)[-1] for path, depth in zip(phases["phase"], phases["depth"])]
+    st.dataframe(
+        phases[["phase", "wall_ms", "alloc_blocks"]],
+        column_config={
+            "phase": "Phase",
+            "wall_ms": st.column_config.ProgressColumn("Wall ms", min_value=0, max_value=max(latest["wall_ms"], 1e-9), format="%.1f"),
+            "alloc_blocks": st.column_config.NumberColumn("Blocks", help="Net memory blocks left allocated"),
+        },
+        hide_index=True,
+    )
+
+    totals = pd.DataFrame({"wall ms": [run["wall_ms"] for run in runs if run["label"] == "full run"]})
+    if len(totals) > 1:
+        st.caption("Full-run wall time, recent reruns")
+        st.line_chart(totals, height=120)
+
+    c1, c2 = st.columns(2)
+    c1.download_button("JSON", json.dumps(runs, indent=2), file_name="rerun_timings.json", mime="application/json")
+    c2.download_button("CSV", pd.DataFrame(profiling.phase_rows(runs)).to_csv(index=False), file_name="rerun_timings.csv", mime="text/csv")
+
+    c1, c2 = st.columns(2)
+    c1.button("cProfile next run", on_click=profiling.request_capture, args=("cprofile",))
+    c2.button("tracemalloc next run", on_click=profiling.request_capture, args=("tracemalloc",))
+    captured = next((run for run in reversed(runs) if run["profile"]), None)
+    if captured:
+        with st.expander(f"{captured['capture']} capture ({captured['timestamp']})"):
+            st.code(captured["profile"], language=None)